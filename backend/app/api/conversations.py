@@ -1,26 +1,40 @@
 """
 Conversation API endpoints
 """
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from uuid import UUID
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+from uuid import UUID
+from typing import List, Optional, Union
 import time
 import logging
 
 from ..store import store
+from ..backends import ConflictError
 from ..models import Conversation, ConversationNode, ConversationEdge
+from ..sharding import local_shard
+from ..context import build_prompt
 from ..services.llm import get_llm_client
+from ..services.locks import conversation_locks
+from ..services.transfer import (
+    FORMATS,
+    ConversationImporter,
+    MisroutedError,
+    decode_stream,
+    export_stream,
+    require_format
+)
+from .etags import conversation_etag, not_modified, tag
+from .serialization import JSONBytes, conversation_json, dumps, edge_json, graph_bytes, graph_cache, token_message
 from ..schemas import (
     CreateConversationRequest,
     CreateConversationResponse,
+    ImportConversationResponse,
     ConversationResponse,
     GraphResponse,
-    NodeResponse,
-    EdgeResponse,
+    GraphSummaryResponse,
     SelectNodeRequest,
     BranchRequest,
-    StreamToken,
     StreamComplete,
     StreamError
 )
@@ -29,6 +43,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 
 
+def _version_conflict(conversation: Conversation, expected_version: Optional[int]) -> Optional[str]:
+    """Describe why a write based on `expected_version` is stale, or None if it is current"""
+    if expected_version is None or conversation.version == expected_version:
+        return None
+    return f"Conversation has changed (version {conversation.version}, expected {expected_version})"
+
+
 @router.post("", response_model=CreateConversationResponse)
 async def create_conversation(request: CreateConversationRequest):
     """Create a new conversation with initial root node"""
@@ -60,9 +81,10 @@ async def create_conversation(request: CreateConversationRequest):
     conversation.root_node_id = root_node.id
     conversation.active_node_id = root_node.id
 
-    # Store in memory
-    store.create_node(root_node)
-    store.create_conversation(conversation)
+    # Store root node and conversation
+    with store.transaction():
+        store.create_node(root_node)
+        store.create_conversation(conversation)
 
     logger.info(f"✅ CONVERSATION CREATED:")
     logger.info(f"   - ID: {conversation.id}")
@@ -78,14 +100,38 @@ async def create_conversation(request: CreateConversationRequest):
 
 
 @router.get("", response_model=List[ConversationResponse])
-async def list_conversations():
-    """List all conversations"""
+async def list_conversations(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[UUID] = None,
+    after_updated_at: Optional[datetime] = None,
+    create_default: Optional[bool] = None
+):
+    """
+    List conversations, most recently updated first.
+
+    Pass `limit` to fetch one page and `after` (the id of the last conversation
+    on the previous page) to fetch the next one. With `after_updated_at` (the
+    cursor conversation's updated_at) the cursor is a key and the conversation
+    need not exist here, which lets the sharding front page across shards.
+
+    A default conversation is created if there are none, unless
+    `create_default` is false. Shards only create one when asked with
+    `create_default`, which the front does once every shard's page is empty.
+    """
     logger.info("=" * 80)
-    logger.info("📋 USER ACTION: Listing all conversations")
-    conversations = store.list_conversations()
+    logger.info(f"📋 USER ACTION: Listing conversations (limit={limit}, after={after})")
+    if after is not None and after_updated_at is None and not store.get_conversation(after):
+        logger.warning(f"❌ Unknown cursor: {after}")
+        logger.info("=" * 80)
+        raise HTTPException(status_code=400, detail="Unknown cursor conversation")
 
-    # Auto-create default conversation if none exist
-    if len(conversations) == 0:
+    conversations = store.list_conversations(limit=limit, after=after, after_updated_at=after_updated_at)
+
+    # Auto-create default conversation if none exist (in sharded mode only
+    # when the front found none on any shard)
+    if create_default is None:
+        create_default = local_shard is None
+    if after is None and not conversations and create_default:
         logger.info("   → No conversations found, creating default conversation...")
 
         # Create default conversation
@@ -108,9 +154,10 @@ async def list_conversations():
         default_conversation.root_node_id = default_root_node.id
         default_conversation.active_node_id = default_root_node.id
 
-        # Store in memory
-        store.create_node(default_root_node)
-        store.create_conversation(default_conversation)
+        # Store root node and conversation
+        with store.transaction():
+            store.create_node(default_root_node)
+            store.create_conversation(default_conversation)
 
         logger.info(f"   ✅ Created default conversation:")
         logger.info(f"      - ID: {default_conversation.id}")
@@ -118,17 +165,71 @@ async def list_conversations():
         logger.info(f"      - Root Node: {default_root_node.id}")
 
         # Refresh conversation list
-        conversations = store.list_conversations()
+        conversations = store.list_conversations(limit=limit)
 
     logger.info(f"   → Returning {len(conversations)} conversation(s)")
-    for conv in conversations:
-        logger.info(f"      • {conv.title} (ID: {conv.id}, Active: {conv.active_node_id})")
     logger.info("=" * 80)
-    return [ConversationResponse.model_validate(c) for c in conversations]
+    return JSONBytes([conversation_json(c) for c in conversations])
+
+
+@router.post("/import", response_model=ImportConversationResponse)
+async def import_conversation(request: Request, format: str = "ndjson", new_ids: bool = False):
+    """
+    Import a conversation from an export (see services/transfer.py), decoded
+    as the body streams in and inserted in batches. Ids are kept unless
+    new_ids is set; in sharded mode, the front sends imports that keep their
+    ids to the shard owning the conversation id.
+    """
+    logger.info("=" * 80)
+    logger.info(f"📥 USER ACTION: Importing conversation ({format}, new_ids={new_ids})")
+    try:
+        require_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    importer = ConversationImporter(store, new_ids=new_ids)
+    try:
+        async for record in decode_stream(request.stream(), format):
+            if importer.add(record):
+                async with conversation_locks.hold(importer.conversation.id):
+                    importer.flush()
+        if importer.conversation is None:
+            raise ValueError("The export is empty")
+        async with conversation_locks.hold(importer.conversation.id):
+            conversation = importer.finish()
+    except ValueError as e:
+        importer.abort()
+        logger.warning(f"❌ Invalid export: {e}")
+        logger.info("=" * 80)
+        raise HTTPException(status_code=400, detail=f"Invalid export: {e}")
+    except MisroutedError as e:
+        logger.warning(f"❌ Misrouted import: {e}")
+        logger.info("=" * 80)
+        raise HTTPException(status_code=421, detail=str(e))
+    except Exception:
+        # Conflicts (409), client disconnects: drop whatever was inserted
+        importer.abort()
+        raise
+
+    logger.info(f"✅ CONVERSATION IMPORTED:")
+    logger.info(f"   - ID: {conversation.id}")
+    logger.info(f"   - Title: {conversation.title}")
+    logger.info(f"   - Nodes: {importer.nodes}, edges: {importer.edges}")
+    logger.info("=" * 80)
+
+    return ImportConversationResponse(
+        conversation_id=conversation.id,
+        root_node_id=conversation.root_node_id,
+        active_node_id=conversation.active_node_id,
+        nodes=importer.nodes,
+        edges=importer.edges
+    )
 
 
 @router.get("/{conversation_id}", response_model=ConversationResponse)
-async def get_conversation(conversation_id: UUID):
+async def get_conversation(conversation_id: UUID, request: Request):
     """Get conversation details"""
     logger.info("=" * 80)
     logger.info(f"🔍 USER ACTION: Getting conversation details")
@@ -139,19 +240,29 @@ async def get_conversation(conversation_id: UUID):
         logger.info("=" * 80)
         raise HTTPException(status_code=404, detail="Conversation not found")
 
+    etag = conversation_etag(conversation)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        logger.info(f"✅ Not modified (version {conversation.version})")
+        logger.info("=" * 80)
+        return unchanged
+
     logger.info(f"✅ Found conversation:")
     logger.info(f"   - Title: {conversation.title}")
     logger.info(f"   - Root Node: {conversation.root_node_id}")
     logger.info(f"   - Active Node: {conversation.active_node_id}")
     logger.info("=" * 80)
-    return ConversationResponse.model_validate(conversation)
+    response = JSONBytes(conversation_json(conversation))
+    tag(response, etag)
+    return response
 
 
 @router.delete("/{conversation_id}")
 async def delete_conversation(conversation_id: UUID):
     """Delete a conversation and all its nodes"""
     logger.info(f"🗑️ Deleting conversation: {conversation_id}")
-    success = store.delete_conversation(conversation_id)
+    async with conversation_locks.hold(conversation_id):
+        success = store.delete_conversation(conversation_id)
     if not success:
         logger.warning(f"❌ Conversation not found: {conversation_id}")
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -160,70 +271,183 @@ async def delete_conversation(conversation_id: UUID):
     return {"status": "deleted", "conversation_id": str(conversation_id)}
 
 
-@router.get("/{conversation_id}/graph", response_model=GraphResponse)
-async def get_conversation_graph(conversation_id: UUID):
-    """Get the full graph structure for a conversation"""
-    logger.info(f"🌳 Getting graph for conversation: {conversation_id}")
+@router.get("/{conversation_id}/export")
+async def export_conversation(conversation_id: UUID, format: str = "ndjson"):
+    """
+    Stream a conversation's nodes and edges as NDJSON or msgpack records,
+    encoded chunk by chunk instead of building a GraphResponse
+    """
+    logger.info(f"📤 Exporting conversation {conversation_id} ({format})")
+    try:
+        require_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
     conversation = store.get_conversation(conversation_id)
     if not conversation:
         logger.warning(f"❌ Conversation not found: {conversation_id}")
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    nodes = store.get_conversation_nodes(conversation_id)
-    edges = store.get_conversation_edges(conversation_id)
-    logger.info(f"   Found {len(nodes)} nodes and {len(edges)} edges")
+    # The records are captured now; the response encodes them in the threadpool
+    records = store.iter_conversation_records(conversation_id)
+    return StreamingResponse(
+        export_stream(conversation, records, format),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="conversation-{conversation_id}.{format}"'}
+    )
 
-    # Convert to response format
-    node_responses = [NodeResponse.model_validate(n) for n in nodes]
-    edge_responses = [
-        EdgeResponse(
-            id=e.id,
-            source=e.source_node_id,  # Map to 'source' for React Flow
-            target=e.target_node_id,  # Map to 'target' for React Flow
-            query_text=e.query_text,
-            created_at=e.created_at
-        )
-        for e in edges
-    ]
 
-    logger.info(f"✅ Graph data prepared for {conversation_id}")
-    return GraphResponse(
-        conversation_id=conversation_id,
-        active_node_id=conversation.active_node_id,
-        nodes=node_responses,
-        edges=edge_responses
+@router.post("/{conversation_id}/fork", response_model=CreateConversationResponse)
+async def fork_conversation(conversation_id: UUID, from_node: Optional[UUID] = None):
+    """
+    Fork a conversation at a node (by default its root). The fork shares the
+    path to the node and the node's subtree with the source instead of
+    copying them; from then on the two conversations diverge independently.
+    """
+    logger.info("=" * 80)
+    logger.info(f"🍴 USER ACTION: Forking conversation")
+    logger.info(f"   Source: {conversation_id}")
+    logger.info(f"   From node: {from_node or '(root)'}")
+
+    async with conversation_locks.hold(conversation_id):
+        with store.transaction():
+            source = store.get_conversation(conversation_id)
+            if not source:
+                logger.warning(f"❌ Conversation not found: {conversation_id}")
+                logger.info("=" * 80)
+                raise HTTPException(status_code=404, detail="Conversation not found")
+
+            node_id = from_node or source.root_node_id
+            fork = Conversation(
+                title=f"{source.title} (fork)",
+                root_node_id=source.root_node_id,
+                # Forking the whole conversation keeps its selection
+                active_node_id=from_node or source.active_node_id
+            )
+            try:
+                forked = store.fork_conversation(conversation_id, node_id, fork)
+            except NotImplementedError as e:
+                logger.warning(f"❌ {e}")
+                logger.info("=" * 80)
+                raise HTTPException(status_code=501, detail=str(e))
+            if forked is None:
+                logger.warning(f"❌ Node {node_id} does not belong to conversation {conversation_id}")
+                logger.info("=" * 80)
+                raise HTTPException(status_code=404, detail="Node not found")
+
+    logger.info(f"✅ CONVERSATION FORKED:")
+    logger.info(f"   - ID: {fork.id}")
+    logger.info(f"   - Title: {fork.title}")
+    logger.info(f"   - Active Node: {fork.active_node_id}")
+    logger.info("=" * 80)
+
+    return CreateConversationResponse(
+        conversation_id=fork.id,
+        root_node_id=fork.root_node_id,
+        active_node_id=fork.active_node_id
     )
 
 
-@router.post("/{conversation_id}/select")
-async def select_node(conversation_id: UUID, request: SelectNodeRequest):
-    """Select a node as active in the conversation"""
-    logger.info("=" * 80)
-    logger.info(f"👆 USER ACTION: Switching active node")
-    logger.info(f"   Conversation: {conversation_id}")
-    logger.info(f"   New Active Node: {request.node_id}")
+# Graph views: every node with its full texts, or previews only
+GRAPH_VIEWS = ("full", "summary")
+
+
+@router.get("/{conversation_id}/graph", response_model=Union[GraphResponse, GraphSummaryResponse])
+async def get_conversation_graph(
+    conversation_id: UUID,
+    request: Request,
+    since: Optional[int] = None,
+    view: str = "full"
+):
+    """
+    Get the full graph structure for a conversation, or with `since` (the
+    version of a graph the client already has) only what changed after it.
+    Falls back to the full graph (since=None in the response) when the
+    changes are no longer known.
+
+    With view=summary, nodes carry previews of their query, response and
+    context instead of the full texts and materialized contexts, which
+    GET /api/nodes/{id} returns one node at a time.
+    """
+    logger.info(f"🌳 Getting graph for conversation: {conversation_id}" + (f" (since {since})" if since is not None else "")
+                + (f" ({view})" if view != "full" else ""))
+    if view not in GRAPH_VIEWS:
+        raise HTTPException(status_code=400, detail=f"Unknown graph view '{view}' (expected one of: {', '.join(GRAPH_VIEWS)})")
+    summary = view == "summary"
 
     conversation = store.get_conversation(conversation_id)
     if not conversation:
         logger.warning(f"❌ Conversation not found: {conversation_id}")
-        logger.info("=" * 80)
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    node = store.get_node(request.node_id)
-    if not node:
-        logger.warning(f"❌ Node not found: {request.node_id}")
-        logger.info("=" * 80)
-        raise HTTPException(status_code=404, detail="Node not found")
+    unchanged = not_modified(request, conversation_etag(conversation))
+    if unchanged is not None:
+        logger.info(f"✅ Graph not modified (version {conversation.version})")
+        return unchanged
+
+    changes = store.get_graph_changes(conversation_id, since) if since is not None else None
+    if changes is not None:
+        conversation = changes.conversation
+        logger.info(f"   {len(changes.nodes)} nodes and {len(changes.edges)} edges changed, "
+                    f"{len(changes.deleted_node_ids)} nodes and {len(changes.deleted_edge_ids)} edges deleted")
+        nodes = [graph_cache.node(store, n.id, conversation_id, summary) for n in changes.nodes]
+        response = JSONBytes(graph_bytes(
+            conversation_id, conversation, [data for data in nodes if data is not None],
+            [dumps(edge_json(e, summary)) for e in changes.edges],
+            since, changes.deleted_node_ids, changes.deleted_edge_ids
+        ))
+        tag(response, conversation_etag(conversation))
+        return response
+
+    # Records unchanged since an earlier request come encoded from the cache
+    nodes, edges = graph_cache.graph(store, conversation_id, summary)
+    logger.info(f"   Found {len(nodes)} nodes and {len(edges)} edges")
 
-    if node.conversation_id != conversation_id:
-        logger.warning(f"❌ Node {request.node_id} does not belong to conversation {conversation_id}")
-        logger.info("=" * 80)
-        raise HTTPException(status_code=400, detail="Node does not belong to this conversation")
+    response = JSONBytes(graph_bytes(conversation_id, conversation, nodes, edges))
+    tag(response, conversation_etag(conversation))
+    logger.info(f"✅ Graph {'summary' if summary else 'data'} prepared for {conversation_id}")
+    return response
+
+
+@router.post("/{conversation_id}/select")
+async def select_node(conversation_id: UUID, request: SelectNodeRequest):
+    """Select a node as active in the conversation"""
+    logger.info("=" * 80)
+    logger.info(f"👆 USER ACTION: Switching active node")
+    logger.info(f"   Conversation: {conversation_id}")
+    logger.info(f"   New Active Node: {request.node_id}")
 
-    # Update active node
-    old_active = conversation.active_node_id
-    conversation.active_node_id = request.node_id
-    conversation.updated_at = datetime.utcnow()
+    async with conversation_locks.hold(conversation_id):
+        # The transaction makes the check and the write atomic for other workers too
+        with store.transaction():
+            conversation = store.get_conversation(conversation_id)
+            if not conversation:
+                logger.warning(f"❌ Conversation not found: {conversation_id}")
+                logger.info("=" * 80)
+                raise HTTPException(status_code=404, detail="Conversation not found")
+
+            conflict = _version_conflict(conversation, request.expected_version)
+            if conflict:
+                logger.warning(f"❌ {conflict}")
+                logger.info("=" * 80)
+                raise HTTPException(status_code=409, detail=conflict)
+
+            node = store.get_node(request.node_id)
+            if not node:
+                logger.warning(f"❌ Node not found: {request.node_id}")
+                logger.info("=" * 80)
+                raise HTTPException(status_code=404, detail="Node not found")
+
+            if not store.has_node(conversation_id, request.node_id):
+                logger.warning(f"❌ Node {request.node_id} does not belong to conversation {conversation_id}")
+                logger.info("=" * 80)
+                raise HTTPException(status_code=400, detail="Node does not belong to this conversation")
+
+            # Update active node
+            old_active = conversation.active_node_id
+            conversation = store.set_active_node(conversation_id, request.node_id)
 
     logger.info(f"✅ NODE SWITCHED:")
     logger.info(f"   - Previous: {old_active}")
@@ -232,7 +456,11 @@ async def select_node(conversation_id: UUID, request: SelectNodeRequest):
     logger.info(f"   - Node Response: {node.response[:100] if node.response else '(no response yet)'}...")
     logger.info("=" * 80)
 
-    return {"status": "selected", "active_node_id": str(request.node_id)}
+    return {
+        "status": "selected",
+        "active_node_id": str(request.node_id),
+        "version": conversation.version
+    }
 
 
 @router.websocket("/{conversation_id}/stream")
@@ -261,79 +489,94 @@ async def websocket_stream(websocket: WebSocket, conversation_id: UUID):
         logger.info(f"   Query: \"{request.query}\"")
         logger.info(f"   Model: {request.model or 'auto (free models)'}")
 
-        # Get parent node (use active if not specified)
-        parent_id = request.parent_node_id or conversation.active_node_id
-        parent_node = store.get_node(parent_id)
-
-        if not parent_node:
-            logger.warning(f"❌ Parent node not found: {parent_id}")
+        # Only the store updates hold the conversation lock, never the LLM stream,
+        # so parallel branches of one conversation can stream at the same time
+        error = None
+        async with conversation_locks.hold(conversation_id):
+            # One transaction: the checks and writes are atomic for other workers too,
+            # and the node, edge and active node are journaled as one record
+            with store.transaction():
+                # Re-read: the conversation may have changed while we waited for the request
+                conversation = store.get_conversation(conversation_id)
+                if not conversation:
+                    error = "Conversation not found"
+                else:
+                    error = _version_conflict(conversation, request.expected_version)
+
+                if not error:
+                    # Get parent node (use active if not specified)
+                    parent_id = request.parent_node_id or conversation.active_node_id
+                    parent_node = store.get_node(parent_id)
+                    if not parent_node or not store.has_node(conversation_id, parent_id):
+                        error = "Parent node not found"
+
+                if not error:
+                    # Build prompt from the parent's cached transcript (extended incrementally per turn)
+                    root_context = store.get_root(parent_id).context or ""
+                    prompt = build_prompt(store.get_prompt_prefix(parent_id), request.query)
+                    logger.info(f"   → Built prompt from ancestor path ({len(prompt)} chars)")
+
+                    # Create new node (its context is materialized from the ancestor path on demand)
+                    new_node = ConversationNode(
+                        conversation_id=conversation_id,
+                        parent_id=parent_id,
+                        response="",  # Will be filled as we stream
+                        query=request.query,
+                        model=request.model
+                    )
+
+                    # Create edge
+                    edge = ConversationEdge(
+                        source_node_id=parent_id,
+                        target_node_id=new_node.id,
+                        query_text=request.query
+                    )
+
+                    # Store node and edge, and make the new node active
+                    store.create_node(new_node)
+                    store.create_edge(edge)
+                    store.set_active_node(conversation_id, new_node.id)
+
+        if error:
+            logger.warning(f"❌ {error}")
             logger.info("=" * 80)
-            await websocket.send_json(StreamError(message="Parent node not found").model_dump())
+            await websocket.send_json(StreamError(message=error).model_dump())
             await websocket.close()
             return
 
-        # Build context from ancestor path
-        ancestors = store.get_ancestors(parent_id)
-        logger.info(f"   → Building context from {len(ancestors)} ancestor node(s)")
-        context_parts = [ancestors[0].context]  # Start with root context
-
-        for ancestor in ancestors[1:]:
-            if ancestor.query and ancestor.response:
-                context_parts.append(f"User: {ancestor.query}")
-                context_parts.append(f"Assistant: {ancestor.response}")
-
-        # Add current query
-        context_parts.append(f"User: {request.query}")
-        full_context = "\n\n".join(context_parts)
-
-        # Create new node
-        new_node = ConversationNode(
-            conversation_id=conversation_id,
-            parent_id=parent_id,
-            context=full_context,
-            response="",  # Will be filled as we stream
-            query=request.query,
-            model=request.model
-        )
-
-        # Create edge
-        edge = ConversationEdge(
-            source_node_id=parent_id,
-            target_node_id=new_node.id,
-            query_text=request.query
-        )
-
-        # Store node and edge
-        store.create_node(new_node)
-        store.create_edge(edge)
-
         logger.info(f"   → Created new node: {new_node.id}")
         logger.info(f"   → Created edge: {parent_id} → {new_node.id}")
 
-        # Update active node
-        conversation.active_node_id = new_node.id
-        conversation.updated_at = datetime.utcnow()
-
         # Stream response
         logger.info(f"   → Calling LLM for response...")
-        logger.info(f"      System context: {ancestors[0].context[:80]}...")
+        logger.info(f"      System context: {root_context[:80]}...")
         start_time = time.time()
         response_chunks = []
         successful_model = None
 
         async for token in get_llm_client().stream_response(
-            context=ancestors[0].context,  # Use root context as system prompt
-            query=f"{chr(10).join(context_parts[1:])}\n\nUser: {request.query}".strip(),
+            context=root_context,  # Use root context as system prompt
+            query=prompt,
             model=None  # Pass None to try all free models in sequence
         ):
             response_chunks.append(token)
-            await websocket.send_json(StreamToken(content=token).model_dump())
+            await websocket.send_text(token_message(token))
             # Streaming in progress (tokens being sent via WebSocket)
 
         # Update node with complete response
-        new_node.response = "".join(response_chunks)
-        new_node.latency_ms = int((time.time() - start_time) * 1000)
-        new_node.model = request.model or "auto-selected-free-model"
+        async with conversation_locks.hold(conversation_id):
+            completed_node = store.complete_node(
+                new_node.id,
+                response="".join(response_chunks),
+                latency_ms=int((time.time() - start_time) * 1000),
+                model=request.model or "auto-selected-free-model"
+            )
+        if completed_node is None:
+            logger.warning(f"❌ Node {new_node.id} was deleted while streaming")
+            logger.info("=" * 80)
+            await websocket.send_json(StreamError(message="Node was deleted while streaming").model_dump())
+            return
+        new_node = completed_node
 
         # Log completion
         response_preview = new_node.response[:150].replace('\n', ' ') if new_node.response else '(empty)'
@@ -357,6 +600,9 @@ async def websocket_stream(websocket: WebSocket, conversation_id: UUID):
     except WebSocketDisconnect:
         logger.info("🔌 WebSocket disconnected by client")
         pass
+    except ConflictError as e:
+        logger.warning(f"❌ {e}")
+        await websocket.send_json(StreamError(message=str(e)).model_dump())
     except Exception as e:
         logger.info(f"❌ Error in WebSocket handler: {e}")
         import traceback
@@ -0,0 +1,52 @@
+"""
+ETags for conditional GETs
+
+Tags come from the version counters the store already keeps, so a request
+whose If-None-Match still matches is answered with 304 before its response
+is built or serialized:
+
+- a conversation and its graph: the conversation's version, bumped by every
+  node creation, completion, deletion and selection
+- a node: its revision (see records.py), renewed whenever its response,
+  materialized context or owning conversation may have changed. Reading it
+  does not load the node, so a request that still matches is answered
+  before the node or its conversation is read
+
+Tags are weak: a graph at one version may be sent as a delta or in full.
+"""
+from typing import Optional
+from uuid import UUID
+
+from fastapi import Request, Response
+
+from ..models import Conversation
+
+# Caches may keep responses but must revalidate them with If-None-Match
+CACHE_CONTROL = "no-cache"
+
+
+def conversation_etag(conversation: Conversation) -> str:
+    return f'W/"{conversation.id.hex}.{conversation.version}"'
+
+
+def node_etag(node_id: UUID, revision: int) -> str:
+    return f'W/"{node_id.hex}.{revision}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the request's If-None-Match lists `etag`, else None"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    opaque = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def tag(response: Response, etag: str) -> None:
+    """Send `etag` with a 200 response"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
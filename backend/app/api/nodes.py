@@ -1,29 +1,52 @@
 """
 Node API endpoints
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
+from ..models import ConversationNode
 from ..store import store
-from ..schemas import NodeResponse
+from ..schemas import NodeResponse, BranchComparisonResponse
+from ..services.locks import conversation_locks
+from .etags import node_etag, not_modified, tag
+from .serialization import JSONBytes, graph_cache, node_json
 
 router = APIRouter(prefix="/api/nodes", tags=["nodes"])
 
 
+def _node_list(nodes: List[ConversationNode]) -> bytes:
+    """A JSON array of NodeResponse bodies, joined from the graph cache"""
+    encoded = (graph_cache.node(store, n.id) for n in nodes)
+    return b"[" + b",".join(data for data in encoded if data is not None) + b"]"
+
+
 @router.get("/{node_id}", response_model=NodeResponse)
-async def get_node(node_id: UUID):
+async def get_node(node_id: UUID, request: Request):
     """Get node details"""
-    node = store.get_node(node_id)
-    if not node:
+    revision = store.get_node_revision(node_id)
+    if revision is None:
         raise HTTPException(status_code=404, detail="Node not found")
 
-    return NodeResponse.model_validate(node)
+    etag = node_etag(node_id, revision)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    data = graph_cache.node(store, node_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    response = JSONBytes(data)
+    tag(response, etag)
+    return response
 
 
 @router.delete("/{node_id}")
-async def delete_node(node_id: UUID):
-    """Delete a node and all its descendants"""
+async def delete_node(node_id: UUID, conversation_id: Optional[UUID] = None):
+    """
+    Delete a node and all its descendants. A node shared by forks is only
+    removed from `conversation_id` (by default the conversation it was created in).
+    """
     node = store.get_node(node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
@@ -35,7 +58,9 @@ async def delete_node(node_id: UUID):
             detail="Cannot delete root node. Delete the conversation instead."
         )
 
-    success = store.delete_node(node_id)
+    async with conversation_locks.hold(conversation_id or node.conversation_id):
+        if not store.delete_node(node_id, conversation_id):
+            raise HTTPException(status_code=404, detail="Node not found")
     return {"status": "deleted", "node_id": str(node_id)}
 
 
@@ -47,7 +72,7 @@ async def get_ancestors(node_id: UUID):
         raise HTTPException(status_code=404, detail="Node not found")
 
     ancestors = store.get_ancestors(node_id)
-    return [NodeResponse.model_validate(n) for n in ancestors]
+    return JSONBytes(_node_list(ancestors))
 
 
 @router.get("/{node_id}/children", response_model=List[NodeResponse])
@@ -58,4 +83,23 @@ async def get_children(node_id: UUID):
         raise HTTPException(status_code=404, detail="Node not found")
 
     children = store.get_children(node_id)
-    return [NodeResponse.model_validate(n) for n in children]
+    return JSONBytes(_node_list(children))
+
+
+@router.get("/{node_id}/compare/{other_node_id}", response_model=BranchComparisonResponse)
+async def compare_branches(node_id: UUID, other_node_id: UUID):
+    """Split two nodes' paths at their lowest common ancestor"""
+    for current_id in (node_id, other_node_id):
+        if not store.get_node(current_id):
+            raise HTTPException(status_code=404, detail="Node not found")
+
+    comparison = store.compare_branches(node_id, other_node_id)
+    if comparison is None:
+        raise HTTPException(status_code=400, detail="Nodes do not share a common ancestor")
+
+    ancestor, branch_a, branch_b = comparison
+    return JSONBytes({
+        "common_ancestor": node_json(ancestor, store.get_node_context(ancestor.id)),
+        "branch_a": [node_json(n, store.get_node_context(n.id)) for n in branch_a],
+        "branch_b": [node_json(n, store.get_node_context(n.id)) for n in branch_b],
+    })
@@ -0,0 +1,252 @@
+"""
+Fast JSON responses for the graph, node and conversation endpoints
+
+FastAPI sends a returned model by validating it against the endpoint's
+response_model and then encoding it, and the endpoints used to build a
+validated schema per node first. For graphs of thousands of nodes that work
+dominated the request. The functions here build plain dicts with the fields
+(in the same order) of the schemas in schemas.py, straight from the models
+the store returns, which are already valid. dumps() encodes them with orjson,
+or with pydantic's own encoder (the same bytes, somewhat slower) if orjson
+is not installed. Endpoints return them as JSONBytes responses, which
+FastAPI sends as is; the response_model of the endpoint still documents the
+body.
+
+Encoded nodes and edges are kept in a GraphCache, keyed by their revisions
+(see records.py), so graphs are mostly joined from bytes encoded by earlier
+requests; only records added or changed since are read and encoded again.
+
+tests/test_serialization.py checks that each function produces the same
+JSON as its schema.
+"""
+import os
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import Response
+from pydantic_core import to_json
+
+from ..backends import StoreBackend
+from ..context import MaterializedCache
+from ..models import Conversation, ConversationNode, ConversationEdge, NodeSummary, preview_of
+
+try:
+    import orjson
+except ImportError:  # Optional dependency: faster JSON responses
+    orjson = None
+
+JSON = Dict[str, Any]
+
+DEFAULT_CACHE_MB = 64
+# When more than one in BULK_MISSES of a graph's nodes (or edges) miss the
+# cache, they are read from the store in one call instead of one by one
+BULK_MISSES = 8
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value of dicts, lists, UUIDs and datetimes as compact JSON"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return to_json(value)
+
+
+class JSONBytes(Response):
+    """A JSON response from a value for dumps() or already encoded bytes"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+def node_json(node: ConversationNode, context: str, conversation_id: Optional[UUID] = None) -> JSON:
+    """
+    A NodeResponse body, as part of the graph of `conversation_id` if given
+    (a node shared by forks has one conversation_id, which may be another
+    holder's)
+    """
+    return {
+        "id": node.id,
+        "conversation_id": conversation_id or node.conversation_id,
+        "parent_id": node.parent_id,
+        "context": context,
+        "response": node.response,
+        "query": node.query,
+        "created_at": node.created_at,
+        "model": node.model,
+        "tokens_used": node.tokens_used,
+        "latency_ms": node.latency_ms,
+    }
+
+
+def summary_json(summary: NodeSummary, conversation_id: Optional[UUID] = None) -> JSON:
+    """A NodeSummaryResponse body, as part of the graph of `conversation_id` if given"""
+    return {
+        "id": summary.id,
+        "conversation_id": conversation_id or summary.conversation_id,
+        "parent_id": summary.parent_id,
+        "query_preview": summary.query_preview,
+        "response_preview": summary.response_preview,
+        "context_preview": summary.context_preview,
+        "created_at": summary.created_at,
+        "model": summary.model,
+        "tokens_used": summary.tokens_used,
+        "latency_ms": summary.latency_ms,
+    }
+
+
+def edge_json(edge: ConversationEdge, summary: bool = False) -> JSON:
+    """An EdgeResponse body, with a preview of the query text in summary graphs"""
+    return {
+        "id": edge.id,
+        "source": edge.source_node_id,  # Map to 'source' for React Flow
+        "target": edge.target_node_id,  # Map to 'target' for React Flow
+        "query_text": preview_of(edge.query_text) if summary else edge.query_text,
+        "created_at": edge.created_at,
+    }
+
+
+def conversation_json(conversation: Conversation) -> JSON:
+    """A ConversationResponse body"""
+    return {
+        "id": conversation.id,
+        "title": conversation.title,
+        "root_node_id": conversation.root_node_id,
+        "active_node_id": conversation.active_node_id,
+        "created_at": conversation.created_at,
+        "updated_at": conversation.updated_at,
+        "version": conversation.version,
+    }
+
+
+def graph_bytes(
+    conversation_id: UUID,
+    conversation: Conversation,
+    nodes: List[bytes],
+    edges: List[bytes],
+    since: Optional[int] = None,
+    deleted_node_ids: Iterable[UUID] = (),
+    deleted_edge_ids: Iterable[UUID] = ()
+) -> bytes:
+    """A GraphResponse or GraphSummaryResponse body, joined from encoded nodes and edges"""
+    head = dumps({
+        "conversation_id": conversation_id,
+        "active_node_id": conversation.active_node_id,
+        "version": conversation.version,
+    })
+    tail = dumps({
+        "since": since,
+        "deleted_node_ids": list(deleted_node_ids),
+        "deleted_edge_ids": list(deleted_edge_ids),
+    })
+    return b"".join((
+        head[:-1], b',"nodes":[', b",".join(nodes), b'],"edges":[', b",".join(edges), b"],", tail[1:]
+    ))
+
+
+def token_message(content: str) -> str:
+    """A StreamToken message as websocket text"""
+    return dumps({"type": "token", "content": content}).decode()
+
+
+class GraphCache:
+    """
+    Encoded node and edge bodies, bounded by total bytes. Nodes are keyed by
+    id, revision, the conversation whose graph shows them (None for a node
+    on its own) and the view; edges by id, revision and view. A record is
+    always read after its revision, so an entry never holds an older state
+    of the record than its key says; entries for earlier revisions are never
+    asked for again and age out.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._entries = MaterializedCache(max_bytes)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._entries.total_chars
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, key: Hashable, body: JSON) -> bytes:
+        data = dumps(body)
+        self._entries.put(key, data)
+        return data
+
+    def node(
+        self,
+        store: StoreBackend,
+        node_id: UUID,
+        conversation_id: Optional[UUID] = None,
+        summary: bool = False
+    ) -> Optional[bytes]:
+        """
+        A NodeResponse body (a NodeSummaryResponse body with summary), as
+        part of the graph of `conversation_id` if given; None if the node
+        does not exist
+        """
+        revision = store.get_node_revision(node_id)
+        if revision is None:
+            return None
+        key = (node_id, revision, conversation_id, summary)
+        data = self._entries.get(key)
+        if data is not None:
+            return data
+        node = store.get_node(node_id)
+        if node is None:
+            return None
+        if summary:
+            return self._put(key, summary_json(NodeSummary.from_node(node), conversation_id))
+        return self._put(key, node_json(node, store.get_node_context(node_id), conversation_id))
+
+    def graph(
+        self,
+        store: StoreBackend,
+        conversation_id: UUID,
+        summary: bool = False
+    ) -> Tuple[List[bytes], List[bytes]]:
+        """The encoded nodes (parents first) and edges of a conversation's graph"""
+        revisions = store.get_graph_revisions(conversation_id)
+
+        node_keys = [(node_id, revision, conversation_id, summary) for node_id, revision in revisions.nodes]
+        nodes = [self._entries.get(key) for key in node_keys]
+        missing = [i for i, data in enumerate(nodes) if data is None]
+        if len(missing) * BULK_MISSES <= len(nodes):
+            for i in missing:
+                nodes[i] = self.node(store, node_keys[i][0], conversation_id, summary)
+        elif summary:
+            summaries = {n.id: n for n in store.get_node_summaries(conversation_id)}
+            for i in missing:
+                current = summaries.get(node_keys[i][0])
+                if current is not None:
+                    nodes[i] = self._put(node_keys[i], summary_json(current, conversation_id))
+        else:
+            models = {n.id: n for n in store.get_conversation_nodes(conversation_id)}
+            for i in missing:
+                current = models.get(node_keys[i][0])
+                if current is not None:
+                    context = store.get_node_context(current.id)
+                    nodes[i] = self._put(node_keys[i], node_json(current, context, conversation_id))
+
+        edge_keys = [(edge_id, revision, summary) for edge_id, revision in revisions.edges]
+        edges = [self._entries.get(key) for key in edge_keys]
+        missing = [i for i, data in enumerate(edges) if data is None]
+        if len(missing) * BULK_MISSES <= len(edges):
+            current_edges = {}
+            for i in missing:
+                current = store.get_edge(edge_keys[i][0])
+                if current is not None:
+                    current_edges[current.id] = current
+        else:
+            current_edges = {e.id: e for e in store.get_conversation_edges(conversation_id)}
+        for i in missing:
+            current = current_edges.get(edge_keys[i][0])
+            if current is not None:
+                edges[i] = self._put(edge_keys[i], edge_json(current, summary))
+
+        # Records deleted since their revisions were listed are left out
+        return [data for data in nodes if data is not None], [data for data in edges if data is not None]
+
+
+graph_cache = GraphCache(int(float(os.getenv("RESPONSE_CACHE_MB", str(DEFAULT_CACHE_MB))) * 2**20))
@@ -0,0 +1,4 @@
+"""Store backends for ConVerge"""
+from .base import ConflictError, GraphChanges, GraphRevisions, StoreBackend
+
+__all__ = ["ConflictError", "GraphChanges", "GraphRevisions", "StoreBackend"]
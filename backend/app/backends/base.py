@@ -0,0 +1,169 @@
+"""
+Store backend protocol
+
+Every backend (the default InMemoryStore and the persistent ones in this
+package) exposes the same operations, so the API modules only ever talk to
+the module-level `store` selected at startup (see store.create_store).
+Objects returned by a backend must be treated as read-only snapshots; all
+mutations go through backend methods.
+"""
+from datetime import datetime
+from typing import ContextManager, Iterator, List, NamedTuple, Optional, Protocol, Tuple, Union
+from uuid import UUID
+
+from ..models import Conversation, ConversationNode, ConversationEdge, NodeSummary
+
+
+class ConflictError(RuntimeError):
+    """
+    A write was rejected because another process changed the conversation
+    first (only raised by backends shared between API processes)
+    """
+
+
+class GraphChanges(NamedTuple):
+    """What changed in a conversation's graph after a given version"""
+    conversation: Conversation  # At the version the changes lead to
+    nodes: List[ConversationNode]  # Added or changed
+    edges: List[ConversationEdge]
+    deleted_node_ids: List[UUID]
+    deleted_edge_ids: List[UUID]
+
+
+class GraphRevisions(NamedTuple):
+    """Ids and revisions of a conversation's records (see StoreBackend.get_node_revision)"""
+    nodes: List[Tuple[UUID, int]]  # Parents first
+    edges: List[Tuple[UUID, int]]
+
+
+class StoreBackend(Protocol):
+    """Operations the API layer relies on"""
+
+    def transaction(self) -> ContextManager[None]:
+        """Group several writes so they are applied (and persisted) together"""
+        ...
+
+    # Conversation operations
+    def create_conversation(self, conversation: Conversation) -> Conversation:
+        ...
+
+    def get_conversation(self, conversation_id: UUID) -> Optional[Conversation]:
+        ...
+
+    def list_conversations(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[UUID] = None,
+        after_updated_at: Optional[datetime] = None
+    ) -> List[Conversation]:
+        ...
+
+    def list_idle_conversations(self, before: datetime, limit: int) -> List[Conversation]:
+        """Conversations last updated before `before`, least recently updated first"""
+        ...
+
+    def set_active_node(self, conversation_id: UUID, node_id: UUID) -> Optional[Conversation]:
+        ...
+
+    def delete_conversation(self, conversation_id: UUID) -> bool:
+        ...
+
+    def fork_conversation(
+        self,
+        conversation_id: UUID,
+        node_id: UUID,
+        fork: Conversation
+    ) -> Optional[Conversation]:
+        """
+        Create `fork` sharing the path to node_id and its subtree with the
+        conversation, or None if the node is not part of it
+        """
+        ...
+
+    # Node operations
+    def create_node(self, node: ConversationNode) -> ConversationNode:
+        ...
+
+    def get_node(self, node_id: UUID) -> Optional[ConversationNode]:
+        ...
+
+    def complete_node(
+        self,
+        node_id: UUID,
+        response: str,
+        latency_ms: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> Optional[ConversationNode]:
+        ...
+
+    def delete_node(self, node_id: UUID, conversation_id: Optional[UUID] = None) -> bool:
+        """Delete a subtree from a conversation's graph (by default the node's own)"""
+        ...
+
+    def get_children(self, node_id: UUID) -> List[ConversationNode]:
+        ...
+
+    def get_ancestors(self, node_id: UUID) -> List[ConversationNode]:
+        ...
+
+    def get_node_context(self, node_id: UUID) -> Optional[str]:
+        ...
+
+    def get_node_revision(self, node_id: UUID) -> Optional[int]:
+        """
+        A number that changes whenever the node or its context may have
+        changed, and is never reused for another state of the node
+        """
+        ...
+
+    def get_prompt_prefix(self, node_id: UUID) -> str:
+        ...
+
+    def get_root(self, node_id: UUID) -> Optional[ConversationNode]:
+        ...
+
+    def get_depth(self, node_id: UUID) -> Optional[int]:
+        ...
+
+    def lowest_common_ancestor(self, node_a_id: UUID, node_b_id: UUID) -> Optional[ConversationNode]:
+        ...
+
+    def compare_branches(
+        self, node_a_id: UUID, node_b_id: UUID
+    ) -> Optional[Tuple[ConversationNode, List[ConversationNode], List[ConversationNode]]]:
+        ...
+
+    def get_graph_changes(self, conversation_id: UUID, since: int) -> Optional[GraphChanges]:
+        """
+        Nodes and edges changed after version `since` and ids of those
+        deleted, or None if the backend cannot tell (the full graph is needed)
+        """
+        ...
+
+    def has_node(self, conversation_id: UUID, node_id: UUID) -> bool:
+        """Whether a node is part of a conversation's graph, which a fork shares with its source"""
+        ...
+
+    def get_conversation_nodes(self, conversation_id: UUID) -> List[ConversationNode]:
+        ...
+
+    def get_node_summaries(self, conversation_id: UUID) -> List[NodeSummary]:
+        """A conversation's nodes with previews of their texts (see models.preview_of)"""
+        ...
+
+    def get_graph_revisions(self, conversation_id: UUID) -> GraphRevisions:
+        ...
+
+    def iter_conversation_records(self, conversation_id: UUID) -> Iterator[Union[ConversationNode, ConversationEdge]]:
+        """A conversation's nodes (parents first), then its edges, built as they are consumed"""
+        ...
+
+    # Edge operations
+    def create_edge(self, edge: ConversationEdge) -> ConversationEdge:
+        ...
+
+    def get_edge(self, edge_id: UUID) -> Optional[ConversationEdge]:
+        ...
+
+    def get_conversation_edges(self, conversation_id: UUID) -> List[ConversationEdge]:
+        ...
@@ -0,0 +1,728 @@
+"""
+Redis store backend for ConVerge
+
+Keeps conversations, nodes, edges and their indexes in a Redis-protocol
+server, so any number of API nodes behind a load balancer can share them:
+
+    {prefix}conversations            sorted set of conversation ids by updated_at
+    {prefix}conv:{id}                hash: conversation fields, version and rev
+    {prefix}conv:{id}:nodes          list of node ids in insertion order
+    {prefix}conv:{id}:edges          list of edge ids in insertion order
+    {prefix}node:{id}                hash: node fields
+    {prefix}node:{id}:children       list of child node ids
+    {prefix}edge:{id}                hash: edge fields
+
+Every write goes through one Lua script (APPLY) as a batch of commands, so a
+branch creation (node, edge and active node) is applied atomically.
+`rev` counts the batches applied to a conversation. A batch can be guarded
+by the revs its caller read: it is rejected (ConflictError) if another API
+node changed one of those conversations in between.
+
+Like SQLiteStore, graph queries run on a read-through LRU of hot
+conversations, each loaded into its own InMemoryStore partition with two
+pipelined round trips. A partition is used only while its conversation's
+rev is unchanged, which costs one HGET per call. Conversation, node and edge
+lookups read their hash directly.
+
+Requires the optional `redis` package; tests can pass a fakeredis client
+(with Lua support) instead of a URL. Uses keys not declared to the script,
+so it needs a single Redis server rather than Redis Cluster.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+from uuid import UUID
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed with STORE_BACKEND=redis
+    redis = None
+
+from ..models import Conversation, ConversationNode, ConversationEdge, NodeSummary
+from ..records import from_timestamp, to_timestamp
+from ..store import InMemoryStore
+from .base import ConflictError, GraphChanges, GraphRevisions
+
+DEFAULT_PREFIX = "converge:"
+
+# Keys per DEL command; Lua's unpack() is limited to a few thousand values
+DELETE_CHUNK = 1000
+
+# Attempts of a delete whose key set went stale before being applied
+DELETE_ATTEMPTS = 5
+
+# KEYS: conversation hashes the batch read or writes
+# ARGV[1..n]: the rev each conversation must still have ('' = not checked)
+# ARGV[n+1..2n]: '1' to count the batch in the conversation's rev
+# ARGV[2n+1..]: commands, each an argument count followed by its arguments.
+#   BUMP <conversation key> bumps the version of an existing conversation;
+#   HSETXX <key> <field> <value>... updates an existing hash only
+# Returns nil if a guard failed, else the rev of every conversation
+APPLY_SCRIPT = """
+local n = #KEYS
+for i = 1, n do
+    if ARGV[i] ~= '' and (redis.call('HGET', KEYS[i], 'rev') or '0') ~= ARGV[i] then
+        return false
+    end
+end
+local i = 2 * n + 1
+while i <= #ARGV do
+    local count = tonumber(ARGV[i])
+    local name = ARGV[i + 1]
+    if name == 'BUMP' then
+        if redis.call('EXISTS', ARGV[i + 2]) == 1 then
+            redis.call('HINCRBY', ARGV[i + 2], 'version', 1)
+        end
+    elseif name == 'HSETXX' then
+        if redis.call('EXISTS', ARGV[i + 2]) == 1 then
+            redis.call('HSET', unpack(ARGV, i + 2, i + count))
+        end
+    else
+        redis.call(unpack(ARGV, i + 1, i + count))
+    end
+    i = i + count + 1
+end
+local revs = {}
+for j = 1, n do
+    if ARGV[n + j] == '1' and redis.call('EXISTS', KEYS[j]) == 1 then
+        revs[j] = redis.call('HINCRBY', KEYS[j], 'rev', 1)
+    else
+        revs[j] = tonumber(redis.call('HGET', KEYS[j], 'rev') or '0')
+    end
+end
+return revs
+"""
+
+Command = Tuple
+
+
+class _Batch:
+    """Commands queued inside transaction() and the revs they depend on"""
+
+    def __init__(self):
+        self.commands: List[Command] = []
+        self.observed: Dict[UUID, int] = {}  # Conversation id -> rev read in the batch
+        self.touched: Set[UUID] = set()  # Conversations written by the batch
+        self.unmirrored: Set[UUID] = set()  # Written while not hot; a later load misses those writes
+        self.nodes: Dict[UUID, UUID] = {}  # Node id -> conversation id, for nodes created in the batch
+
+
+def _hash_fields(fields: Dict[str, object]) -> List[object]:
+    """Flatten the non-None fields of a hash for HSET"""
+    flat = []
+    for name, value in fields.items():
+        if value is not None:
+            flat.extend((name, value))
+    return flat
+
+
+def _text(hash: Dict[bytes, bytes], field: bytes) -> Optional[str]:
+    value = hash.get(field)
+    return value.decode() if value is not None else None
+
+
+def _int(hash: Dict[bytes, bytes], field: bytes) -> Optional[int]:
+    value = hash.get(field)
+    return int(value) if value is not None else None
+
+
+def _id(hash: Dict[bytes, bytes], field: bytes) -> Optional[UUID]:
+    value = hash.get(field)
+    return UUID(hex=value.decode()) if value is not None else None
+
+
+def _conversation(hash: Dict[bytes, bytes], conversation_id: UUID) -> Conversation:
+    return Conversation.model_construct(
+        id=conversation_id,
+        title=_text(hash, b"title"),
+        root_node_id=_id(hash, b"root_node_id"),
+        active_node_id=_id(hash, b"active_node_id"),
+        created_at=from_timestamp(float(hash[b"created_at"])),
+        updated_at=from_timestamp(float(hash[b"updated_at"])),
+        version=_int(hash, b"version") or 0
+    )
+
+
+def _node(hash: Dict[bytes, bytes], node_id: UUID) -> ConversationNode:
+    return ConversationNode.model_construct(
+        id=node_id,
+        conversation_id=_id(hash, b"conversation_id"),
+        parent_id=_id(hash, b"parent_id"),
+        context=_text(hash, b"context"),
+        response=_text(hash, b"response"),
+        query=_text(hash, b"query"),
+        created_at=from_timestamp(float(hash[b"created_at"])),
+        model=_text(hash, b"model"),
+        tokens_used=_int(hash, b"tokens_used"),
+        latency_ms=_int(hash, b"latency_ms")
+    )
+
+
+def _edge(hash: Dict[bytes, bytes], edge_id: UUID) -> ConversationEdge:
+    return ConversationEdge.model_construct(
+        id=edge_id,
+        source_node_id=_id(hash, b"source_node_id"),
+        target_node_id=_id(hash, b"target_node_id"),
+        query_text=_text(hash, b"query_text"),
+        created_at=from_timestamp(float(hash[b"created_at"]))
+    )
+
+
+class RedisStore:
+    """
+    Store backend on a Redis-protocol server with a read-through LRU of hot
+    conversations.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = DEFAULT_PREFIX,
+        cache_size: int = 256,
+        partition_cache_chars: int = 1024 * 1024,
+        client=None
+    ):
+        """
+        Args:
+            url: Redis server URL (ignored when `client` is given)
+            prefix: Prepended to every key, so several deployments can share a server
+            cache_size: Number of hot conversations kept in memory
+            partition_cache_chars: Character budget of each hot conversation's
+                transcript and prompt caches
+            client: A ready redis-py compatible client, e.g. fakeredis.FakeRedis()
+        """
+        if client is None:
+            if redis is None:
+                raise RuntimeError("The Redis store requires the redis package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self._apply = client.register_script(APPLY_SCRIPT)
+        self.prefix = prefix
+        self.cache_size = cache_size
+        self.partition_cache_chars = partition_cache_chars
+
+        self._batch: Optional[_Batch] = None
+        self._hot: "OrderedDict[UUID, InMemoryStore]" = OrderedDict()
+        self._revs: Dict[UUID, int] = {}  # Rev each hot partition was loaded or last written at
+        self._node_conversations: Dict[UUID, UUID] = {}  # Nodes of hot conversations
+
+    def close(self) -> None:
+        self._redis.close()
+
+    # Keys
+    def _conversations_key(self) -> str:
+        return f"{self.prefix}conversations"
+
+    def _conversation_key(self, conversation_id: UUID) -> str:
+        return f"{self.prefix}conv:{conversation_id.hex}"
+
+    def _node_key(self, node_id: UUID) -> str:
+        return f"{self.prefix}node:{node_id.hex}"
+
+    def _edge_key(self, edge_id: UUID) -> str:
+        return f"{self.prefix}edge:{edge_id.hex}"
+
+    # Writes
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Apply every write inside the block as one atomic batch when the block
+        exits, provided no conversation read inside the block was changed by
+        another writer in the meantime (else ConflictError, nothing applied).
+        Writes are not visible to reads inside the block.
+        """
+        if self._batch is not None:
+            yield
+            return
+
+        batch = self._batch = _Batch()
+        try:
+            yield
+        except BaseException:
+            self._drop_partitions(batch.touched)  # They may hold writes that were never applied
+            raise
+        finally:
+            self._batch = None
+
+        if batch.commands and self._commit(batch.commands, batch.touched, batch.observed) is None:
+            self._drop_partitions(batch.touched | set(batch.observed))
+            raise ConflictError("A conversation changed while the transaction was running")
+        self._drop_partitions(batch.unmirrored)
+
+    def _submit(self, commands: List[Command], conversation_ids: Set[UUID]) -> None:
+        """Queue writes in the current batch or apply them right away"""
+        if self._batch is not None:
+            self._batch.commands.extend(commands)
+            self._batch.touched |= conversation_ids
+            self._batch.unmirrored.update(cid for cid in conversation_ids if cid not in self._hot)
+        else:
+            self._commit(commands, conversation_ids, {})
+
+    def _commit(
+        self,
+        commands: List[Command],
+        touched: Set[UUID],
+        guards: Dict[UUID, int]
+    ) -> Optional[List[int]]:
+        """
+        Run a batch through the APPLY script; returns None if a guard failed.
+        Hot partitions stay valid only if no other batch reached them.
+        """
+        conversation_ids = list(touched | set(guards))
+        args: List[object] = [str(guards[cid]) if cid in guards else "" for cid in conversation_ids]
+        args.extend("1" if cid in touched else "0" for cid in conversation_ids)
+        for command in commands:
+            args.append(len(command))
+            args.extend(command)
+
+        revs = self._apply(keys=[self._conversation_key(cid) for cid in conversation_ids], args=args)
+        if revs is None:
+            return None
+
+        for conversation_id, rev in zip(conversation_ids, revs):
+            cached = self._revs.get(conversation_id)
+            if cached is None:
+                continue
+            expected = cached + 1 if conversation_id in touched else cached
+            if rev == expected:
+                self._revs[conversation_id] = rev
+            else:
+                self._drop_partitions((conversation_id,))
+        return revs
+
+    # Hot conversation cache
+    def _drop_partitions(self, conversation_ids) -> None:
+        for conversation_id in conversation_ids:
+            partition = self._hot.pop(conversation_id, None)
+            self._revs.pop(conversation_id, None)
+            if partition is not None:
+                for node_key in partition.nodes:
+                    self._node_conversations.pop(UUID(int=node_key), None)
+
+    def _observe(self, conversation_id: UUID, rev: int) -> None:
+        """Remember the first rev of a conversation read inside a batch"""
+        if self._batch is not None:
+            self._batch.observed.setdefault(conversation_id, rev)
+
+    def _partition(self, conversation_id: UUID) -> Optional[InMemoryStore]:
+        """Get the hot partition for a conversation, (re)loading it when stale"""
+        partition = self._hot.get(conversation_id)
+        if partition is not None:
+            cached = self._revs[conversation_id]
+            if self._batch is not None and conversation_id in self._batch.observed:
+                rev = cached  # Checked once per batch; the commit's guard covers the rest
+            else:
+                rev = int(self._redis.hget(self._conversation_key(conversation_id), "rev") or 0)
+            if rev == cached:
+                self._observe(conversation_id, rev)
+                self._hot.move_to_end(conversation_id)
+                return partition
+            self._drop_partitions((conversation_id,))
+
+        return self._load_partition(conversation_id)
+
+    def _load_partition(self, conversation_id: UUID) -> Optional[InMemoryStore]:
+        """Fetch a whole conversation with two pipelined round trips"""
+        key = self._conversation_key(conversation_id)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hgetall(key)
+        pipe.lrange(f"{key}:nodes", 0, -1)
+        pipe.lrange(f"{key}:edges", 0, -1)
+        conversation_hash, node_ids, edge_ids = pipe.execute()
+        if b"title" not in conversation_hash:
+            return None
+
+        pipe = self._redis.pipeline(transaction=False)
+        for node_id in node_ids:
+            pipe.hgetall(f"{self.prefix}node:{node_id.decode()}")
+        for edge_id in edge_ids:
+            pipe.hgetall(f"{self.prefix}edge:{edge_id.decode()}")
+        hashes = pipe.execute()
+
+        partition = InMemoryStore(
+            context_cache_chars=self.partition_cache_chars,
+            prompt_cache_chars=self.partition_cache_chars
+        )
+        # Node ids are listed in insertion order, so parents are indexed before children.
+        # A hash deleted since the first round trip is skipped; the rev check catches up
+        for node_id, node_hash in zip(node_ids, hashes):
+            if node_hash:
+                node = partition.create_node(_node(node_hash, UUID(hex=node_id.decode())))
+                self._node_conversations[node.id] = conversation_id
+        for edge_id, edge_hash in zip(edge_ids, hashes[len(node_ids):]):
+            if edge_hash:
+                partition.create_edge(_edge(edge_hash, UUID(hex=edge_id.decode())))
+        partition.create_conversation(_conversation(conversation_hash, conversation_id))
+
+        rev = int(conversation_hash.get(b"rev", 0))
+        self._observe(conversation_id, rev)
+        self._hot[conversation_id] = partition
+        self._revs[conversation_id] = rev
+        while len(self._hot) > self.cache_size:
+            evicted_id = next(iter(self._hot))
+            self._drop_partitions((evicted_id,))
+        return partition
+
+    def _node_conversation(self, node_id: UUID) -> Optional[UUID]:
+        conversation_id = self._node_conversations.get(node_id)
+        if conversation_id is None and self._batch is not None:
+            conversation_id = self._batch.nodes.get(node_id)
+        if conversation_id is None:
+            value = self._redis.hget(self._node_key(node_id), "conversation_id")
+            if value is not None:
+                conversation_id = UUID(hex=value.decode())
+        return conversation_id
+
+    def _node_partition(self, node_id: UUID) -> Optional[InMemoryStore]:
+        """Get the partition of the conversation owning a node"""
+        conversation_id = self._node_conversation(node_id)
+        if conversation_id is None:
+            return None
+        return self._partition(conversation_id)
+
+    def _hot_partition(self, conversation_id: Optional[UUID]) -> Optional[InMemoryStore]:
+        """Get a partition only if it is already cached"""
+        if conversation_id is None:
+            return None
+        return self._hot.get(conversation_id)
+
+    # Conversation operations
+    def create_conversation(self, conversation: Conversation) -> Conversation:
+        key = self._conversation_key(conversation.id)
+        updated = to_timestamp(conversation.updated_at)
+        self._submit([
+            ("HSET", key, *_hash_fields({
+                "title": conversation.title,
+                "root_node_id": conversation.root_node_id.hex,
+                "active_node_id": conversation.active_node_id.hex,
+                "created_at": to_timestamp(conversation.created_at),
+                "updated_at": updated,
+                "version": conversation.version,
+            })),
+            ("ZADD", self._conversations_key(), updated, conversation.id.hex),
+        ], {conversation.id})
+        partition = self._hot_partition(conversation.id)
+        if partition is not None:
+            partition.create_conversation(conversation)
+        return conversation
+
+    def get_conversation(self, conversation_id: UUID) -> Optional[Conversation]:
+        conversation_hash = self._redis.hgetall(self._conversation_key(conversation_id))
+        if b"title" not in conversation_hash:
+            return None
+        self._observe(conversation_id, int(conversation_hash.get(b"rev", 0)))
+        return _conversation(conversation_hash, conversation_id)
+
+    def list_conversations(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[UUID] = None,
+        after_updated_at: Optional[datetime] = None
+    ) -> List[Conversation]:
+        index = self._conversations_key()
+        # Ties on updated_at sort by member, i.e. by id, as in the other backends
+        start = 0
+        if after is not None:
+            if after_updated_at is None:
+                rank = self._redis.zrevrank(index, after.hex)
+                if rank is None:
+                    return []
+                start = rank + 1
+            else:
+                score = to_timestamp(after_updated_at)
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.zcount(index, f"({score!r}", "+inf")
+                pipe.zrangebyscore(index, score, score)
+                newer, ties = pipe.execute()
+                start = newer + sum(1 for member in ties if member.decode() >= after.hex)
+
+        stop = -1 if limit is None else start + limit - 1
+        members = self._redis.zrevrange(index, start, stop)
+        pipe = self._redis.pipeline(transaction=False)
+        for member in members:
+            pipe.hgetall(f"{self.prefix}conv:{member.decode()}")
+        return [
+            _conversation(conversation_hash, UUID(hex=member.decode()))
+            for member, conversation_hash in zip(members, pipe.execute())
+            if b"title" in conversation_hash
+        ]
+
+    def list_idle_conversations(self, before: datetime, limit: int) -> List[Conversation]:
+        members = self._redis.zrangebyscore(
+            self._conversations_key(), "-inf", f"({to_timestamp(before)!r}", start=0, num=limit
+        )
+        pipe = self._redis.pipeline(transaction=False)
+        for member in members:
+            pipe.hgetall(f"{self.prefix}conv:{member.decode()}")
+        return [
+            _conversation(conversation_hash, UUID(hex=member.decode()))
+            for member, conversation_hash in zip(members, pipe.execute())
+            if b"title" in conversation_hash
+        ]
+
+    def set_active_node(self, conversation_id: UUID, node_id: UUID) -> Optional[Conversation]:
+        partition = self._partition(conversation_id)
+        if partition is None:
+            return None
+
+        conversation = partition.set_active_node(conversation_id, node_id)
+        key = self._conversation_key(conversation_id)
+        updated = to_timestamp(conversation.updated_at)
+        self._submit([
+            ("HSET", key, "active_node_id", node_id.hex, "updated_at", updated),
+            ("BUMP", key),
+            ("ZADD", self._conversations_key(), updated, conversation_id.hex),
+        ], {conversation_id})
+        return conversation
+
+    def delete_conversation(self, conversation_id: UUID) -> bool:
+        for _ in range(DELETE_ATTEMPTS):
+            partition = self._partition(conversation_id)
+            if partition is None:
+                return False
+
+            key = self._conversation_key(conversation_id)
+            keys = [key, f"{key}:nodes", f"{key}:edges"]
+            for node_key in partition.nodes:
+                node_id = UUID(int=node_key)
+                keys.extend((self._node_key(node_id), f"{self._node_key(node_id)}:children"))
+            keys.extend(self._edge_key(UUID(int=edge_key)) for edge_key in partition.edges)
+            commands = [("DEL", *keys[i:i + DELETE_CHUNK]) for i in range(0, len(keys), DELETE_CHUNK)]
+            commands.append(("ZREM", self._conversations_key(), conversation_id.hex))
+
+            if self._applied(commands, conversation_id):
+                self._drop_partitions((conversation_id,))
+                return True
+        raise ConflictError(f"Conversation {conversation_id} kept changing while being deleted")
+
+    def fork_conversation(
+        self,
+        conversation_id: UUID,
+        node_id: UUID,
+        fork: Conversation
+    ) -> Optional[Conversation]:
+        # Every key belongs to one conversation here, so a fork could only be a copy
+        raise NotImplementedError("Forks are only supported by the in-memory store")
+
+    def _applied(self, commands: List[Command], conversation_id: UUID) -> bool:
+        """
+        Apply writes computed from a conversation's hot partition, guarded by
+        the rev it was validated at. False if the partition went stale first
+        (it is dropped, so a retry reloads it)
+        """
+        if self._batch is not None:
+            self._batch.commands.extend(commands)
+            self._batch.touched.add(conversation_id)
+            return True
+        if self._commit(commands, {conversation_id}, {conversation_id: self._revs[conversation_id]}) is None:
+            self._drop_partitions((conversation_id,))
+            return False
+        return True
+
+    # Node operations
+    def create_node(self, node: ConversationNode) -> ConversationNode:
+        key = self._node_key(node.id)
+        conversation_key = self._conversation_key(node.conversation_id)
+        commands: List[Command] = [
+            ("BUMP", conversation_key),
+            ("HSET", key, *_hash_fields({
+                "conversation_id": node.conversation_id.hex,
+                "parent_id": node.parent_id.hex if node.parent_id else None,
+                "context": node.context,
+                "response": node.response,
+                "query": node.query,
+                "created_at": to_timestamp(node.created_at),
+                "model": node.model,
+                "tokens_used": node.tokens_used,
+                "latency_ms": node.latency_ms,
+            })),
+            ("RPUSH", f"{conversation_key}:nodes", node.id.hex),
+        ]
+        if node.parent_id is not None:
+            commands.append(("RPUSH", f"{self._node_key(node.parent_id)}:children", node.id.hex))
+        self._submit(commands, {node.conversation_id})
+        if self._batch is not None:
+            self._batch.nodes[node.id] = node.conversation_id
+
+        partition = self._hot_partition(node.conversation_id)
+        if partition is not None:
+            partition.create_node(node)
+            self._node_conversations[node.id] = node.conversation_id
+        return node
+
+    def get_node(self, node_id: UUID) -> Optional[ConversationNode]:
+        node_hash = self._redis.hgetall(self._node_key(node_id))
+        return _node(node_hash, node_id) if node_hash else None
+
+    def complete_node(
+        self,
+        node_id: UUID,
+        response: str,
+        latency_ms: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> Optional[ConversationNode]:
+        conversation_id = self._node_conversation(node_id)
+        if conversation_id is None:
+            return None
+
+        key = self._node_key(node_id)
+        fields = {"response": response, "latency_ms": latency_ms, "model": model}
+        commands: List[Command] = [
+            ("HSETXX", key, *_hash_fields(fields)),
+            ("BUMP", self._conversation_key(conversation_id)),
+        ]
+        cleared = [name for name, value in fields.items() if value is None]
+        if cleared:
+            commands.append(("HDEL", key, *cleared))
+        self._submit(commands, {conversation_id})
+
+        partition = self._hot_partition(conversation_id)
+        if partition is not None:
+            completed = partition.complete_node(node_id, response, latency_ms, model)
+            if completed is not None:
+                return completed
+        return self.get_node(node_id)
+
+    def delete_node(self, node_id: UUID, conversation_id: Optional[UUID] = None) -> bool:
+        owner = self._node_conversation(node_id)
+        if owner is None or (conversation_id is not None and owner != conversation_id):
+            return False
+        conversation_id = owner
+        for _ in range(DELETE_ATTEMPTS):
+            partition = self._partition(conversation_id) if conversation_id is not None else None
+            node = partition._node(node_id.int) if partition is not None else None
+            if node is None:
+                return False
+
+            subtree = InMemoryStore._subtree(node)
+            removed = {subtree_node.id for subtree_node in subtree}
+            edges = {edge.id for subtree_node in subtree for edge in subtree_node.edges or ()}
+
+            conversation_key = self._conversation_key(conversation_id)
+            keys = []
+            for subtree_node in subtree:
+                subtree_key = self._node_key(UUID(int=subtree_node.id))
+                keys.extend((subtree_key, f"{subtree_key}:children"))
+            keys.extend(self._edge_key(UUID(int=edge_key)) for edge_key in edges)
+            commands: List[Command] = [("DEL", *keys[i:i + DELETE_CHUNK]) for i in range(0, len(keys), DELETE_CHUNK)]
+            if node.parent_id is not None:
+                commands.append(("LREM", f"{self._node_key(UUID(int=node.parent_id))}:children", 1, node_id.hex))
+
+            # Rewrite the conversation's indexes without the removed ids (guarded, so they are current)
+            commands.append(("DEL", f"{conversation_key}:nodes", f"{conversation_key}:edges"))
+            remaining_nodes = [UUID(int=key).hex for key in partition.nodes if key not in removed]
+            remaining_edges = [UUID(int=key).hex for key in partition.edges if key not in edges]
+            for index, ids in ((f"{conversation_key}:nodes", remaining_nodes), (f"{conversation_key}:edges", remaining_edges)):
+                commands.extend(("RPUSH", index, *ids[i:i + DELETE_CHUNK]) for i in range(0, len(ids), DELETE_CHUNK))
+            commands.append(("BUMP", conversation_key))
+
+            if self._applied(commands, conversation_id):
+                partition.delete_node(node_id)
+                for key in removed:
+                    self._node_conversations.pop(UUID(int=key), None)
+                return True
+        raise ConflictError(f"Conversation {conversation_id} kept changing while deleting node {node_id}")
+
+    def get_children(self, node_id: UUID) -> List[ConversationNode]:
+        partition = self._hot_partition(self._node_conversations.get(node_id))
+        if partition is not None:
+            partition = self._node_partition(node_id)  # Revalidated
+            return partition.get_children(node_id) if partition else []
+
+        # Cold conversation: read the children index instead of loading the whole graph
+        child_ids = self._redis.lrange(f"{self._node_key(node_id)}:children", 0, -1)
+        pipe = self._redis.pipeline(transaction=False)
+        for child_id in child_ids:
+            pipe.hgetall(f"{self.prefix}node:{child_id.decode()}")
+        return [
+            _node(child_hash, UUID(hex=child_id.decode()))
+            for child_id, child_hash in zip(child_ids, pipe.execute())
+            if child_hash
+        ]
+
+    def get_ancestors(self, node_id: UUID) -> List[ConversationNode]:
+        partition = self._node_partition(node_id)
+        return partition.get_ancestors(node_id) if partition else []
+
+    def get_node_context(self, node_id: UUID) -> Optional[str]:
+        partition = self._node_partition(node_id)
+        return partition.get_node_context(node_id) if partition else None
+
+    def get_node_revision(self, node_id: UUID) -> Optional[int]:
+        partition = self._node_partition(node_id)
+        return partition.get_node_revision(node_id) if partition else None
+
+    def get_prompt_prefix(self, node_id: UUID) -> str:
+        partition = self._node_partition(node_id)
+        return partition.get_prompt_prefix(node_id) if partition else ""
+
+    def get_root(self, node_id: UUID) -> Optional[ConversationNode]:
+        partition = self._node_partition(node_id)
+        return partition.get_root(node_id) if partition else None
+
+    def get_depth(self, node_id: UUID) -> Optional[int]:
+        partition = self._node_partition(node_id)
+        return partition.get_depth(node_id) if partition else None
+
+    def lowest_common_ancestor(self, node_a_id: UUID, node_b_id: UUID) -> Optional[ConversationNode]:
+        partition = self._node_partition(node_a_id)
+        return partition.lowest_common_ancestor(node_a_id, node_b_id) if partition else None
+
+    def compare_branches(
+        self, node_a_id: UUID, node_b_id: UUID
+    ) -> Optional[Tuple[ConversationNode, List[ConversationNode], List[ConversationNode]]]:
+        partition = self._node_partition(node_a_id)
+        return partition.compare_branches(node_a_id, node_b_id) if partition else None
+
+    def get_graph_changes(self, conversation_id: UUID, since: int) -> Optional[GraphChanges]:
+        # Only changes made through this node's hot partition are logged
+        partition = self._partition(conversation_id)
+        return partition.get_graph_changes(conversation_id, since) if partition else None
+
+    def has_node(self, conversation_id: UUID, node_id: UUID) -> bool:
+        return self._node_conversation(node_id) == conversation_id
+
+    def get_conversation_nodes(self, conversation_id: UUID) -> List[ConversationNode]:
+        partition = self._partition(conversation_id)
+        return partition.get_conversation_nodes(conversation_id) if partition else []
+
+    def get_node_summaries(self, conversation_id: UUID) -> List[NodeSummary]:
+        partition = self._partition(conversation_id)
+        return partition.get_node_summaries(conversation_id) if partition else []
+
+    def get_graph_revisions(self, conversation_id: UUID) -> GraphRevisions:
+        partition = self._partition(conversation_id)
+        return partition.get_graph_revisions(conversation_id) if partition else GraphRevisions([], [])
+
+    def iter_conversation_records(self, conversation_id: UUID) -> Iterator[Union[ConversationNode, ConversationEdge]]:
+        partition = self._partition(conversation_id)
+        return partition.iter_conversation_records(conversation_id) if partition else iter(())
+
+    # Edge operations
+    def create_edge(self, edge: ConversationEdge) -> ConversationEdge:
+        conversation_id = self._node_conversation(edge.source_node_id)
+        commands: List[Command] = [
+            ("HSET", self._edge_key(edge.id), *_hash_fields({
+                "source_node_id": edge.source_node_id.hex,
+                "target_node_id": edge.target_node_id.hex,
+                "query_text": edge.query_text,
+                "created_at": to_timestamp(edge.created_at),
+            })),
+        ]
+        if conversation_id is not None:
+            commands.append(("RPUSH", f"{self._conversation_key(conversation_id)}:edges", edge.id.hex))
+        self._submit(commands, {conversation_id} if conversation_id is not None else set())
+
+        partition = self._hot_partition(conversation_id)
+        if partition is not None:
+            partition.create_edge(edge)
+        return edge
+
+    def get_edge(self, edge_id: UUID) -> Optional[ConversationEdge]:
+        edge_hash = self._redis.hgetall(self._edge_key(edge_id))
+        return _edge(edge_hash, edge_id) if edge_hash else None
+
+    def get_conversation_edges(self, conversation_id: UUID) -> List[ConversationEdge]:
+        partition = self._partition(conversation_id)
+        return partition.get_conversation_edges(conversation_id) if partition else []
@@ -0,0 +1,291 @@
+"""
+Remote store backend for ConVerge
+
+Lets several API worker processes share one store: a single store server
+process (see app.store_server) owns the data, and every worker talks to it
+through a RemoteStore over a Unix socket, using the binary protocol in
+wire.py.
+
+Outside a transaction every call is one round trip. Inside transaction(),
+writes are pipelined: they are queued and sent together with the next call
+that needs a reply, or with the commit, which waits for every outstanding
+reply. An error from a pipelined write is raised when its reply is read; if
+the block already raised, the commit still runs and its error is only
+logged.
+
+Each thread gets its own connection and transaction state, so a
+RemoteStore can be shared by the event loop and threadpool of a worker.
+"""
+import logging
+import socket
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain
+from typing import Any, Deque, Iterator, List, Optional, Tuple, Union
+from uuid import UUID
+
+from ..models import Conversation, ConversationNode, ConversationEdge, NodeSummary
+from .base import GraphChanges, GraphRevisions
+from .wire import BEGIN, COMMIT, ERROR, HEADER, OPS, Op, decode_error, decode_result, encode_request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/converge-store.sock"
+RECV_BYTES = 256 * 1024
+
+
+class RemoteStoreError(RuntimeError):
+    """A request failed inside the store server"""
+
+
+def _read_frame(sock: socket.socket, buffer: bytearray) -> Tuple[int, bytes]:
+    """Read one reply frame, keeping any bytes past it in `buffer`"""
+    while len(buffer) < HEADER.size:
+        _receive(sock, buffer)
+    length, status = HEADER.unpack_from(buffer)
+    end = HEADER.size + length
+    while len(buffer) < end:
+        _receive(sock, buffer)
+    payload = bytes(buffer[HEADER.size:end])
+    del buffer[:end]
+    return status, payload
+
+
+def _receive(sock: socket.socket, buffer: bytearray) -> None:
+    data = sock.recv(RECV_BYTES)
+    if not data:
+        raise ConnectionResetError("Store server closed the connection")
+    buffer += data
+
+
+class _Connection(threading.local):
+    """A thread's socket, receive buffer and pipelined requests"""
+
+    def __init__(self):
+        # Connected on first use, so importing the store module never blocks on the server
+        self.sock: Optional[socket.socket] = None
+        self.buffer = bytearray()
+        self.outgoing: List[bytes] = []
+        self.awaiting: Deque[Op] = deque()
+        self.in_transaction = False
+
+
+class RemoteStore:
+    """Store backend that forwards every operation to the store server"""
+
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: Optional[float] = 30.0):
+        """
+        Args:
+            path: Unix socket of the store server
+            timeout: Seconds to wait for the server before giving up
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = _Connection()
+
+    def close(self) -> None:
+        """Close the calling thread's connection"""
+        local = self._local
+        if local.sock is not None:
+            local.sock.close()
+            local.sock = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Apply every call inside the block as one server-side transaction"""
+        local = self._local
+        if local.in_transaction:
+            yield
+            return
+
+        self._queue(BEGIN, ())
+        local.in_transaction = True
+        try:
+            yield
+        except BaseException:
+            # Commit what the block sent, but let its own error through
+            local.in_transaction = False
+            self._queue(COMMIT, ())
+            try:
+                self._exchange()
+            except (RemoteStoreError, OSError) as e:
+                logger.warning(f"Store transaction failed on commit after an error in its block: {e}")
+            raise
+        local.in_transaction = False
+        self._queue(COMMIT, ())
+        self._exchange()
+
+    # Connection
+    def _connect(self) -> socket.socket:
+        local = self._local
+        if local.sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            local.sock = sock
+        return local.sock
+
+    def _queue(self, op: Op, args: Tuple[Any, ...]) -> None:
+        local = self._local
+        local.outgoing.append(encode_request(op, args))
+        local.awaiting.append(op)
+
+    def _exchange(self) -> Any:
+        """Send the queued requests and read every outstanding reply; returns the last result"""
+        local = self._local
+        try:
+            sock = self._connect()
+            sock.sendall(b"".join(local.outgoing))
+            local.outgoing.clear()
+
+            result = error = None
+            while local.awaiting:
+                op = local.awaiting.popleft()
+                status, payload = _read_frame(sock, local.buffer)
+                if status == ERROR:
+                    error = error or decode_error(payload)
+                else:
+                    result = decode_result(op, payload)
+        except OSError:
+            # The connection is unusable (e.g. the server restarted); reconnect on the next call
+            local.outgoing.clear()
+            local.awaiting.clear()
+            local.buffer.clear()
+            self.close()
+            raise
+
+        if error is not None:
+            raise RemoteStoreError(error)
+        return result
+
+    def _call(self, name: str, *args: Any) -> Any:
+        """Run an operation on the server and return its result"""
+        self._queue(OPS[name], args)
+        return self._exchange()
+
+    def _write(self, name: str, *args: Any) -> None:
+        """Run a write whose result the caller already has; pipelined inside a transaction"""
+        self._queue(OPS[name], args)
+        if not self._local.in_transaction:
+            self._exchange()
+
+    # Conversation operations
+    def create_conversation(self, conversation: Conversation) -> Conversation:
+        self._write("create_conversation", conversation)
+        return conversation
+
+    def get_conversation(self, conversation_id: UUID) -> Optional[Conversation]:
+        return self._call("get_conversation", conversation_id)
+
+    def list_conversations(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[UUID] = None,
+        after_updated_at: Optional[datetime] = None
+    ) -> List[Conversation]:
+        return self._call("list_conversations", limit, after, after_updated_at)
+
+    def list_idle_conversations(self, before: datetime, limit: int) -> List[Conversation]:
+        return self._call("list_idle_conversations", before, limit)
+
+    def set_active_node(self, conversation_id: UUID, node_id: UUID) -> Optional[Conversation]:
+        return self._call("set_active_node", conversation_id, node_id)
+
+    def delete_conversation(self, conversation_id: UUID) -> bool:
+        return self._call("delete_conversation", conversation_id)
+
+    def trim_conversation(self, conversation_id: UUID, limit: int, idle_before: datetime) -> Optional[int]:
+        return self._call("trim_conversation", conversation_id, limit, idle_before)
+
+    def fork_conversation(
+        self,
+        conversation_id: UUID,
+        node_id: UUID,
+        fork: Conversation
+    ) -> Optional[Conversation]:
+        return self._call("fork_conversation", conversation_id, node_id, fork)
+
+    # Node operations
+    def create_node(self, node: ConversationNode) -> ConversationNode:
+        self._write("create_node", node)
+        return node
+
+    def get_node(self, node_id: UUID) -> Optional[ConversationNode]:
+        return self._call("get_node", node_id)
+
+    def complete_node(
+        self,
+        node_id: UUID,
+        response: str,
+        latency_ms: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> Optional[ConversationNode]:
+        return self._call("complete_node", node_id, response, latency_ms, model)
+
+    def delete_node(self, node_id: UUID, conversation_id: Optional[UUID] = None) -> bool:
+        return self._call("delete_node", node_id, conversation_id)
+
+    def get_children(self, node_id: UUID) -> List[ConversationNode]:
+        return self._call("get_children", node_id)
+
+    def get_ancestors(self, node_id: UUID) -> List[ConversationNode]:
+        return self._call("get_ancestors", node_id)
+
+    def get_node_context(self, node_id: UUID) -> Optional[str]:
+        return self._call("get_node_context", node_id)
+
+    def get_node_revision(self, node_id: UUID) -> Optional[int]:
+        return self._call("get_node_revision", node_id)
+
+    def get_prompt_prefix(self, node_id: UUID) -> str:
+        return self._call("get_prompt_prefix", node_id)
+
+    def get_root(self, node_id: UUID) -> Optional[ConversationNode]:
+        return self._call("get_root", node_id)
+
+    def get_depth(self, node_id: UUID) -> Optional[int]:
+        return self._call("get_depth", node_id)
+
+    def lowest_common_ancestor(self, node_a_id: UUID, node_b_id: UUID) -> Optional[ConversationNode]:
+        return self._call("lowest_common_ancestor", node_a_id, node_b_id)
+
+    def compare_branches(
+        self, node_a_id: UUID, node_b_id: UUID
+    ) -> Optional[Tuple[ConversationNode, List[ConversationNode], List[ConversationNode]]]:
+        return self._call("compare_branches", node_a_id, node_b_id)
+
+    def get_graph_changes(self, conversation_id: UUID, since: int) -> Optional[GraphChanges]:
+        return self._call("get_graph_changes", conversation_id, since)
+
+    def has_node(self, conversation_id: UUID, node_id: UUID) -> bool:
+        return self._call("has_node", conversation_id, node_id)
+
+    def get_conversation_nodes(self, conversation_id: UUID) -> List[ConversationNode]:
+        return self._call("get_conversation_nodes", conversation_id)
+
+    def get_node_summaries(self, conversation_id: UUID) -> List[NodeSummary]:
+        return self._call("get_node_summaries", conversation_id)
+
+    def get_graph_revisions(self, conversation_id: UUID) -> GraphRevisions:
+        return self._call("get_graph_revisions", conversation_id)
+
+    def iter_conversation_records(self, conversation_id: UUID) -> Iterator[Union[ConversationNode, ConversationEdge]]:
+        # The store server sends each list in one reply
+        return chain(self.get_conversation_nodes(conversation_id), self.get_conversation_edges(conversation_id))
+
+    # Edge operations
+    def create_edge(self, edge: ConversationEdge) -> ConversationEdge:
+        self._write("create_edge", edge)
+        return edge
+
+    def get_edge(self, edge_id: UUID) -> Optional[ConversationEdge]:
+        return self._call("get_edge", edge_id)
+
+    def get_conversation_edges(self, conversation_id: UUID) -> List[ConversationEdge]:
+        return self._call("get_conversation_edges", conversation_id)
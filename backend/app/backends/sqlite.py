@@ -0,0 +1,507 @@
+"""
+SQLite store backend for ConVerge
+
+Durable storage in a single SQLite database in WAL mode, indexed on
+conversation_id and parent_id. Reads go through a read-through LRU of hot
+conversations: each cached conversation is loaded once into its own
+InMemoryStore partition (with all of its indexes), so graph, ancestor and
+context queries on a hot conversation never touch the database. Writes go
+to SQLite first and are then applied to the cached partition, if any.
+"""
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from uuid import UUID
+
+from ..models import Conversation, ConversationNode, ConversationEdge, NodeSummary
+from ..store import InMemoryStore
+from .base import GraphChanges, GraphRevisions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id BLOB PRIMARY KEY,
+    title TEXT NOT NULL,
+    root_node_id BLOB NOT NULL,
+    active_node_id BLOB NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated_at, id);
+
+CREATE TABLE IF NOT EXISTS nodes (
+    id BLOB PRIMARY KEY,
+    conversation_id BLOB NOT NULL,
+    parent_id BLOB,
+    context TEXT,
+    response TEXT,
+    query TEXT,
+    created_at TEXT NOT NULL,
+    model TEXT,
+    tokens_used INTEGER,
+    latency_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_nodes_conversation ON nodes (conversation_id);
+CREATE INDEX IF NOT EXISTS idx_nodes_parent ON nodes (parent_id);
+
+CREATE TABLE IF NOT EXISTS edges (
+    id BLOB PRIMARY KEY,
+    conversation_id BLOB,
+    source_node_id BLOB NOT NULL,
+    target_node_id BLOB NOT NULL,
+    query_text TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_edges_conversation ON edges (conversation_id);
+CREATE INDEX IF NOT EXISTS idx_edges_source ON edges (source_node_id);
+CREATE INDEX IF NOT EXISTS idx_edges_target ON edges (target_node_id);
+"""
+
+# Statements are module constants so sqlite3's statement cache reuses the
+# prepared form for every call
+CONVERSATION_COLUMNS = "id, title, root_node_id, active_node_id, created_at, updated_at, version"
+NODE_COLUMNS = (
+    "id, conversation_id, parent_id, context, response, query, "
+    "created_at, model, tokens_used, latency_ms"
+)
+EDGE_COLUMNS = "id, source_node_id, target_node_id, query_text, created_at"
+
+INSERT_CONVERSATION = f"INSERT OR REPLACE INTO conversations ({CONVERSATION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+SELECT_CONVERSATION = f"SELECT {CONVERSATION_COLUMNS} FROM conversations WHERE id = ?"
+SELECT_CONVERSATION_UPDATED = "SELECT updated_at FROM conversations WHERE id = ?"
+LIST_CONVERSATIONS = f"SELECT {CONVERSATION_COLUMNS} FROM conversations ORDER BY updated_at DESC, id DESC LIMIT ?"
+LIST_CONVERSATIONS_AFTER = (
+    f"SELECT {CONVERSATION_COLUMNS} FROM conversations WHERE (updated_at, id) < (?, ?) "
+    "ORDER BY updated_at DESC, id DESC LIMIT ?"
+)
+LIST_IDLE_CONVERSATIONS = (
+    f"SELECT {CONVERSATION_COLUMNS} FROM conversations WHERE updated_at < ? "
+    "ORDER BY updated_at, id LIMIT ?"
+)
+UPDATE_ACTIVE_NODE = (
+    "UPDATE conversations SET active_node_id = ?, updated_at = ?, version = version + 1 WHERE id = ?"
+)
+BUMP_VERSION = "UPDATE conversations SET version = version + 1 WHERE id = ?"
+BUMP_NODE_VERSION = (
+    "UPDATE conversations SET version = version + 1 "
+    "WHERE id = (SELECT conversation_id FROM nodes WHERE id = ?)"
+)
+DELETE_CONVERSATION = "DELETE FROM conversations WHERE id = ?"
+
+INSERT_NODE = f"INSERT OR REPLACE INTO nodes ({NODE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_NODE_CONVERSATION = "SELECT conversation_id FROM nodes WHERE id = ?"
+SELECT_CONVERSATION_NODES = f"SELECT {NODE_COLUMNS} FROM nodes WHERE conversation_id = ? ORDER BY rowid"
+SELECT_SUBTREE = """
+WITH RECURSIVE subtree(id) AS (
+    SELECT id FROM nodes WHERE id = ?
+    UNION ALL
+    SELECT nodes.id FROM nodes JOIN subtree ON nodes.parent_id = subtree.id
+)
+SELECT id FROM subtree
+"""
+UPDATE_NODE_RESPONSE = "UPDATE nodes SET response = ?, latency_ms = ?, model = ? WHERE id = ?"
+DELETE_NODE = "DELETE FROM nodes WHERE id = ?"
+DELETE_CONVERSATION_NODES = "DELETE FROM nodes WHERE conversation_id = ?"
+
+INSERT_EDGE = (
+    f"INSERT OR REPLACE INTO edges (conversation_id, {EDGE_COLUMNS}) "
+    "VALUES ((SELECT conversation_id FROM nodes WHERE id = ?), ?, ?, ?, ?, ?)"
+)
+SELECT_EDGE = f"SELECT {EDGE_COLUMNS} FROM edges WHERE id = ?"
+SELECT_CONVERSATION_EDGES = f"SELECT {EDGE_COLUMNS} FROM edges WHERE conversation_id = ? ORDER BY rowid"
+DELETE_NODE_EDGES = "DELETE FROM edges WHERE source_node_id = ? OR target_node_id = ?"
+DELETE_CONVERSATION_EDGES = "DELETE FROM edges WHERE conversation_id = ?"
+
+
+def _ts(value: datetime) -> str:
+    """Fixed-width ISO timestamps sort correctly as text"""
+    return value.isoformat(timespec="microseconds")
+
+
+def _uuid(value: Optional[bytes]) -> Optional[UUID]:
+    return UUID(bytes=value) if value is not None else None
+
+
+def _conversation(row: tuple) -> Conversation:
+    return Conversation.model_construct(
+        id=UUID(bytes=row[0]),
+        title=row[1],
+        root_node_id=UUID(bytes=row[2]),
+        active_node_id=UUID(bytes=row[3]),
+        created_at=datetime.fromisoformat(row[4]),
+        updated_at=datetime.fromisoformat(row[5]),
+        version=row[6]
+    )
+
+
+def _node(row: tuple) -> ConversationNode:
+    return ConversationNode.model_construct(
+        id=UUID(bytes=row[0]),
+        conversation_id=UUID(bytes=row[1]),
+        parent_id=_uuid(row[2]),
+        context=row[3],
+        response=row[4],
+        query=row[5],
+        created_at=datetime.fromisoformat(row[6]),
+        model=row[7],
+        tokens_used=row[8],
+        latency_ms=row[9]
+    )
+
+
+def _edge(row: tuple) -> ConversationEdge:
+    return ConversationEdge.model_construct(
+        id=UUID(bytes=row[0]),
+        source_node_id=UUID(bytes=row[1]),
+        target_node_id=UUID(bytes=row[2]),
+        query_text=row[3],
+        created_at=datetime.fromisoformat(row[4])
+    )
+
+
+class SQLiteStore:
+    """
+    Durable store backend on SQLite (WAL mode) with a read-through LRU of
+    hot conversations.
+    """
+
+    def __init__(self, path: str, cache_size: int = 256, partition_cache_chars: int = 1024 * 1024):
+        """
+        Args:
+            path: Database file (created if missing)
+            cache_size: Number of hot conversations kept in memory
+            partition_cache_chars: Character budget of each hot conversation's
+                transcript and prompt caches
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self.partition_cache_chars = partition_cache_chars
+
+        # Autocommit unless inside transaction(); writes there are committed together
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._in_transaction = False
+
+        self._hot: "OrderedDict[UUID, InMemoryStore]" = OrderedDict()
+        self._node_conversations: Dict[UUID, UUID] = {}  # Nodes of hot conversations
+        self._data_version = self._read_data_version()
+
+    def close(self) -> None:
+        self._db.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Commit every write inside the block in a single SQLite transaction"""
+        if self._in_transaction:
+            yield
+            return
+
+        self._db.execute("BEGIN IMMEDIATE")
+        self._in_transaction = True
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            self._drop_hot()  # Cached partitions may hold rolled-back writes
+            raise
+        else:
+            self._db.execute("COMMIT")
+        finally:
+            self._in_transaction = False
+
+    # Hot conversation cache
+    def _read_data_version(self) -> int:
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _drop_hot(self) -> None:
+        self._hot.clear()
+        self._node_conversations.clear()
+
+    def _check_external_writes(self) -> None:
+        """Drop cached partitions when another connection (e.g. another worker) committed"""
+        data_version = self._read_data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._drop_hot()
+
+    def _partition(self, conversation_id: UUID) -> Optional[InMemoryStore]:
+        """Get the hot partition for a conversation, loading it on a miss"""
+        self._check_external_writes()
+        partition = self._hot.get(conversation_id)
+        if partition is not None:
+            self._hot.move_to_end(conversation_id)
+            return partition
+
+        key = conversation_id.bytes
+        row = self._db.execute(SELECT_CONVERSATION, (key,)).fetchone()
+        if row is None:
+            return None
+
+        partition = InMemoryStore(
+            context_cache_chars=self.partition_cache_chars,
+            prompt_cache_chars=self.partition_cache_chars
+        )
+        # Rows come back in insertion order, so parents are indexed before children
+        for node_row in self._db.execute(SELECT_CONVERSATION_NODES, (key,)):
+            node = partition.create_node(_node(node_row))
+            self._node_conversations[node.id] = conversation_id
+        for edge_row in self._db.execute(SELECT_CONVERSATION_EDGES, (key,)):
+            partition.create_edge(_edge(edge_row))
+        partition.create_conversation(_conversation(row))
+
+        self._hot[conversation_id] = partition
+        while len(self._hot) > self.cache_size:
+            _, evicted = self._hot.popitem(last=False)
+            for node_key in evicted.nodes:
+                self._node_conversations.pop(UUID(int=node_key), None)
+        return partition
+
+    def _hot_partition(self, conversation_id: Optional[UUID]) -> Optional[InMemoryStore]:
+        """Get a partition only if it is already cached"""
+        if conversation_id is None:
+            return None
+        return self._hot.get(conversation_id)
+
+    def _node_conversation(self, node_id: UUID) -> Optional[UUID]:
+        conversation_id = self._node_conversations.get(node_id)
+        if conversation_id is None:
+            row = self._db.execute(SELECT_NODE_CONVERSATION, (node_id.bytes,)).fetchone()
+            if row is not None:
+                conversation_id = UUID(bytes=row[0])
+        return conversation_id
+
+    def _node_partition(self, node_id: UUID) -> Optional[InMemoryStore]:
+        """Get the partition of the conversation owning a node"""
+        self._check_external_writes()
+        conversation_id = self._node_conversation(node_id)
+        if conversation_id is None:
+            return None
+        return self._partition(conversation_id)
+
+    # Conversation operations
+    def create_conversation(self, conversation: Conversation) -> Conversation:
+        self._db.execute(INSERT_CONVERSATION, (
+            conversation.id.bytes,
+            conversation.title,
+            conversation.root_node_id.bytes,
+            conversation.active_node_id.bytes,
+            _ts(conversation.created_at),
+            _ts(conversation.updated_at),
+            conversation.version,
+        ))
+        partition = self._hot_partition(conversation.id)
+        if partition is not None:
+            partition.create_conversation(conversation)
+        return conversation
+
+    def get_conversation(self, conversation_id: UUID) -> Optional[Conversation]:
+        partition = self._partition(conversation_id)
+        return partition.get_conversation(conversation_id) if partition else None
+
+    def list_conversations(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[UUID] = None,
+        after_updated_at: Optional[datetime] = None
+    ) -> List[Conversation]:
+        sql_limit = -1 if limit is None else limit
+        if after is None:
+            rows = self._db.execute(LIST_CONVERSATIONS, (sql_limit,))
+        else:
+            if after_updated_at is not None:
+                cursor_updated = _ts(after_updated_at)
+            else:
+                cursor_row = self._db.execute(SELECT_CONVERSATION_UPDATED, (after.bytes,)).fetchone()
+                if cursor_row is None:
+                    return []
+                cursor_updated = cursor_row[0]
+            rows = self._db.execute(LIST_CONVERSATIONS_AFTER, (cursor_updated, after.bytes, sql_limit))
+        return [_conversation(row) for row in rows]
+
+    def list_idle_conversations(self, before: datetime, limit: int) -> List[Conversation]:
+        return [_conversation(row) for row in self._db.execute(LIST_IDLE_CONVERSATIONS, (_ts(before), limit))]
+
+    def set_active_node(self, conversation_id: UUID, node_id: UUID) -> Optional[Conversation]:
+        partition = self._partition(conversation_id)
+        if partition is None:
+            return None
+
+        conversation = partition.set_active_node(conversation_id, node_id)
+        self._db.execute(UPDATE_ACTIVE_NODE, (
+            node_id.bytes, _ts(conversation.updated_at), conversation_id.bytes
+        ))
+        return conversation
+
+    def delete_conversation(self, conversation_id: UUID) -> bool:
+        key = conversation_id.bytes
+        with self.transaction():
+            deleted = self._db.execute(DELETE_CONVERSATION, (key,)).rowcount > 0
+            self._db.execute(DELETE_CONVERSATION_EDGES, (key,))
+            self._db.execute(DELETE_CONVERSATION_NODES, (key,))
+
+        partition = self._hot.pop(conversation_id, None)
+        if partition is not None:
+            for node_key in partition.nodes:
+                self._node_conversations.pop(UUID(int=node_key), None)
+        return deleted
+
+    def fork_conversation(
+        self,
+        conversation_id: UUID,
+        node_id: UUID,
+        fork: Conversation
+    ) -> Optional[Conversation]:
+        # Every row belongs to one conversation here, so a fork could only be a copy
+        raise NotImplementedError("Forks are only supported by the in-memory store")
+
+    # Node operations
+    def create_node(self, node: ConversationNode) -> ConversationNode:
+        with self.transaction():
+            self._db.execute(INSERT_NODE, (
+                node.id.bytes,
+                node.conversation_id.bytes,
+                node.parent_id.bytes if node.parent_id else None,
+                node.context,
+                node.response,
+                node.query,
+                _ts(node.created_at),
+                node.model,
+                node.tokens_used,
+                node.latency_ms,
+            ))
+            self._db.execute(BUMP_VERSION, (node.conversation_id.bytes,))
+        partition = self._hot_partition(node.conversation_id)
+        if partition is not None:
+            partition.create_node(node)
+            self._node_conversations[node.id] = node.conversation_id
+        return node
+
+    def get_node(self, node_id: UUID) -> Optional[ConversationNode]:
+        partition = self._node_partition(node_id)
+        return partition.get_node(node_id) if partition else None
+
+    def complete_node(
+        self,
+        node_id: UUID,
+        response: str,
+        latency_ms: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> Optional[ConversationNode]:
+        with self.transaction():
+            updated = self._db.execute(UPDATE_NODE_RESPONSE, (response, latency_ms, model, node_id.bytes))
+            if updated.rowcount == 0:
+                return None
+            self._db.execute(BUMP_NODE_VERSION, (node_id.bytes,))
+        partition = self._node_partition(node_id)
+        return partition.complete_node(node_id, response, latency_ms, model) if partition else None
+
+    def delete_node(self, node_id: UUID, conversation_id: Optional[UUID] = None) -> bool:
+        owner = self._node_conversation(node_id)
+        if conversation_id is not None and owner != conversation_id:
+            return False
+        subtree = [row[0] for row in self._db.execute(SELECT_SUBTREE, (node_id.bytes,))]
+        if not subtree:
+            return False
+
+        conversation_id = owner
+        with self.transaction():
+            self._db.executemany(DELETE_NODE_EDGES, ((key, key) for key in subtree))
+            self._db.executemany(DELETE_NODE, ((key,) for key in subtree))
+            self._db.execute(BUMP_VERSION, (conversation_id.bytes,))
+
+        partition = self._hot_partition(self._node_conversations.get(node_id))
+        if partition is not None:
+            partition.delete_node(node_id)
+        for key in subtree:
+            self._node_conversations.pop(UUID(bytes=key), None)
+        return True
+
+    def get_children(self, node_id: UUID) -> List[ConversationNode]:
+        partition = self._node_partition(node_id)
+        return partition.get_children(node_id) if partition else []
+
+    def get_ancestors(self, node_id: UUID) -> List[ConversationNode]:
+        partition = self._node_partition(node_id)
+        return partition.get_ancestors(node_id) if partition else []
+
+    def get_node_context(self, node_id: UUID) -> Optional[str]:
+        partition = self._node_partition(node_id)
+        return partition.get_node_context(node_id) if partition else None
+
+    def get_node_revision(self, node_id: UUID) -> Optional[int]:
+        partition = self._node_partition(node_id)
+        return partition.get_node_revision(node_id) if partition else None
+
+    def get_prompt_prefix(self, node_id: UUID) -> str:
+        partition = self._node_partition(node_id)
+        return partition.get_prompt_prefix(node_id) if partition else ""
+
+    def get_root(self, node_id: UUID) -> Optional[ConversationNode]:
+        partition = self._node_partition(node_id)
+        return partition.get_root(node_id) if partition else None
+
+    def get_depth(self, node_id: UUID) -> Optional[int]:
+        partition = self._node_partition(node_id)
+        return partition.get_depth(node_id) if partition else None
+
+    def lowest_common_ancestor(self, node_a_id: UUID, node_b_id: UUID) -> Optional[ConversationNode]:
+        partition = self._node_partition(node_a_id)
+        return partition.lowest_common_ancestor(node_a_id, node_b_id) if partition else None
+
+    def compare_branches(
+        self, node_a_id: UUID, node_b_id: UUID
+    ) -> Optional[Tuple[ConversationNode, List[ConversationNode], List[ConversationNode]]]:
+        partition = self._node_partition(node_a_id)
+        return partition.compare_branches(node_a_id, node_b_id) if partition else None
+
+    def get_graph_changes(self, conversation_id: UUID, since: int) -> Optional[GraphChanges]:
+        # Only changes made through this process's partition are logged
+        partition = self._partition(conversation_id)
+        return partition.get_graph_changes(conversation_id, since) if partition else None
+
+    def has_node(self, conversation_id: UUID, node_id: UUID) -> bool:
+        self._check_external_writes()
+        return self._node_conversation(node_id) == conversation_id
+
+    def get_conversation_nodes(self, conversation_id: UUID) -> List[ConversationNode]:
+        partition = self._partition(conversation_id)
+        return partition.get_conversation_nodes(conversation_id) if partition else []
+
+    def get_node_summaries(self, conversation_id: UUID) -> List[NodeSummary]:
+        partition = self._partition(conversation_id)
+        return partition.get_node_summaries(conversation_id) if partition else []
+
+    def get_graph_revisions(self, conversation_id: UUID) -> GraphRevisions:
+        partition = self._partition(conversation_id)
+        return partition.get_graph_revisions(conversation_id) if partition else GraphRevisions([], [])
+
+    def iter_conversation_records(self, conversation_id: UUID) -> Iterator[Union[ConversationNode, ConversationEdge]]:
+        partition = self._partition(conversation_id)
+        return partition.iter_conversation_records(conversation_id) if partition else iter(())
+
+    # Edge operations
+    def create_edge(self, edge: ConversationEdge) -> ConversationEdge:
+        self._db.execute(INSERT_EDGE, (
+            edge.source_node_id.bytes,
+            edge.id.bytes,
+            edge.source_node_id.bytes,
+            edge.target_node_id.bytes,
+            edge.query_text,
+            _ts(edge.created_at),
+        ))
+        partition = self._hot_partition(self._node_conversations.get(edge.source_node_id))
+        if partition is not None:
+            partition.create_edge(edge)
+        return edge
+
+    def get_edge(self, edge_id: UUID) -> Optional[ConversationEdge]:
+        row = self._db.execute(SELECT_EDGE, (edge_id.bytes,)).fetchone()
+        return _edge(row) if row else None
+
+    def get_conversation_edges(self, conversation_id: UUID) -> List[ConversationEdge]:
+        partition = self._partition(conversation_id)
+        return partition.get_conversation_edges(conversation_id) if partition else []
@@ -0,0 +1,285 @@
+"""
+Binary protocol between RemoteStore and the store server
+
+Every frame starts with a 5-byte header: the payload length (uint32) and an
+op code (requests) or a status (replies). The payload is a marshal-encoded
+tuple of plain values: models travel as tuples of their fields, UUIDs as 16
+raw bytes and datetimes as float seconds since the epoch (see records.py).
+
+The server answers the frames of a connection in order, so a client may
+send several requests before reading any reply (pipelining). Requests
+between BEGIN and COMMIT are applied as one store transaction, and no other
+connection is served until the transaction has been committed.
+"""
+import marshal
+import struct
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
+
+from ..models import Conversation, ConversationNode, ConversationEdge, NodeSummary
+from ..records import from_timestamp, to_timestamp
+from .base import GraphChanges, GraphRevisions
+
+# payload length, op code or status
+HEADER = struct.Struct("<IB")
+
+# Reply statuses
+OK = 0
+ERROR = 1
+
+
+class Codec(NamedTuple):
+    """Converts a value to its wire form and back"""
+    encode: Callable[[Any], Any]
+    decode: Callable[[Any], Any]
+
+
+def _same(value: Any) -> Any:
+    return value
+
+
+def _optional(codec: Codec) -> Codec:
+    encode, decode = codec
+    return Codec(
+        lambda value: None if value is None else encode(value),
+        lambda value: None if value is None else decode(value)
+    )
+
+
+def _list(codec: Codec) -> Codec:
+    encode, decode = codec
+    return Codec(
+        lambda values: [encode(value) for value in values],
+        lambda values: [decode(value) for value in values]
+    )
+
+
+def _uuid_bytes(value: Optional[UUID]) -> Optional[bytes]:
+    return value.bytes if value is not None else None
+
+
+def _bytes_uuid(value: Optional[bytes]) -> Optional[UUID]:
+    return UUID(bytes=value) if value is not None else None
+
+
+def _encode_conversation(conversation: Conversation) -> tuple:
+    return (
+        conversation.id.bytes,
+        conversation.title,
+        conversation.root_node_id.bytes,
+        conversation.active_node_id.bytes,
+        to_timestamp(conversation.created_at),
+        to_timestamp(conversation.updated_at),
+        conversation.version,
+    )
+
+
+def _decode_conversation(row: tuple) -> Conversation:
+    return Conversation.model_construct(
+        id=UUID(bytes=row[0]),
+        title=row[1],
+        root_node_id=UUID(bytes=row[2]),
+        active_node_id=UUID(bytes=row[3]),
+        created_at=from_timestamp(row[4]),
+        updated_at=from_timestamp(row[5]),
+        version=row[6]
+    )
+
+
+def _encode_node(node: ConversationNode) -> tuple:
+    return (
+        node.id.bytes,
+        node.conversation_id.bytes,
+        _uuid_bytes(node.parent_id),
+        node.context,
+        node.response,
+        node.query,
+        to_timestamp(node.created_at),
+        node.model,
+        node.tokens_used,
+        node.latency_ms,
+    )
+
+
+def _decode_node(row: tuple) -> ConversationNode:
+    return ConversationNode.model_construct(
+        id=UUID(bytes=row[0]),
+        conversation_id=UUID(bytes=row[1]),
+        parent_id=_bytes_uuid(row[2]),
+        context=row[3],
+        response=row[4],
+        query=row[5],
+        created_at=from_timestamp(row[6]),
+        model=row[7],
+        tokens_used=row[8],
+        latency_ms=row[9]
+    )
+
+
+def _encode_edge(edge: ConversationEdge) -> tuple:
+    return (
+        edge.id.bytes,
+        edge.source_node_id.bytes,
+        edge.target_node_id.bytes,
+        edge.query_text,
+        to_timestamp(edge.created_at),
+    )
+
+
+def _decode_edge(row: tuple) -> ConversationEdge:
+    return ConversationEdge.model_construct(
+        id=UUID(bytes=row[0]),
+        source_node_id=UUID(bytes=row[1]),
+        target_node_id=UUID(bytes=row[2]),
+        query_text=row[3],
+        created_at=from_timestamp(row[4])
+    )
+
+
+def _encode_summary(summary: NodeSummary) -> tuple:
+    return (
+        summary.id.bytes,
+        summary.conversation_id.bytes,
+        _uuid_bytes(summary.parent_id),
+        summary.query_preview,
+        summary.response_preview,
+        summary.context_preview,
+        to_timestamp(summary.created_at),
+        summary.model,
+        summary.tokens_used,
+        summary.latency_ms,
+    )
+
+
+def _decode_summary(row: tuple) -> NodeSummary:
+    return NodeSummary.model_construct(
+        id=UUID(bytes=row[0]),
+        conversation_id=UUID(bytes=row[1]),
+        parent_id=_bytes_uuid(row[2]),
+        query_preview=row[3],
+        response_preview=row[4],
+        context_preview=row[5],
+        created_at=from_timestamp(row[6]),
+        model=row[7],
+        tokens_used=row[8],
+        latency_ms=row[9]
+    )
+
+
+PLAIN = Codec(_same, _same)
+NONE = Codec(lambda value: None, lambda value: None)
+ID = Codec(_uuid_bytes, _bytes_uuid)
+TIMESTAMP = _optional(Codec(to_timestamp, from_timestamp))
+CONVERSATION = Codec(_encode_conversation, _decode_conversation)
+NODE = Codec(_encode_node, _decode_node)
+EDGE = Codec(_encode_edge, _decode_edge)
+NODES = _list(NODE)
+COMPARISON = _optional(Codec(
+    lambda value: (_encode_node(value[0]), NODES.encode(value[1]), NODES.encode(value[2])),
+    lambda value: (_decode_node(value[0]), NODES.decode(value[1]), NODES.decode(value[2]))
+))
+
+EDGES = _list(EDGE)
+SUMMARIES = _list(Codec(_encode_summary, _decode_summary))
+REVISIONS = _list(Codec(
+    lambda value: (value[0].bytes, value[1]),
+    lambda value: (UUID(bytes=value[0]), value[1])
+))
+GRAPH_REVISIONS = Codec(
+    lambda value: (REVISIONS.encode(value.nodes), REVISIONS.encode(value.edges)),
+    lambda value: GraphRevisions(REVISIONS.decode(value[0]), REVISIONS.decode(value[1]))
+)
+IDS = _list(ID)
+GRAPH_CHANGES = _optional(Codec(
+    lambda value: (
+        _encode_conversation(value.conversation), NODES.encode(value.nodes), EDGES.encode(value.edges),
+        IDS.encode(value.deleted_node_ids), IDS.encode(value.deleted_edge_ids)
+    ),
+    lambda value: GraphChanges(
+        _decode_conversation(value[0]), NODES.decode(value[1]), EDGES.decode(value[2]),
+        IDS.decode(value[3]), IDS.decode(value[4])
+    )
+))
+
+
+class Op(NamedTuple):
+    """A request type: op code, store method name, argument codecs and result codec"""
+    code: int
+    name: str
+    args: Tuple[Codec, ...]
+    result: Codec
+
+
+OPS: Dict[str, Op] = {}
+BY_CODE: List[Optional[Op]] = [None]
+
+
+def _op(name: str, args: Sequence[Codec], result: Codec) -> Op:
+    op = Op(len(BY_CODE), name, tuple(args), result)
+    OPS[name] = op
+    BY_CODE.append(op)
+    return op
+
+
+BEGIN = _op("begin", (), NONE)
+COMMIT = _op("commit", (), NONE)
+
+# Writes whose result is their argument reply with None; the client returns
+# its own argument instead of waiting for the reply
+_op("create_conversation", (CONVERSATION,), NONE)
+_op("get_conversation", (ID,), _optional(CONVERSATION))
+_op("list_conversations", (PLAIN, ID, TIMESTAMP), _list(CONVERSATION))
+_op("set_active_node", (ID, ID), _optional(CONVERSATION))
+_op("delete_conversation", (ID,), PLAIN)
+_op("fork_conversation", (ID, ID, CONVERSATION), _optional(CONVERSATION))
+_op("create_node", (NODE,), NONE)
+_op("get_node", (ID,), _optional(NODE))
+_op("complete_node", (ID, PLAIN, PLAIN, PLAIN), _optional(NODE))
+_op("delete_node", (ID, ID), PLAIN)
+_op("get_children", (ID,), NODES)
+_op("get_ancestors", (ID,), NODES)
+_op("get_node_context", (ID,), PLAIN)
+_op("get_prompt_prefix", (ID,), PLAIN)
+_op("get_root", (ID,), _optional(NODE))
+_op("get_depth", (ID,), PLAIN)
+_op("lowest_common_ancestor", (ID, ID), _optional(NODE))
+_op("compare_branches", (ID, ID), COMPARISON)
+_op("has_node", (ID, ID), PLAIN)
+_op("get_conversation_nodes", (ID,), NODES)
+_op("create_edge", (EDGE,), NONE)
+_op("get_edge", (ID,), _optional(EDGE))
+_op("get_conversation_edges", (ID,), _list(EDGE))
+_op("list_idle_conversations", (TIMESTAMP, PLAIN), _list(CONVERSATION))
+_op("trim_conversation", (ID, PLAIN, TIMESTAMP), PLAIN)
+_op("get_graph_changes", (ID, PLAIN), GRAPH_CHANGES)
+_op("get_node_summaries", (ID,), SUMMARIES)
+_op("get_node_revision", (ID,), PLAIN)
+_op("get_graph_revisions", (ID,), GRAPH_REVISIONS)
+
+
+def frame(kind: int, payload: bytes) -> bytes:
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def encode_request(op: Op, args: Sequence[Any]) -> bytes:
+    return frame(op.code, marshal.dumps(tuple(codec.encode(arg) for codec, arg in zip(op.args, args))))
+
+
+def decode_args(op: Op, payload: bytes) -> List[Any]:
+    return [codec.decode(arg) for codec, arg in zip(op.args, marshal.loads(payload))]
+
+
+def encode_reply(op: Op, result: Any) -> bytes:
+    return frame(OK, marshal.dumps(op.result.encode(result)))
+
+
+def encode_error(message: str) -> bytes:
+    return frame(ERROR, marshal.dumps(message))
+
+
+def decode_result(op: Op, payload: bytes) -> Any:
+    return op.result.decode(marshal.loads(payload))
+
+
+def decode_error(payload: bytes) -> str:
+    return marshal.loads(payload)
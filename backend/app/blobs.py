@@ -0,0 +1,125 @@
+"""
+Content-addressed text storage for InMemoryStore
+
+Root contexts are almost always one of a handful of system prompt templates,
+and regenerated branches often produce the same response twice. Instead of a
+copy per node, the store keeps each distinct context and response text once
+in a BlobTable, keyed by a digest of its content and reference counted; node
+records point at the shared Blob. A blob is dropped when the last node using
+it is deleted or leaves memory.
+
+Compression (see compression.py) happens here as well, once per distinct
+text rather than once per node. A compressed blob keeps the start of its text
+plain, so node summaries (see models.preview_of) never decompress it.
+"""
+import sys
+from hashlib import blake2b
+from typing import Dict, Optional, Union
+
+from .compression import CompressedText, StoredText, TextCodec, text_of
+from .models import PREVIEW_CHARS, preview_of
+
+# Texts shorter than this stay inline in the node record: a blob and its
+# table entry would cost more than the duplicates they save
+DEFAULT_MIN_CHARS = 64
+
+# Approximate bytes of a blob beyond its text: the Blob object, its digest
+# and the table entry
+BLOB_BYTES = 160
+
+DIGEST_SIZE = 16
+
+
+def _text_bytes(value: StoredText) -> int:
+    if value is None:
+        return 0
+    if value.__class__ is CompressedText:
+        return sys.getsizeof(value) + sys.getsizeof(value.data)
+    return sys.getsizeof(value)
+
+
+class Blob:
+    """One distinct text shared by every node record that refers to it; see text_of"""
+
+    __slots__ = ("digest", "value", "head", "refs")
+
+    def __init__(self, digest: bytes, text: str, value: StoredText):
+        self.digest = digest
+        self.refs = 0
+        self.store(text, value)
+
+    def store(self, text: str, value: StoredText) -> None:
+        """Keep `text` as `value`, its plain or compressed form"""
+        self.value = value
+        # One character past the preview tells whether it is cut
+        self.head = text[:PREVIEW_CHARS + 1] if value.__class__ is CompressedText else None
+
+    def text(self) -> Optional[str]:
+        return text_of(self.value)
+
+    def preview(self) -> str:
+        """preview_of the text, without decompressing it"""
+        head = self.head
+        return preview_of(head if head is not None else self.value)
+
+    def footprint(self) -> int:
+        """Estimated bytes this blob keeps resident"""
+        return BLOB_BYTES + _text_bytes(self.value) + _text_bytes(self.head)
+
+
+# A context or response field of a node record: inline, shared, or absent
+NodeText = Union[str, Blob, None]
+
+
+class BlobTable:
+    """Reference-counted table of distinct texts keyed by content digest"""
+
+    def __init__(self, codec: Optional[TextCodec] = None, min_chars: int = DEFAULT_MIN_CHARS):
+        """
+        Args:
+            codec: Compresses long blob text; text stays plain if None
+            min_chars: Texts shorter than this are kept inline instead
+        """
+        self._blobs: Dict[bytes, Blob] = {}
+        self._codec = codec
+        self.min_chars = min_chars
+        # Estimated resident bytes of all blobs
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def acquire(self, text: Optional[str]) -> NodeText:
+        """Get the shared blob for a text and add a reference to it"""
+        if text is None or len(text) < self.min_chars:
+            return text
+
+        digest = blake2b(text.encode(), digest_size=DIGEST_SIZE).digest()
+        blob = self._blobs.get(digest)
+        if blob is None:
+            codec = self._codec
+            blob = Blob(digest, text, codec.compress(text) if codec is not None else text)
+            self._blobs[digest] = blob
+            self.bytes += blob.footprint()
+            if codec is not None and codec.ready_to_train and codec.train():
+                self._recompress()
+        blob.refs += 1
+        return blob
+
+    def release(self, value: NodeText) -> None:
+        """Drop a node's reference to a blob, freeing it with the last one"""
+        if value.__class__ is not Blob:
+            return
+        value.refs -= 1
+        if not value.refs:
+            del self._blobs[value.digest]
+            self.bytes -= value.footprint()
+
+    def _recompress(self) -> None:
+        """Compress every blob once the codec's dictionary has been trained"""
+        codec = self._codec
+        for blob in self._blobs.values():
+            footprint = blob.footprint()
+            if blob.value.__class__ is str:
+                blob.store(blob.value, codec.compress(blob.value))
+            self.bytes += blob.footprint() - footprint
@@ -0,0 +1,64 @@
+"""
+Graph change logs for incremental sync
+
+Every change to a conversation's graph bumps its version. A ChangeLog keeps
+the ids of the node and edge records each version touched, so a client
+holding version `since` can be sent only the records changed after it.
+Records still in the graph are sent again; the others come back as
+tombstones. Logs only live in memory. A log covers the versions after its
+`base`: the version the conversation had when this process started logging
+it, moved forward as the log keeps only the last CHANGE_LOG_VERSIONS
+versions. For a `since` older than the base, clients need the full graph.
+"""
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Versions a log reaches back; a client further behind gets the full graph
+CHANGE_LOG_VERSIONS = 32
+
+
+class ChangeLog:
+    """Record ids changed per version, oldest first"""
+
+    __slots__ = ("base", "versions", "records", "edges")
+
+    def __init__(self, base: int):
+        self.base = base  # Every change after this version is logged
+        self.versions: List[int] = []
+        self.records: List[int] = []
+        self.edges = bytearray()  # 1 where the record is an edge
+
+    def add(self, version: int, node_ids: Iterable[int] = (), edge_ids: Iterable[int] = ()) -> None:
+        """Log the records a version changed, dropping versions that fell out of the window"""
+        for node_id in node_ids:
+            self.versions.append(version)
+            self.records.append(node_id)
+            self.edges.append(0)
+        for edge_id in edge_ids:
+            self.versions.append(version)
+            self.records.append(edge_id)
+            self.edges.append(1)
+
+        base = version - CHANGE_LOG_VERSIONS
+        if base > self.base:
+            self.base = base
+            if self.versions and self.versions[0] <= base:
+                cut = bisect_right(self.versions, base)
+                del self.versions[:cut]
+                del self.records[:cut]
+                del self.edges[:cut]
+
+    def since(self, version: int) -> Optional[Tuple[Dict[int, None], Dict[int, None]]]:
+        """
+        Ids of the nodes and edges changed after `version`, in the order they
+        first changed (parents before children), or None if the log does not
+        reach back that far
+        """
+        if version < self.base:
+            return None
+        nodes: Dict[int, None] = {}
+        edges: Dict[int, None] = {}
+        start = bisect_right(self.versions, version)
+        for record_id, is_edge in zip(self.records[start:], self.edges[start:]):
+            (edges if is_edge else nodes)[record_id] = None
+        return nodes, edges
@@ -0,0 +1,150 @@
+"""
+Optional zstd compression of node text held by InMemoryStore
+
+Long response and context strings are replaced in the store's blobs (see
+blobs.py) by CompressedText values once a zstd dictionary has been trained on
+the store's own text: the first `training_bytes` of eligible text are
+collected as samples, the dictionary is trained from them, and from then on
+every long text is compressed with it. Reads decompress transparently through
+a small LRU of decompressed strings so hot nodes do not pay for it on every
+access.
+
+Requires the optional `zstandard` package.
+"""
+import logging
+import threading
+from typing import List, Optional, Union
+
+from .context import MaterializedCache
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, only needed with STORE_COMPRESSION=zstd
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEVEL = 3
+DEFAULT_MIN_SIZE = 256
+DEFAULT_DICT_SIZE = 64 * 1024
+DEFAULT_TRAINING_BYTES = 4 * 1024 * 1024
+DEFAULT_CACHE_CHARS = 4 * 1024 * 1024
+
+
+class CompressedText:
+    """Compressed form of a stored string; see text_of"""
+
+    __slots__ = ("data", "codec")
+
+    def __init__(self, data: bytes, codec: "TextCodec"):
+        self.data = data
+        self.codec = codec
+
+    def text(self) -> str:
+        return self.codec.decompress(self)
+
+
+# A text field of a node record: plain, compressed, or absent
+StoredText = Union[str, CompressedText, None]
+
+
+def text_of(value: StoredText) -> Optional[str]:
+    """Get the plain string of a stored text field"""
+    if value is None or value.__class__ is str:
+        return value
+    return value.text()
+
+
+class TextCodec:
+    """zstd compressor with a dictionary trained on the first texts it sees"""
+
+    def __init__(
+        self,
+        level: int = DEFAULT_LEVEL,
+        min_size: int = DEFAULT_MIN_SIZE,
+        dict_size: int = DEFAULT_DICT_SIZE,
+        training_bytes: int = DEFAULT_TRAINING_BYTES,
+        cache_chars: int = DEFAULT_CACHE_CHARS
+    ):
+        """
+        Args:
+            level: zstd compression level
+            min_size: Texts shorter than this many characters stay plain
+            dict_size: Target size of the trained dictionary in bytes
+            training_bytes: Sample bytes collected before training the dictionary
+            cache_chars: Budget of the decompressed text LRU
+        """
+        if zstandard is None:
+            raise RuntimeError("Text compression requires the zstandard package (pip install zstandard)")
+
+        self.level = level
+        self.min_size = min_size
+        self.dict_size = dict_size
+        self.training_bytes = training_bytes
+
+        self._samples: Optional[List[bytes]] = []
+        self._sample_bytes = 0
+        self._compressor = None
+        self._dictionary = None
+
+        # Decompressors are not thread-safe; journal snapshots read from their own thread
+        self._local = threading.local()
+        self._cache = MaterializedCache(cache_chars)
+        self._cache_lock = threading.Lock()
+
+    @property
+    def trained(self) -> bool:
+        return self._compressor is not None
+
+    @property
+    def ready_to_train(self) -> bool:
+        return self._samples is not None and self._sample_bytes >= self.training_bytes
+
+    def compress(self, value: StoredText) -> StoredText:
+        """
+        Compress a long plain string. Until the dictionary is trained, strings
+        are collected as training samples and returned unchanged.
+        """
+        if value is None or value.__class__ is not str or len(value) < self.min_size:
+            return value
+
+        data = value.encode()
+        if self._compressor is None:
+            if self._samples is not None and self._sample_bytes < self.training_bytes:
+                self._samples.append(data)
+                self._sample_bytes += len(data)
+            return value
+        return CompressedText(self._compressor.compress(data), self)
+
+    def train(self) -> bool:
+        """Train the dictionary from the collected samples; returns whether it succeeded"""
+        samples, self._samples = self._samples, None
+        try:
+            self._dictionary = zstandard.train_dictionary(self.dict_size, samples)
+        except zstandard.ZstdError as e:
+            logger.warning(f"Could not train a compression dictionary, text stays uncompressed: {e}")
+            return False
+
+        self._dictionary.precompute_compress(level=self.level)
+        self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self._dictionary)
+        logger.info(
+            f"Trained a {len(self._dictionary.as_bytes())} byte compression dictionary "
+            f"from {len(samples)} text(s)"
+        )
+        return True
+
+    def decompress(self, value: CompressedText) -> str:
+        with self._cache_lock:
+            text = self._cache.get(value)
+        if text is not None:
+            return text
+
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionary)
+            self._local.decompressor = decompressor
+        text = decompressor.decompress(value.data).decode()
+
+        with self._cache_lock:
+            self._cache.put(value, text)
+        return text
@@ -0,0 +1,77 @@
+"""
+Context materialization for ConVerge
+
+Only root nodes store their context (the system prompt). A child's context
+is the root context followed by the completed turns on its ancestor path and
+finally its own query, so it is rebuilt on demand instead of being copied
+into every node.
+"""
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+TURN_SEPARATOR = "\n\n"
+# Turns in the user message sent to the LLM are separated by a single newline
+PROMPT_TURN_SEPARATOR = "\n"
+
+
+def user_turn(query: Optional[str]) -> str:
+    """Format a user query as a transcript turn"""
+    return f"User: {query}"
+
+
+def assistant_turn(response: Optional[str]) -> str:
+    """Format an LLM response as a transcript turn"""
+    return f"Assistant: {response}"
+
+
+def build_prompt(prefix: str, query: str) -> str:
+    """
+    Assemble the user message for the LLM from the cached prompt prefix of
+    the parent node (see InMemoryStore.get_prompt_prefix) and the new query.
+    """
+    turns = PROMPT_TURN_SEPARATOR.join((prefix, user_turn(query))) if prefix else user_turn(query)
+    return f"{turns}{TURN_SEPARATOR}{user_turn(query)}".strip()
+
+
+class MaterializedCache:
+    """
+    LRU cache of materialized strings, bounded by total characters (or of
+    bytes, bounded by total bytes). A limit of 0 disables caching.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.total_chars = 0
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Get a cached string and mark it as recently used"""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        """Cache a string, evicting least recently used entries when over budget"""
+        if len(value) > self.max_chars:
+            return
+        self.discard(key)
+        self._entries[key] = value
+        self.total_chars += len(value)
+        while self.total_chars > self.max_chars:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_chars -= len(evicted)
+
+    def discard(self, key: Hashable) -> None:
+        """Drop a cached string if present"""
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self.total_chars -= len(value)
+
+    def clear(self) -> None:
+        """Drop every cached string"""
+        self._entries.clear()
+        self.total_chars = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,401 @@
+"""
+Sharding front for ConVerge
+
+A small ASGI app that forwards each request to the API shard owning it
+(see sharding.py), so conversations are spread over several processes that
+each keep their own in-memory store:
+
+- /api/conversations/{id}/... (including the websocket stream) and
+  /api/nodes/{id}/... go to the shard owning the id
+- GET /api/conversations is sent to every shard and the pages are merged;
+  the cursor is passed on as a key (after + after_updated_at) because the
+  cursor conversation exists on one shard only. If every shard's first page
+  is empty, the first shard is asked again with create_default, and creates
+  the default conversation
+- POST /api/conversations/import goes to the shard owning the exported
+  conversation id, read from the first record of the body (to the shards in
+  turn with new_ids, which gives the copy an id of that shard)
+- everything else, including conversation creation, goes to the shards in
+  turn; a shard only creates conversations it owns
+
+Request bodies are streamed through as they arrive, and responses relayed as
+raw bytes; the front only decodes the first record of an import and merges
+conversation pages.
+
+Usage (from backend/), with one API process per shard started with
+SHARD_COUNT and SHARD_INDEX (see converge-shard@.service):
+    SHARD_URLS=unix:/run/converge/shard-0.sock,unix:/run/converge/shard-1.sock \\
+        uvicorn app.front:app --port 8001
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode
+from uuid import UUID
+
+import httpx
+from dotenv import load_dotenv
+from websockets.asyncio.client import connect, unix_connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from .sharding import ShardRing
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency: msgpack imports go to the shards in turn
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Connection-level headers are not forwarded in either direction
+HOP_BY_HOP = {
+    b"connection", b"keep-alive", b"proxy-connection", b"te", b"trailer",
+    b"transfer-encoding", b"upgrade", b"host",
+}
+
+IMPORT_PATH = "/api/conversations/import"
+# Query parameter values FastAPI reads as true
+TRUE_VALUES = ("1", "true", "on", "yes", "t", "y")
+# Import body bytes read at most to find the conversation record; past this
+# the import goes to the shards in turn (and fails there unless it has no id)
+IMPORT_PEEK_BYTES = 1 << 20
+
+
+class ClientDisconnected(Exception):
+    """The client went away while its request body was being forwarded"""
+
+
+class Shard:
+    """HTTP and websocket connections to one API shard"""
+
+    def __init__(self, url: str):
+        """
+        Args:
+            url: http://host:port or unix:/path/to/socket
+        """
+        self.url = url
+        if url.startswith("unix:"):
+            self._socket: Optional[str] = url[len("unix:"):]
+            self._ws_base = "ws://shard"
+            self.client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self._socket),
+                base_url="http://shard",
+                timeout=60.0
+            )
+        else:
+            self._socket = None
+            self._ws_base = "ws" + url[len("http"):]
+            self.client = httpx.AsyncClient(base_url=url, timeout=60.0)
+
+    def connect_websocket(self, path: str):
+        """Open a websocket to `path` on the shard (awaitable)"""
+        if self._socket is not None:
+            return unix_connect(self._socket, self._ws_base + path, max_size=None)
+        return connect(self._ws_base + path, max_size=None)
+
+
+def _route_id(path: str) -> Optional[UUID]:
+    """The conversation or node id that decides the shard for a path"""
+    parts = path.split("/", 4)
+    # ["", "api", "conversations" | "nodes", id, ...]
+    if len(parts) >= 4 and parts[1] == "api" and parts[2] in ("conversations", "nodes"):
+        try:
+            return UUID(parts[3])
+        except ValueError:
+            return None
+    return None
+
+
+def _export_id(data: bytes, format: str, complete: bool) -> Tuple[bool, Optional[UUID]]:
+    """
+    Read the conversation record an export starts with: whether the first
+    record could be read from `data` (all of the body if `complete`), and
+    the conversation id it holds, if any
+    """
+    if format == "msgpack":
+        if msgpack is None:
+            return True, None
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(data)
+        try:
+            record = next(unpacker)
+        except StopIteration:
+            return complete, None
+        except ValueError:  # Not msgpack; the shard rejects it
+            return True, None
+    else:
+        lines = data.split(b"\n")
+        if not complete:
+            lines.pop()  # Still arriving
+        line = next((line for line in lines if line.strip()), None)
+        if line is None:
+            return complete, None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return True, None
+    if not isinstance(record, dict) or record.get("type") != "conversation":
+        return True, None
+    try:
+        return True, UUID(str(record["id"]))
+    except (KeyError, ValueError):
+        return True, None
+
+
+def _page_key(conversation: Dict[str, Any]) -> Tuple[datetime, int]:
+    """Sort key of the conversation list: updated_at, then id"""
+    return datetime.fromisoformat(conversation["updated_at"]), UUID(conversation["id"]).int
+
+
+class ShardFront:
+    """ASGI app routing requests to shards by conversation id"""
+
+    def __init__(self, urls: List[str]):
+        if not urls:
+            raise ValueError("SHARD_URLS lists no shards")
+        self.shards = [Shard(url) for url in urls]
+        self.ring = ShardRing(len(self.shards))
+        self._turn = count()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+
+    def _shard_for(self, path: str) -> Shard:
+        route_id = _route_id(path)
+        if route_id is None:
+            return self.shards[next(self._turn) % len(self.shards)]
+        return self.shards[self.ring.shard_for(route_id)]
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                logger.info(f"🔀 Sharding front over {len(self.shards)} shards")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for shard in self.shards:
+                    await shard.client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # HTTP
+    async def _http(self, scope, receive, send) -> None:
+        path = scope["path"]
+        if path == "/api/conversations" and scope["method"] == "GET":
+            await self._list_conversations(scope, send)
+            return
+
+        try:
+            message = await self._receive_body(receive)
+            chunks = [message.get("body", b"")]
+            more = message.get("more_body", False)
+            if path == IMPORT_PATH and scope["method"] == "POST":
+                route_id, more = await self._read_export_id(scope, chunks, more, receive)
+                shard = self.shards[self.ring.shard_for(route_id)] if route_id else self._shard_for(path)
+            else:
+                shard = self._shard_for(path)
+
+            query = scope["query_string"].decode("latin-1")
+            request = shard.client.build_request(
+                scope["method"],
+                path + ("?" + query if query else ""),
+                headers=[(k, v) for k, v in scope["headers"] if k not in HOP_BY_HOP],
+                # Bodies still arriving are streamed to the shard as they come
+                content=self._stream_body(chunks, receive) if more else b"".join(chunks)
+            )
+            try:
+                response = await shard.client.send(request, stream=True)
+            except httpx.TransportError as e:
+                logger.error(f"❌ Shard {shard.url} unavailable: {e}")
+                await self._send_json(send, 502, {"detail": "Shard unavailable"})
+                return
+        except ClientDisconnected:
+            return
+
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(k, v) for k, v in response.headers.raw if k.lower() not in HOP_BY_HOP],
+            })
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await response.aclose()
+
+    @staticmethod
+    async def _receive_body(receive) -> Dict[str, Any]:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected()
+        return message
+
+    async def _stream_body(self, chunks: List[bytes], receive) -> AsyncIterator[bytes]:
+        """The chunks already read, then the rest of the body as it arrives"""
+        for chunk in chunks:
+            yield chunk
+        while True:
+            message = await self._receive_body(receive)
+            yield message.get("body", b"")
+            if not message.get("more_body"):
+                return
+
+    async def _read_export_id(self, scope, chunks: List[bytes], more: bool, receive) -> Tuple[Optional[UUID], bool]:
+        """
+        Read an import body up to its conversation record, appending to
+        `chunks`; returns the exported conversation id (None if the import
+        may go to any shard) and whether more of the body is to come
+        """
+        params = {k: v[-1] for k, v in parse_qs(scope["query_string"].decode("latin-1")).items()}
+        if params.get("new_ids", "").lower() in TRUE_VALUES:
+            return None, more
+        format = params.get("format", "ndjson")
+        size = sum(map(len, chunks))
+        while True:
+            done, route_id = _export_id(b"".join(chunks), format, not more)
+            if done or not more or size > IMPORT_PEEK_BYTES:
+                return route_id, more
+            message = await self._receive_body(receive)
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more = message.get("more_body", False)
+
+    async def _list_conversations(self, scope, send) -> None:
+        """Merge one page from every shard into a single page"""
+        params = {k: v[-1] for k, v in parse_qs(scope["query_string"].decode("latin-1")).items()}
+        headers = [(k, v) for k, v in scope["headers"] if k not in HOP_BY_HOP]
+
+        # Shards only create the default conversation when asked (see below)
+        create_default = params.pop("create_default", "true").lower() in TRUE_VALUES
+        after = params.get("after")
+        if after is not None and "after_updated_at" not in params:
+            try:
+                cursor_id = UUID(after)
+            except ValueError:
+                cursor_id = None  # Every shard rejects the malformed id with 422
+            if cursor_id is not None:
+                # Only the owning shard knows the cursor's updated_at
+                cursor_shard = self.shards[self.ring.shard_for(cursor_id)]
+                try:
+                    # Without the client's If-None-Match, which would turn this into a 304
+                    cursor = await cursor_shard.client.get(f"/api/conversations/{cursor_id}", headers=[
+                        (k, v) for k, v in headers if k != b"if-none-match"
+                    ])
+                except httpx.TransportError:
+                    await self._send_json(send, 502, {"detail": "Shard unavailable"})
+                    return
+                if cursor.status_code != 200:
+                    await self._send_json(send, 400, {"detail": "Unknown cursor conversation"})
+                    return
+                params["after_updated_at"] = cursor.json()["updated_at"]
+
+        query = "/api/conversations?" + urlencode(params)
+        try:
+            responses = await asyncio.gather(*(
+                shard.client.get(query, headers=headers) for shard in self.shards
+            ))
+        except httpx.TransportError:
+            await self._send_json(send, 502, {"detail": "Shard unavailable"})
+            return
+
+        for response in responses:
+            if response.status_code != 200:
+                await self._send_json(send, response.status_code, response.json())
+                return
+
+        # Each shard's page is already sorted, most recently updated first
+        merged = list(heapq.merge(*(response.json() for response in responses), key=_page_key, reverse=True))
+        if not merged and after is None and create_default:
+            # No conversation on any shard: only now may one shard create the default
+            params["create_default"] = "true"
+            try:
+                response = await self.shards[0].client.get(
+                    "/api/conversations?" + urlencode(params), headers=headers
+                )
+            except httpx.TransportError:
+                await self._send_json(send, 502, {"detail": "Shard unavailable"})
+                return
+            if response.status_code != 200:
+                await self._send_json(send, response.status_code, response.json())
+                return
+            responses = [response]
+            merged = response.json()
+        if "limit" in params:
+            merged = merged[:int(params["limit"])]
+        await self._send_json(send, 200, merged, responses[0].headers.raw)
+
+    @staticmethod
+    async def _send_json(send, status: int, content: Any, upstream_headers=()) -> None:
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+        # Keep the shard's CORS headers; length and encoding describe the new body
+        headers = [
+            (k, v) for k, v in upstream_headers
+            if k.lower() not in HOP_BY_HOP and k.lower() not in (b"content-length", b"content-encoding")
+        ]
+        if not upstream_headers:
+            headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    # Websocket
+    async def _websocket(self, scope, receive, send) -> None:
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+
+        shard = self._shard_for(scope["path"])
+        query = scope["query_string"].decode("latin-1")
+        try:
+            upstream = await shard.connect_websocket(scope["path"] + ("?" + query if query else ""))
+        except (OSError, InvalidHandshake) as e:
+            logger.error(f"❌ Shard {shard.url} refused websocket: {e}")
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        await send({"type": "websocket.accept"})
+
+        async def client_to_shard():
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                data = message.get("text")
+                await upstream.send(data if data is not None else message.get("bytes"))
+
+        async def shard_to_client():
+            try:
+                async for data in upstream:
+                    key = "text" if isinstance(data, str) else "bytes"
+                    await send({"type": "websocket.send", key: data})
+            except ConnectionClosed:
+                pass
+            await send({"type": "websocket.close", "code": upstream.close_code or 1000})
+
+        tasks = [asyncio.create_task(client_to_shard()), asyncio.create_task(shard_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await upstream.close()
+
+
+def _shard_urls_from_env() -> List[str]:
+    load_dotenv(dotenv_path=Path(__file__).parent.parent.parent / '.env')
+    return [url.strip() for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()]
+
+
+app = ShardFront(_shard_urls_from_env())
@@ -3,6 +3,7 @@ ConVerge FastAPI Application (In-Memory)
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import os
 import logging
@@ -10,6 +11,9 @@ import time
 from pathlib import Path
 
 from .api import conversations, nodes
+from .backends import ConflictError
+from .services import create_collector
+from .store import store
 
 # Configure logging
 logging.basicConfig(
@@ -42,7 +46,7 @@ async def log_requests(request: Request, call_next):
     # Only log essential headers to avoid truncation in quick tunnels
     essential_headers = {
         k: v for k, v in dict(request.headers).items()
-        if k.lower() in ['content-type', 'content-length', 'origin', 'user-agent']
+        if k.lower() in ['content-type', 'content-length', 'origin', 'user-agent', 'if-none-match']
     }
     logger.info(f"  Headers: {essential_headers}")
 
@@ -68,7 +72,8 @@ async def log_requests(request: Request, call_next):
         # Keep only essential headers
         if header.lower() not in [
             'content-type', 'content-length', 'access-control-allow-origin',
-            'access-control-allow-methods', 'access-control-allow-headers'
+            'access-control-allow-methods', 'access-control-allow-headers',
+            'etag', 'cache-control', 'content-disposition'
         ]:
             headers_to_remove.append(header)
 
@@ -94,6 +99,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(ConflictError)
+async def conflict_error(request: Request, exc: ConflictError):
+    """A shared store rejected a write because another API process got there first"""
+    logger.warning(f"❌ Write conflict on {request.url.path}: {exc}")
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
 # Include routers
 logger.info("Including conversation and node routers")
 app.include_router(conversations.router)
@@ -119,6 +130,10 @@ async def health():
     return {"status": "healthy"}
 
 
+# Deletes idle conversations in the background (None unless CONVERSATION_TTL_HOURS is set)
+collector = create_collector(store)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Log application startup"""
@@ -127,4 +142,14 @@ async def startup_event():
     logger.info(f"CORS Origins: {os.getenv('CORS_ORIGINS', 'http://localhost:5173')}")
     logger.info(f"OpenRouter API Key: {'Set' if os.getenv('OPENROUTER_API_KEY') else 'NOT SET'}")
     logger.info(f"Default Model: {os.getenv('DEFAULT_MODEL', 'google/gemma-2-9b-it:free')}")
+    logger.info(f"Conversation TTL: {f'{collector.ttl} idle' if collector else 'none'}")
     logger.info("=" * 60)
+    if collector is not None:
+        collector.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks"""
+    if collector is not None:
+        await collector.stop()
@@ -5,16 +5,28 @@ from datetime import datetime
 from typing import Optional
 from uuid import UUID, uuid4
 from pydantic import BaseModel, Field
+from .sharding import new_conversation_id, new_node_id
+
+# Characters of a text kept in node summaries
+PREVIEW_CHARS = 200
+
+
+def preview_of(text: Optional[str]) -> Optional[str]:
+    """The text itself if it is short, else its first PREVIEW_CHARS characters and an ellipsis"""
+    if text is None or len(text) <= PREVIEW_CHARS:
+        return text
+    return text[:PREVIEW_CHARS] + "…"
 
 
 class ConversationNode(BaseModel):
     """A node in the conversation graph"""
-    id: UUID = Field(default_factory=uuid4)
     conversation_id: UUID
+    # Declared after conversation_id: the default id shares its shard prefix
+    id: UUID = Field(default_factory=lambda data: new_node_id(data["conversation_id"]))
     parent_id: Optional[UUID] = None
 
     # Core ConVerge data
-    context: str  # Full materialized context
+    context: Optional[str] = None  # Root system prompt; child contexts are materialized by the store
     response: Optional[str] = None  # LLM response
     query: Optional[str] = None  # User query that created this node
 
@@ -31,6 +43,41 @@ class ConversationNode(BaseModel):
         }
 
 
+class NodeSummary(BaseModel):
+    """A node without its full texts, for drawing the graph"""
+    id: UUID
+    conversation_id: UUID
+    parent_id: Optional[UUID] = None
+    query_preview: Optional[str] = None
+    response_preview: Optional[str] = None
+    context_preview: Optional[str] = None  # Only for nodes with their own context (the root)
+    created_at: datetime
+    model: Optional[str] = None
+    tokens_used: Optional[int] = None
+    latency_ms: Optional[int] = None
+
+    class Config:
+        json_encoders = {
+            UUID: str,
+            datetime: lambda v: v.isoformat()
+        }
+
+    @classmethod
+    def from_node(cls, node: ConversationNode) -> "NodeSummary":
+        return cls(
+            id=node.id,
+            conversation_id=node.conversation_id,
+            parent_id=node.parent_id,
+            query_preview=preview_of(node.query),
+            response_preview=preview_of(node.response),
+            context_preview=preview_of(node.context),
+            created_at=node.created_at,
+            model=node.model,
+            tokens_used=node.tokens_used,
+            latency_ms=node.latency_ms
+        )
+
+
 class ConversationEdge(BaseModel):
     """An edge connecting two nodes (represents a query transition)"""
     id: UUID = Field(default_factory=uuid4)
@@ -48,12 +95,13 @@ class ConversationEdge(BaseModel):
 
 class Conversation(BaseModel):
     """A conversation containing a graph of nodes"""
-    id: UUID = Field(default_factory=uuid4)
+    id: UUID = Field(default_factory=new_conversation_id)
     title: str = "New Conversation"
     root_node_id: UUID
     active_node_id: UUID  # Currently selected node
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    version: int = 0  # Bumped by every node creation, completion, deletion and selection
 
     class Config:
         json_encoders = {
@@ -0,0 +1,390 @@
+"""
+Append-only write-ahead journal for InMemoryStore
+
+Every store mutation is encoded as one JSON line and handed to a background
+writer thread, which appends everything queued since its last flush with a
+single write + fsync (group commit). The event loop never waits for the disk;
+a crash can lose at most the writes queued since the last fsync.
+
+The journal is split into numbered segments (wal-<seq>.log). Every
+`snapshot_every` records the store state is captured, the journal rotates to
+a new segment, and a background thread writes a binary snapshot-<seq>.snap
+(see persistence.snapshot), after which older segments and snapshots are
+deleted. Replayed operations are not idempotent (completing a node twice
+bumps its conversation's version twice), so no record may be replayed over a
+snapshot that already contains it: the state is captured and the rotation
+queued in the same step, on the store's thread, and never inside a batch
+(whose line is only queued when it ends). Every record queued before the
+capture lands in an older segment and every record after it in the
+snapshot's own segment, which is the first one replayed.
+
+On startup the newest snapshot is memory-mapped and its conversations are
+attached to the store as a cold tier, decoded only when first accessed; the
+segments after it are then replayed.
+
+If a write or fsync fails (a full disk, say), the writer stops and logs the
+error, and every later append and flush raises JournalError: nothing is
+queued that could never be written, and no caller takes a lost record for
+durable.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from ..models import Conversation, ConversationNode, ConversationEdge
+from .snapshot import MappedSnapshot, write_snapshot
+from .tier import ConversationState
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".snap"
+
+
+def _file_seq(path: Path, prefix: str, suffix: str) -> Optional[int]:
+    name = path.name
+    if not (name.startswith(prefix) and name.endswith(suffix)):
+        return None
+    try:
+        return int(name[len(prefix):-len(suffix)])
+    except ValueError:
+        return None
+
+
+class JournalError(RuntimeError):
+    """The journal could not write to disk; the store can no longer persist writes"""
+
+
+class _Rotate:
+    """Marker queued between records: switch to a new segment"""
+
+    def __init__(self, seq: int):
+        self.seq = seq
+
+
+class Journal:
+    """Write-ahead journal with group-commit fsync and periodic snapshots"""
+
+    def __init__(self, directory: str, snapshot_every: int = 100_000, commit_interval: float = 0.005):
+        """
+        Args:
+            directory: Where segments and snapshots are kept (created if missing)
+            snapshot_every: Number of records between compacted snapshots
+            commit_interval: Seconds the writer lets records accumulate before
+                each write + fsync (the group-commit window)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = snapshot_every
+        self.commit_interval = commit_interval
+
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._batch: Optional[List[Dict[str, Any]]] = None
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+        # Writer thread state, guarded by _cond
+        self._cond = threading.Condition()
+        self._pending: List[Any] = []
+        self._appended = 0
+        self._durable = 0
+        self._closing = False
+        self._error: Optional[Exception] = None  # Stopped the writer
+        self._writer: Optional[threading.Thread] = None
+        self._file = None
+
+    # Startup
+    def attach(self, store) -> None:
+        """Recover the store from disk, then log all of its future mutations"""
+        store.journal = None
+        self.recover(store)
+        store.journal = self
+
+        self._seq += 1
+        self._file = open(self._segment_path(self._seq), "ab")
+        self._writer = threading.Thread(target=self._run, name="store-journal", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def recover(self, store) -> None:
+        """Map the newest snapshot and replay the segments written after it"""
+        snapshots = self._files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+        segments = self._files(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+
+        start = 0
+        if snapshots:
+            start, snapshot_path = snapshots[-1]
+            tier = MappedSnapshot(snapshot_path)
+            for conversation in tier.conversations:
+                store.attach_cold(conversation, tier)
+            self._seq = start
+
+        replayed = 0
+        for seq, segment_path in segments:
+            if seq < start:
+                continue
+            for record in self._read_lines(segment_path):
+                apply_record(store, record)
+                replayed += 1
+            self._seq = max(self._seq, seq)
+
+        self._records_since_snapshot = replayed
+        logger.info(
+            f"Recovered store from {self.directory}: snapshot {start or 'none'}, "
+            f"{replayed} journal record(s) replayed"
+        )
+
+    # Logging
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Log every record inside the block as one atomic line"""
+        if self._batch is not None:
+            yield
+            return
+
+        self._batch = []
+        try:
+            yield
+        finally:
+            records, self._batch = self._batch, None
+            if records:
+                self._enqueue({"op": "batch", "records": records}, len(records))
+
+    def append(self, op: str, **fields: Any) -> None:
+        """Queue a record for the writer thread"""
+        record = {"op": op, **fields}
+        if self._batch is not None:
+            self._batch.append(record)
+        else:
+            self._enqueue(record, 1)
+
+    def snapshot_due(self) -> bool:
+        """Whether enough records have accumulated since the last snapshot"""
+        return (
+            self._batch is None
+            and self._snapshot_thread is None
+            and self._records_since_snapshot >= self.snapshot_every
+        )
+
+    def _enqueue(self, record: Dict[str, Any], count: int) -> None:
+        line = encode_record(record).encode() + b"\n"
+        with self._cond:
+            self._raise_error()
+            self._pending.append(line)
+            self._appended += 1
+            if len(self._pending) == 1:
+                self._cond.notify()
+        self._records_since_snapshot += count
+
+    def flush(self) -> None:
+        """Block until every queued record has been fsynced"""
+        with self._cond:
+            target = self._appended
+            while self._durable < target and self._writer is not None and self._writer.is_alive():
+                self._cond.wait(timeout=1.0)
+            self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise JournalError(f"Store journal write failed: {self._error}") from self._error
+
+    def close(self) -> None:
+        """Flush outstanding records and stop the writer thread"""
+        snapshot_thread = self._snapshot_thread
+        if snapshot_thread is not None:
+            snapshot_thread.join()
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+    def _run(self) -> None:
+        """Writer thread: group-commit queued records with one fsync per round"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._closing:
+                    # Let concurrent writes join this commit group
+                    self._cond.wait(timeout=self.commit_interval)
+                items, self._pending = self._pending, []
+                closing = self._closing
+
+            try:
+                written = self._commit(items)
+            except Exception as e:
+                logger.error(f"Store journal write failed, no further writes are persisted: {e}")
+                with self._cond:
+                    self._error = e
+                    self._pending = []
+                    self._cond.notify_all()
+                try:
+                    self._file.close()
+                except OSError:
+                    pass  # Its buffer may not fit on the disk either
+                return
+
+            with self._cond:
+                self._durable += written
+                self._cond.notify_all()
+                if closing and not self._pending:
+                    self._file.close()
+                    return
+
+    def _commit(self, items: List[Any]) -> int:
+        """Write queued lines and rotations in order; returns the number of lines"""
+        written = 0
+        chunk: List[bytes] = []
+        for item in items:
+            if isinstance(item, _Rotate):
+                self._write(chunk)
+                chunk = []
+                self._file.close()
+                self._file = open(self._segment_path(item.seq), "ab")
+            else:
+                chunk.append(item)
+                written += 1
+        self._write(chunk)
+        return written
+
+    def _write(self, chunk: List[bytes]) -> None:
+        if not chunk:
+            return
+        self._file.write(b"".join(chunk))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    # Snapshots
+    def snapshot(self, state: List[ConversationState]) -> None:
+        """
+        Rotate to a new segment and write a compacted snapshot of `state`
+        in the background. `state` must be captured on the caller's thread
+        at the moment of the call.
+        """
+        if self._snapshot_thread is not None:
+            return
+
+        self._seq += 1
+        seq = self._seq
+        with self._cond:
+            self._pending.append(_Rotate(seq))
+            self._cond.notify()
+        self._records_since_snapshot = 0
+
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot, args=(seq, state), name="store-snapshot", daemon=True
+        )
+        self._snapshot_thread.start()
+
+    def _write_snapshot(self, seq: int, state: List[ConversationState]) -> None:
+        path = self._snapshot_path(seq)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            nodes = write_snapshot(tmp_path, state)
+            os.replace(tmp_path, path)
+
+            # Everything before this snapshot's segment is now redundant. A mapped
+            # older snapshot stays readable after unlinking until it is unmapped
+            for old_seq, old_path in self._files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX):
+                if old_seq < seq:
+                    old_path.unlink()
+            for old_seq, old_path in self._files(SEGMENT_PREFIX, SEGMENT_SUFFIX):
+                if old_seq < seq:
+                    old_path.unlink()
+            logger.info(f"Wrote store snapshot {path.name}: {nodes} node(s)")
+        except OSError as e:
+            logger.error(f"Store snapshot {seq} failed: {e}")
+        finally:
+            self._snapshot_thread = None
+
+    # Files
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{SEGMENT_PREFIX}{seq:08d}{SEGMENT_SUFFIX}"
+
+    def _snapshot_path(self, seq: int) -> Path:
+        return self.directory / f"{SNAPSHOT_PREFIX}{seq:08d}{SNAPSHOT_SUFFIX}"
+
+    def _files(self, prefix: str, suffix: str) -> List[Tuple[int, Path]]:
+        files = []
+        for path in self.directory.iterdir():
+            seq = _file_seq(path, prefix, suffix)
+            if seq is not None:
+                files.append((seq, path))
+        return sorted(files)
+
+    @staticmethod
+    def _read_lines(path: Path) -> Iterator[Dict[str, Any]]:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Torn write at the tail of the last segment
+                    logger.warning(f"Skipping unreadable journal record in {path.name}")
+
+
+def encode_record(record: Dict[str, Any]) -> str:
+    """
+    Encode a record as one JSON object. Models are serialized with pydantic's
+    native JSON encoder instead of being dumped to dicts first.
+    """
+    fields = []
+    for key, value in record.items():
+        if isinstance(value, BaseModel):
+            encoded = value.model_dump_json()
+        elif key == "records":
+            encoded = "[" + ",".join(encode_record(inner) for inner in value) + "]"
+        else:
+            encoded = json.dumps(value)
+        fields.append(f'"{key}":{encoded}')
+    return "{" + ",".join(fields) + "}"
+
+
+def apply_record(store, record: Dict[str, Any]) -> None:
+    """Replay one journal record against a store"""
+    op = record["op"]
+    if op == "batch":
+        for inner in record["records"]:
+            apply_record(store, inner)
+    elif op == "create_conversation":
+        store.create_conversation(Conversation.model_validate(record["conversation"]))
+    elif op == "create_node":
+        store.create_node(ConversationNode.model_validate(record["node"]))
+    elif op == "create_edge":
+        store.create_edge(ConversationEdge.model_validate(record["edge"]))
+    elif op == "complete_node":
+        store.complete_node(
+            UUID(record["node_id"]), record["response"], record["latency_ms"], record["model"]
+        )
+    elif op == "set_active_node":
+        store.set_active_node(
+            UUID(record["conversation_id"]),
+            UUID(record["node_id"]),
+            updated_at=datetime.fromisoformat(record["updated_at"])
+        )
+    elif op == "delete_node":
+        conversation_id = record.get("conversation_id")
+        store.delete_node(UUID(record["node_id"]), UUID(conversation_id) if conversation_id else None)
+    elif op == "delete_conversation":
+        store.delete_conversation(UUID(record["conversation_id"]))
+    elif op == "fork_conversation":
+        store.fork_conversation(
+            UUID(record["conversation_id"]),
+            UUID(record["node_id"]),
+            Conversation.model_validate(record["conversation"])
+        )
+    else:
+        logger.warning(f"Skipping unknown journal record: {op}")
@@ -0,0 +1,281 @@
+"""
+Binary store snapshots that are memory-mapped and decoded lazily
+
+Layout (little-endian, offsets are absolute):
+
+    header        magic, record counts and table offsets
+    string heap   UTF-8 text (titles, contexts, queries, responses, models)
+    conversations fixed-width records, each with the range of its nodes/edges
+    node index    (node id, conversation ordinal) sorted by node id
+    nodes         fixed-width records grouped by conversation, parents first
+    edges         fixed-width records grouped by conversation
+
+Ids are raw 16-byte UUIDs, timestamps are microseconds since the epoch and
+text fields are (offset, length) references into the heap; nodes sharing a
+text blob (see blobs.py) share one copy of it in the heap. Opening a snapshot
+decodes only the conversation table; the nodes, edges and text of a
+conversation are decoded the first time it is loaded, so cold start cost is
+proportional to the number of conversations rather than to the data size.
+"""
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..blobs import Blob, NodeText
+from ..records import ConversationRecord, EdgeRecord, NodeRecord
+from .tier import ConversationData, ConversationState
+
+MAGIC = b"CVSNAP02"
+
+# magic, conversation/node/edge counts, conversation/index/node/edge table offsets
+HEADER = struct.Struct("<8sQQQQQQQ")
+# id, root, active, created, updated, title, node range, edge range, version
+CONVERSATION = struct.Struct("<16s16s16sqqQIQIQIQ")
+# id, conversation, parent, created, tokens, latency, context, response, query, model
+NODE = struct.Struct("<16s16s16sqqqQIQIQIQI")
+# id, source, target, created, query text
+EDGE = struct.Struct("<16s16s16sqQI")
+# node id, conversation ordinal
+INDEX = struct.Struct("<16sQ")
+
+NO_ID = bytes(16)
+NO_INT = -1
+NO_TEXT = 0xFFFFFFFF
+
+
+def _micros(timestamp: float) -> int:
+    return round(timestamp * 1_000_000)
+
+
+def _timestamp(micros: int) -> float:
+    return micros / 1_000_000
+
+
+def _id_bytes(value: int) -> bytes:
+    return value.to_bytes(16, "big")
+
+
+def _id(data: bytes) -> int:
+    return int.from_bytes(data, "big")
+
+
+class _Heap:
+    """Appends strings to the snapshot file and hands out references to them"""
+
+    def __init__(self, f: BinaryIO, offset: int):
+        self._f = f
+        self.offset = offset
+        # Blob digest -> reference, so shared text is written once
+        self._shared: Dict[bytes, Tuple[int, int]] = {}
+
+    def add(self, text: Optional[str]) -> Tuple[int, int]:
+        if text is None:
+            return 0, NO_TEXT
+        data = text.encode()
+        ref = (self.offset, len(data))
+        self._f.write(data)
+        self.offset += len(data)
+        return ref
+
+    def add_node_text(self, value: NodeText) -> Tuple[int, int]:
+        if value.__class__ is not Blob:
+            return self.add(value)
+        ref = self._shared.get(value.digest)
+        if ref is None:
+            ref = self._shared[value.digest] = self.add(value.text())
+        return ref
+
+
+def write_snapshot(path: Path, state: Iterable[ConversationState]) -> int:
+    """
+    Write a snapshot of `state` to `path` and fsync it.
+    Conversations are loaded one at a time, so cold ones are never all in
+    memory at once. Returns the number of nodes written.
+    """
+    conversations = bytearray()
+    index: List[bytes] = []
+    node_count = edge_count = 0
+
+    with open(path, "wb") as f, \
+            tempfile.TemporaryFile(dir=path.parent) as node_table, \
+            tempfile.TemporaryFile(dir=path.parent) as edge_table:
+        f.write(bytes(HEADER.size))
+        heap = _Heap(f, HEADER.size)
+
+        for ordinal, (conversation, loader) in enumerate(state):
+            nodes, edges = loader()
+            for node in nodes:
+                node_table.write(NODE.pack(
+                    _id_bytes(node.id),
+                    _id_bytes(node.conversation_id),
+                    _id_bytes(node.parent_id) if node.parent_id is not None else NO_ID,
+                    _micros(node.created_at),
+                    node.tokens_used if node.tokens_used is not None else NO_INT,
+                    node.latency_ms if node.latency_ms is not None else NO_INT,
+                    *heap.add_node_text(node.context),
+                    *heap.add_node_text(node.response),
+                    *heap.add(node.query),
+                    *heap.add(node.model)
+                ))
+                index.append(INDEX.pack(_id_bytes(node.id), ordinal))
+            for edge in edges:
+                edge_table.write(EDGE.pack(
+                    _id_bytes(edge.id),
+                    _id_bytes(edge.source_node_id),
+                    _id_bytes(edge.target_node_id),
+                    _micros(edge.created_at),
+                    *heap.add(edge.query_text)
+                ))
+            conversations += CONVERSATION.pack(
+                _id_bytes(conversation.id),
+                _id_bytes(conversation.root_node_id),
+                _id_bytes(conversation.active_node_id),
+                _micros(conversation.created_at),
+                _micros(conversation.updated_at),
+                *heap.add(conversation.title),
+                node_count, len(nodes),
+                edge_count, len(edges),
+                conversation.version
+            )
+            node_count += len(nodes)
+            edge_count += len(edges)
+
+        conversation_offset = heap.offset
+        f.write(conversations)
+        index_offset = conversation_offset + len(conversations)
+        index.sort()
+        f.write(b"".join(index))
+        node_offset = index_offset + len(index) * INDEX.size
+        node_table.seek(0)
+        shutil.copyfileobj(node_table, f)
+        edge_offset = node_offset + node_count * NODE.size
+        edge_table.seek(0)
+        shutil.copyfileobj(edge_table, f)
+
+        f.seek(0)
+        f.write(HEADER.pack(
+            MAGIC, len(conversations) // CONVERSATION.size, node_count, edge_count,
+            conversation_offset, index_offset, node_offset, edge_offset
+        ))
+        f.flush()
+        os.fsync(f.fileno())
+
+    return node_count
+
+
+class MappedSnapshot:
+    """
+    A snapshot file mapped into memory, usable as a cold tier of InMemoryStore.
+    Decoded records are never cached here; once loaded, a conversation lives
+    in the store.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, conversation_count, self._node_count, _,
+         conversation_offset, self._index_offset, self._node_offset,
+         self._edge_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path.name} is not a store snapshot")
+
+        self.conversations: List[ConversationRecord] = []
+        self._ordinals: List[int] = []
+        self._released: Set[int] = set()
+        self._ranges: Dict[int, Tuple[int, int, int, int]] = {}
+        for (conversation_id, root_id, active_id, created, updated,
+             title_offset, title_length, node_start, nodes, edge_start, edges, version) in \
+                CONVERSATION.iter_unpack(self._mm[
+                    conversation_offset:conversation_offset + conversation_count * CONVERSATION.size
+                ]):
+            conversation = ConversationRecord(
+                _id(conversation_id),
+                self._text(title_offset, title_length),
+                _id(root_id),
+                _id(active_id),
+                _timestamp(created),
+                _timestamp(updated),
+                version
+            )
+            self.conversations.append(conversation)
+            self._ordinals.append(conversation.id)
+            self._ranges[conversation.id] = (node_start, nodes, edge_start, edges)
+
+    def locate_node(self, node_id: int) -> Optional[int]:
+        """Binary-search the node index for a conversation containing a node"""
+        key = _id_bytes(node_id)
+        low, high = 0, self._node_count
+        while low < high:
+            middle = (low + high) // 2
+            entry_id, _ = INDEX.unpack_from(self._mm, self._index_offset + middle * INDEX.size)
+            if entry_id < key:
+                low = middle + 1
+            else:
+                high = middle
+        # Forks list a shared node once per conversation; skip those already loaded or deleted
+        while low < self._node_count:
+            entry_id, ordinal = INDEX.unpack_from(self._mm, self._index_offset + low * INDEX.size)
+            if entry_id != key:
+                break
+            conversation_id = self._ordinals[ordinal]
+            if conversation_id not in self._released:
+                return conversation_id
+            low += 1
+        return None
+
+    def load(self, conversation_id: int) -> ConversationData:
+        """Decode the nodes and edges of a conversation"""
+        node_start, node_count, edge_start, edge_count = self._ranges[conversation_id]
+        text = self._text
+
+        nodes = []
+        start = self._node_offset + node_start * NODE.size
+        for (node_id, _, parent_id, created, tokens, latency,
+             context_offset, context_length, response_offset, response_length,
+             query_offset, query_length, model_offset, model_length) in \
+                NODE.iter_unpack(self._mm[start:start + node_count * NODE.size]):
+            nodes.append(NodeRecord(
+                _id(node_id),
+                conversation_id,
+                _id(parent_id) if parent_id != NO_ID else None,
+                text(context_offset, context_length),
+                text(response_offset, response_length),
+                text(query_offset, query_length),
+                _timestamp(created),
+                text(model_offset, model_length),
+                tokens if tokens != NO_INT else None,
+                latency if latency != NO_INT else None
+            ))
+
+        edges = []
+        start = self._edge_offset + edge_start * EDGE.size
+        for edge_id, source_id, target_id, created, query_offset, query_length in \
+                EDGE.iter_unpack(self._mm[start:start + edge_count * EDGE.size]):
+            edges.append(EdgeRecord(
+                _id(edge_id),
+                _id(source_id),
+                _id(target_id),
+                text(query_offset, query_length),
+                _timestamp(created)
+            ))
+
+        return nodes, edges
+
+    def loader(self, conversation_id: int) -> Callable[[], ConversationData]:
+        return partial(self.load, conversation_id)
+
+    def release(self, conversation_id: int) -> None:
+        # The mapping is immutable; released conversations are simply never loaded again
+        self._released.add(conversation_id)
+
+    def _text(self, offset: int, length: int) -> Optional[str]:
+        if length == NO_TEXT:
+            return None
+        return str(self._mm[offset:offset + length], "utf-8")
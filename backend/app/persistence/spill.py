@@ -0,0 +1,164 @@
+"""
+Spill tier: compressed on-disk segments for conversations evicted from memory
+
+When InMemoryStore is over its memory budget it hands the nodes and edges of
+its least recently used conversations to a SpillTier, which appends each of
+them as one zlib-compressed entry to the active segment file
+(spill-<seq>.seg). The store then treats the conversation as cold and loads
+it back through the tier on the next access, after which the entry is dead.
+A segment file is deleted once it has no live entries left.
+
+Spill files only mirror data that is held in memory (and in the journal, if
+one is attached), so stale segments are removed on startup.
+"""
+import json
+import logging
+import os
+import zlib
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from ..compression import text_of
+from ..records import EdgeRecord, NodeRecord
+from .tier import ConversationData
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "spill-"
+SEGMENT_SUFFIX = ".seg"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+class _Segment:
+    """An append-only segment file; the descriptor stays open while referenced"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        self.size = 0
+        self.live = 0
+
+    def append(self, data: bytes) -> int:
+        offset = self.size
+        os.write(self.fd, data)
+        self.size += len(data)
+        return offset
+
+    def read(self, offset: int, length: int) -> bytes:
+        # pread does not move a shared file position, so snapshot threads can read too
+        return os.pread(self.fd, length, offset)
+
+    def __del__(self):
+        os.close(self.fd)
+
+
+def _encode(nodes: List[NodeRecord], edges: List[EdgeRecord]) -> bytes:
+    return json.dumps([
+        [[n.id, n.conversation_id, n.parent_id, text_of(n.context), text_of(n.response), n.query,
+          n.created_at, n.model, n.tokens_used, n.latency_ms] for n in nodes],
+        [[e.id, e.source_node_id, e.target_node_id, e.query_text, e.created_at] for e in edges],
+    ], separators=(",", ":")).encode()
+
+
+def _decode(data: bytes) -> ConversationData:
+    nodes, edges = json.loads(data)
+    return [NodeRecord(*row) for row in nodes], [EdgeRecord(*row) for row in edges]
+
+
+def _read(segment: _Segment, offset: int, length: int) -> ConversationData:
+    return _decode(zlib.decompress(segment.read(offset, length)))
+
+
+class SpillTier:
+    """Cold tier backed by compressed segment files in a spill directory"""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        compression_level: int = 6
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.compression_level = compression_level
+
+        for stale in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+            stale.unlink()
+
+        self._seq = 0
+        self._active = self._open_segment()
+        # conversation id -> (segment, offset, length, node ids)
+        self._entries: Dict[int, Tuple[_Segment, int, int, Tuple[int, ...]]] = {}
+        # node id -> spilled conversation listing it, or a list of them for a
+        # node shared by forks (each spills its own copy)
+        self._node_conversations: Dict[int, Union[int, List[int]]] = {}
+        self.spilled_bytes = 0
+
+    def _open_segment(self) -> _Segment:
+        self._seq += 1
+        return _Segment(self.directory / f"{SEGMENT_PREFIX}{self._seq:08d}{SEGMENT_SUFFIX}")
+
+    def spill(self, conversation_id: int, nodes: List[NodeRecord], edges: List[EdgeRecord]) -> int:
+        """Write a conversation's records to the active segment; returns the compressed size"""
+        self.release(conversation_id)
+        data = zlib.compress(_encode(nodes, edges), self.compression_level)
+
+        if self._active.size and self._active.size + len(data) > self.segment_bytes:
+            retired = self._active
+            self._active = self._open_segment()
+            if not retired.live:
+                retired.path.unlink()
+
+        segment = self._active
+        offset = segment.append(data)
+        segment.live += 1
+        node_ids = tuple(node.id for node in nodes)
+        self._entries[conversation_id] = (segment, offset, len(data), node_ids)
+        listed = self._node_conversations
+        for node_id in node_ids:
+            other = listed.setdefault(node_id, conversation_id)
+            if other.__class__ is list:
+                other.append(conversation_id)
+            elif other != conversation_id:
+                listed[node_id] = [other, conversation_id]
+        self.spilled_bytes += len(data)
+        return len(data)
+
+    # ColdTier
+    def locate_node(self, node_id: int) -> Optional[int]:
+        conversation_id = self._node_conversations.get(node_id)
+        return conversation_id[0] if conversation_id.__class__ is list else conversation_id
+
+    def load(self, conversation_id: int) -> ConversationData:
+        segment, offset, length, _ = self._entries[conversation_id]
+        return _read(segment, offset, length)
+
+    def loader(self, conversation_id: int) -> Callable[[], ConversationData]:
+        # Holds the segment, so the data stays readable after the entry is released
+        segment, offset, length, _ = self._entries[conversation_id]
+        return partial(_read, segment, offset, length)
+
+    def release(self, conversation_id: int) -> None:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            return
+
+        segment, _, length, node_ids = entry
+        listed = self._node_conversations
+        for node_id in node_ids:
+            other = listed[node_id]
+            if other.__class__ is not list:
+                del listed[node_id]
+                continue
+            other.remove(conversation_id)
+            if len(other) == 1:
+                listed[node_id] = other[0]
+        self.spilled_bytes -= length
+        segment.live -= 1
+        if not segment.live and segment is not self._active:
+            try:
+                segment.path.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove spill segment {segment.path.name}: {e}")
@@ -0,0 +1,42 @@
+"""
+Cold storage tiers for InMemoryStore
+
+A cold tier holds the nodes and edges of conversations that have not been
+touched since they were attached to the store. The store keeps only the
+conversation records in memory and loads the rest through the tier the first
+time a conversation or one of its nodes is accessed. Ids are the integer
+values of the UUIDs, as in the store's records.
+"""
+from typing import Callable, List, Optional, Protocol, Tuple
+
+from ..records import ConversationRecord, EdgeRecord, NodeRecord
+
+# Nodes (parents before children) and edges of one conversation
+ConversationData = Tuple[List[NodeRecord], List[EdgeRecord]]
+
+# A conversation with a loader for its data, as captured for a snapshot
+ConversationState = Tuple[ConversationRecord, Callable[[], ConversationData]]
+
+
+class ColdTier(Protocol):
+    """Read-only source of conversations the store has not loaded yet"""
+
+    def locate_node(self, node_id: int) -> Optional[int]:
+        """
+        Get a conversation containing a node that has not been released, or
+        None if the tier does not hold it (a node shared by forks may be
+        held by several conversations)
+        """
+        ...
+
+    def load(self, conversation_id: int) -> ConversationData:
+        """Decode fresh records for the nodes and edges of a conversation"""
+        ...
+
+    def loader(self, conversation_id: int) -> Callable[[], ConversationData]:
+        """Capture a load of a conversation that stays valid after it is released"""
+        ...
+
+    def release(self, conversation_id: int) -> None:
+        """Forget a conversation the store has loaded back or deleted"""
+        ...
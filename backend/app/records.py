@@ -0,0 +1,311 @@
+"""
+Compact internal records for InMemoryStore
+
+The pydantic models in models.py are what the API and the journal exchange;
+the store keeps its data in these slotted records instead. Ids are the
+128-bit integers behind the UUIDs, and timestamps are float seconds since the
+epoch (naive UTC, like the models). A record converts to its model only
+when it leaves the store.
+
+Node records also carry the store's per-node indexes (depth, binary-lifting
+jumps, children and incident edges), so no per-node dicts or sets are needed.
+Inside the store their longer context and response texts are shared blobs
+(see blobs.py); read them with text_of, and preview them with text_preview,
+which never decompresses them.
+
+Every node record carries a revision, renewed whenever anything a response
+shows of the node may have changed: its own data, or the context it
+inherits when an ancestor completes. Edges never change, but get one too
+for their record. Caches of serialized records are keyed by revision (see
+api/serialization.py). A revision is only numbered when it is first read
+(see revision_of), so records nobody caches keep no revision number.
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from .blobs import Blob, NodeText
+from .compression import text_of
+from .models import Conversation, ConversationNode, ConversationEdge, NodeSummary, preview_of
+
+EPOCH = datetime(1970, 1, 1)
+SECOND = timedelta(seconds=1)
+
+Model = TypeVar("Model", bound=BaseModel)
+_set = object.__setattr__
+
+# Approximate bytes a resident record costs beyond its text: the record, its
+# id and timestamp objects, and its share of the store's dicts and index
+# lists (see benchmarks/bench_store_memory.py). An edge's query text is
+# normally the target node's query string, and blobs are counted by their
+# table, so neither is counted again.
+NODE_BYTES = 540
+EDGE_BYTES = 320
+
+# Revisions, unique within the process. Starting from the clock keeps a
+# restarted store server from reusing the revisions of its previous run.
+_revisions = count(time.time_ns())
+
+
+def to_timestamp(value: datetime) -> float:
+    """Convert a datetime to float seconds since the epoch"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) / SECOND
+
+
+def from_timestamp(timestamp: float) -> datetime:
+    """Convert float seconds since the epoch back to a naive UTC datetime"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def _construct(model: Type[Model], values: Dict[str, Any]) -> Model:
+    """
+    Build a model from already-valid values for every field. Same result as
+    model_construct(**values), without its per-field default and alias
+    handling, which dominates the cost of converting records in bulk.
+    """
+    instance = model.__new__(model)
+    _set(instance, "__dict__", values)
+    _set(instance, "__pydantic_fields_set__", set(values))
+    _set(instance, "__pydantic_extra__", None)
+    _set(instance, "__pydantic_private__", None)
+    return instance
+
+
+def _id(value: Optional[UUID]) -> Optional[int]:
+    return value.int if value is not None else None
+
+
+def _uuid(value: Optional[int]) -> Optional[UUID]:
+    return UUID(int=value) if value is not None else None
+
+
+def text_bytes(text: NodeText) -> int:
+    if text is None or text.__class__ is Blob:
+        return 0
+    return sys.getsizeof(text)
+
+
+def revision_of(record: Union["NodeRecord", "EdgeRecord"]) -> int:
+    """Get a record's revision, numbering it if it changed since it was last read"""
+    revision = record.revision
+    if revision is None:
+        revision = record.revision = next(_revisions)
+    return revision
+
+
+def _model_name(model: Optional[str]) -> Optional[str]:
+    # Model names repeat across every node; keep one copy of each
+    return sys.intern(model) if model is not None else None
+
+
+def text_preview(text: NodeText) -> Optional[str]:
+    """preview_of a context or response field"""
+    if text.__class__ is Blob:
+        return text.preview()
+    return preview_of(text)
+
+
+class NodeRecord:
+    """A conversation node plus its position in the store's tree indexes"""
+
+    __slots__ = (
+        "id", "conversation_id", "parent_id",
+        "context", "response", "query",
+        "created_at", "model", "tokens_used", "latency_ms",
+        "revision",
+        # Store indexes: depth below the root, jumps[k] = 2**k-th ancestor,
+        # child records and incident edge records (None while empty)
+        "depth", "jumps", "children", "edges",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        conversation_id: int,
+        parent_id: Optional[int],
+        context: NodeText,
+        response: NodeText,
+        query: Optional[str],
+        created_at: float,
+        model: Optional[str],
+        tokens_used: Optional[int],
+        latency_ms: Optional[int]
+    ):
+        self.id = id
+        self.conversation_id = conversation_id
+        self.parent_id = parent_id
+        self.context = context
+        self.response = response
+        self.query = query
+        self.created_at = created_at
+        self.model = _model_name(model)
+        self.tokens_used = tokens_used
+        self.latency_ms = latency_ms
+        self.revision: Optional[int] = None
+        self.depth = 0
+        self.jumps: Tuple["NodeRecord", ...] = ()
+        self.children: Optional[List["NodeRecord"]] = None
+        self.edges: Optional[List["EdgeRecord"]] = None
+
+    @classmethod
+    def from_model(cls, node: ConversationNode) -> "NodeRecord":
+        return cls(
+            node.id.int,
+            node.conversation_id.int,
+            _id(node.parent_id),
+            node.context,
+            node.response,
+            node.query,
+            to_timestamp(node.created_at),
+            node.model,
+            node.tokens_used,
+            node.latency_ms
+        )
+
+    def to_model(self) -> ConversationNode:
+        return _construct(ConversationNode, {
+            "id": UUID(int=self.id),
+            "conversation_id": UUID(int=self.conversation_id),
+            "parent_id": _uuid(self.parent_id),
+            "context": text_of(self.context),
+            "response": text_of(self.response),
+            "query": self.query,
+            "created_at": from_timestamp(self.created_at),
+            "model": self.model,
+            "tokens_used": self.tokens_used,
+            "latency_ms": self.latency_ms,
+        })
+
+    def to_summary(self) -> NodeSummary:
+        return _construct(NodeSummary, {
+            "id": UUID(int=self.id),
+            "conversation_id": UUID(int=self.conversation_id),
+            "parent_id": _uuid(self.parent_id),
+            "query_preview": preview_of(self.query),
+            "response_preview": text_preview(self.response),
+            "context_preview": text_preview(self.context),
+            "created_at": from_timestamp(self.created_at),
+            "model": self.model,
+            "tokens_used": self.tokens_used,
+            "latency_ms": self.latency_ms,
+        })
+
+    def footprint(self) -> int:
+        """Estimated bytes this node keeps resident"""
+        return NODE_BYTES + text_bytes(self.context) + text_bytes(self.response) + text_bytes(self.query)
+
+    def complete(self, response: NodeText, latency_ms: Optional[int], model: Optional[str]) -> None:
+        self.response = response
+        self.latency_ms = latency_ms
+        self.model = _model_name(model)
+
+    def revise(self) -> None:
+        """Renew the revision after a change to the node or the context it inherits"""
+        self.revision = None
+
+
+class EdgeRecord:
+    """An edge between two nodes; belongs to the conversation of its target"""
+
+    __slots__ = ("id", "source_node_id", "target_node_id", "query_text", "created_at", "conversation_id", "revision")
+
+    def __init__(
+        self,
+        id: int,
+        source_node_id: int,
+        target_node_id: int,
+        query_text: str,
+        created_at: float
+    ):
+        self.id = id
+        self.source_node_id = source_node_id
+        self.target_node_id = target_node_id
+        self.query_text = query_text
+        self.created_at = created_at
+        self.conversation_id: Optional[int] = None
+        self.revision: Optional[int] = None
+
+    @classmethod
+    def from_model(cls, edge: ConversationEdge) -> "EdgeRecord":
+        return cls(
+            edge.id.int,
+            edge.source_node_id.int,
+            edge.target_node_id.int,
+            edge.query_text,
+            to_timestamp(edge.created_at)
+        )
+
+    def to_model(self) -> ConversationEdge:
+        return _construct(ConversationEdge, {
+            "id": UUID(int=self.id),
+            "source_node_id": UUID(int=self.source_node_id),
+            "target_node_id": UUID(int=self.target_node_id),
+            "query_text": self.query_text,
+            "created_at": from_timestamp(self.created_at),
+        })
+
+
+class ConversationRecord:
+    """Conversation metadata; its nodes and edges are indexed by the store"""
+
+    __slots__ = ("id", "title", "root_node_id", "active_node_id", "created_at", "updated_at", "version")
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        root_node_id: int,
+        active_node_id: int,
+        created_at: float,
+        updated_at: float,
+        version: int = 0
+    ):
+        self.id = id
+        self.title = title
+        self.root_node_id = root_node_id
+        self.active_node_id = active_node_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.version = version
+
+    @classmethod
+    def from_model(cls, conversation: Conversation) -> "ConversationRecord":
+        return cls(
+            conversation.id.int,
+            conversation.title,
+            conversation.root_node_id.int,
+            conversation.active_node_id.int,
+            to_timestamp(conversation.created_at),
+            to_timestamp(conversation.updated_at),
+            conversation.version
+        )
+
+    def to_model(self) -> Conversation:
+        return _construct(Conversation, {
+            "id": UUID(int=self.id),
+            "title": self.title,
+            "root_node_id": UUID(int=self.root_node_id),
+            "active_node_id": UUID(int=self.active_node_id),
+            "created_at": from_timestamp(self.created_at),
+            "updated_at": from_timestamp(self.updated_at),
+            "version": self.version,
+        })
+
+    def copy(self) -> "ConversationRecord":
+        return ConversationRecord(
+            self.id, self.title, self.root_node_id, self.active_node_id,
+            self.created_at, self.updated_at, self.version
+        )
+
+    @property
+    def order_key(self) -> Tuple[float, int]:
+        """Key of the store's conversation order index"""
+        return self.updated_at, self.id
+
@@ -17,10 +17,12 @@ class BranchRequest(BaseModel):
     query: str
     model: Optional[str] = None
     parent_node_id: Optional[UUID] = None  # If None, use active node
+    expected_version: Optional[int] = None  # Rejected if the conversation changed since
 
 
 class SelectNodeRequest(BaseModel):
     node_id: UUID
+    expected_version: Optional[int] = None  # Rejected if the conversation changed since
 
 
 # Response schemas
@@ -40,6 +42,23 @@ class NodeResponse(BaseModel):
         from_attributes = True
 
 
+class NodeSummaryResponse(BaseModel):
+    """A node as drawn in the graph; GET /api/nodes/{id} has its full texts"""
+    id: UUID
+    conversation_id: UUID
+    parent_id: Optional[UUID]
+    query_preview: Optional[str]
+    response_preview: Optional[str]
+    context_preview: Optional[str]
+    created_at: datetime
+    model: Optional[str]
+    tokens_used: Optional[int]
+    latency_ms: Optional[int]
+
+    class Config:
+        from_attributes = True
+
+
 class EdgeResponse(BaseModel):
     id: UUID
     source: UUID  # Renamed from source_node_id for React Flow compatibility
@@ -58,6 +77,7 @@ class ConversationResponse(BaseModel):
     active_node_id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
@@ -66,8 +86,32 @@ class ConversationResponse(BaseModel):
 class GraphResponse(BaseModel):
     conversation_id: UUID
     active_node_id: UUID
+    version: int
     nodes: List[NodeResponse]
     edges: List[EdgeResponse]
+    # With ?since=, nodes and edges are only those added or changed after
+    # `since`, and the deleted ones are listed; since is None for a full graph
+    since: Optional[int] = None
+    deleted_node_ids: List[UUID] = []
+    deleted_edge_ids: List[UUID] = []
+
+
+class GraphSummaryResponse(BaseModel):
+    """A graph with ?view=summary: node and edge texts are previews"""
+    conversation_id: UUID
+    active_node_id: UUID
+    version: int
+    nodes: List[NodeSummaryResponse]
+    edges: List[EdgeResponse]
+    since: Optional[int] = None
+    deleted_node_ids: List[UUID] = []
+    deleted_edge_ids: List[UUID] = []
+
+
+class BranchComparisonResponse(BaseModel):
+    common_ancestor: NodeResponse
+    branch_a: List[NodeResponse]  # Below the common ancestor down to node A
+    branch_b: List[NodeResponse]  # Below the common ancestor down to node B
 
 
 class CreateConversationResponse(BaseModel):
@@ -76,6 +120,14 @@ class CreateConversationResponse(BaseModel):
     active_node_id: UUID
 
 
+class ImportConversationResponse(BaseModel):
+    conversation_id: UUID
+    root_node_id: UUID
+    active_node_id: UUID
+    nodes: int
+    edges: int
+
+
 # WebSocket message types
 class StreamToken(BaseModel):
     type: str = "token"
@@ -1,7 +1,14 @@
 """Services for business logic"""
 from .llm import OpenRouterClient, get_llm_client
+from .locks import ConversationLocks, conversation_locks
+from .expiry import ConversationCollector, create_collector
+from .transfer import ConversationImporter, decode_stream, export_stream
 
-__all__ = ["OpenRouterClient", "get_llm_client"]
+__all__ = [
+    "OpenRouterClient", "get_llm_client", "ConversationLocks", "conversation_locks",
+    "ConversationImporter", "decode_stream", "export_stream",
+    "ConversationCollector", "create_collector",
+]
 
 # Provide llm_client as a function call for lazy initialization
 def llm_client():
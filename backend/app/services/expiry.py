@@ -0,0 +1,161 @@
+"""
+Idle conversation expiry for ConVerge
+
+A background asyncio task deletes conversations whose updated_at is older
+than a TTL, including the default conversations that listing an empty store
+creates and nobody uses. Every `interval` seconds it works through the idle
+conversations, least recently updated first, in time slices: a slice deletes
+conversations until `slice_seconds` (1 ms by default) have passed, then
+yields to the event loop. Each deletion holds the conversation's lock and
+checks updated_at again, so a conversation a request touched meanwhile is
+kept.
+
+On stores with trim_conversation (the in-memory store, also behind the
+store server) a conversation of more than STEP_NODES nodes is deleted in
+steps of STEP_NODES nodes, newest first, yielding to the event loop between
+steps, so requests never wait for much more than one slice. The store checks
+updated_at in every step, in the same operation as the deletion, since the
+lock only keeps out requests of this process: with several workers sharing
+the store server, a request another worker serves between two steps stops
+the deletion, and the collectors of all workers can run at once, each step
+deleting what is still there. Until its last step, reads may see such a
+conversation with part of its nodes gone, and a conversation touched
+between steps keeps the nodes it had left. The SQLite and Redis backends
+delete a conversation in one transaction, which can take longer than a
+slice for a large conversation.
+
+Memory reclaimed is measured with the store's resident_bytes estimate, on
+backends that keep one (the in-memory store).
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+
+from ..backends import StoreBackend
+from .locks import conversation_locks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 300.0
+SLICE_SECONDS = 0.001
+# Idle conversations fetched from the store at a time
+BATCH_SIZE = 32
+# Nodes deleted per step from a larger conversation; about 0.6 ms in memory
+STEP_NODES = 64
+
+
+class ConversationCollector:
+    """Deletes conversations idle for longer than `ttl` in a background task"""
+
+    def __init__(
+        self,
+        store: StoreBackend,
+        ttl: timedelta,
+        interval: float = DEFAULT_INTERVAL,
+        slice_seconds: float = SLICE_SECONDS
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.interval = interval
+        self.slice_seconds = slice_seconds
+        # Totals since start; reclaimed_bytes stays 0 without resident_bytes
+        self.expired = 0
+        self.reclaimed_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Run collect() every `interval` seconds on the current event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.collect()
+            except Exception:
+                logger.exception("❌ Conversation expiry failed")
+            await asyncio.sleep(self.interval)
+
+    async def collect(self) -> int:
+        """Delete every conversation idle at the time of the call; returns how many were deleted"""
+        cutoff = datetime.utcnow() - self.ttl
+        expired = 0
+        reclaimed = 0
+        while True:
+            deadline = time.perf_counter() + self.slice_seconds
+            progress = False
+            for conversation in self.store.list_idle_conversations(cutoff, BATCH_SIZE):
+                deleted, freed = await self._expire(conversation.id, cutoff)
+                progress = progress or deleted
+                expired += deleted
+                reclaimed += freed
+                if time.perf_counter() >= deadline:
+                    break
+            if not progress:
+                # Nothing left, or only conversations touched since they were listed
+                break
+            await asyncio.sleep(0)
+
+        self.expired += expired
+        self.reclaimed_bytes += reclaimed
+        if expired:
+            resident = getattr(self.store, "resident_bytes", None)
+            logger.info(
+                f"🧹 Expired {expired} conversations idle since {cutoff.isoformat(timespec='seconds')}"
+                + (f", reclaimed {reclaimed / 1024:.1f} KiB ({resident / 2**20:.1f} MiB resident)"
+                   if resident is not None else "")
+            )
+        return expired
+
+    async def _expire(self, conversation_id: UUID, cutoff: datetime):
+        """Delete a conversation if it is still idle; returns (deleted, bytes reclaimed)"""
+        async with conversation_locks.hold(conversation_id):
+            trim = getattr(self.store, "trim_conversation", None)
+            if trim is None:
+                conversation = self.store.get_conversation(conversation_id)
+                if conversation is None or conversation.updated_at >= cutoff:
+                    return False, 0
+                before = getattr(self.store, "resident_bytes", 0)
+                deleted = self.store.delete_conversation(conversation_id)
+                return deleted, before - getattr(self.store, "resident_bytes", 0)
+            reclaimed = 0
+            while True:
+                # Every step checks updated_at in the store, as it deletes
+                before = getattr(self.store, "resident_bytes", 0)
+                left = trim(conversation_id, STEP_NODES, cutoff)
+                reclaimed += before - getattr(self.store, "resident_bytes", 0)
+                if left is None:
+                    # Touched by a request, or expired by the collector of another worker
+                    return False, reclaimed
+                if left == 0:
+                    return True, reclaimed
+                # Other requests run between steps; the lock keeps writers in this process out
+                await asyncio.sleep(0)
+
+
+def create_collector(store: StoreBackend) -> Optional[ConversationCollector]:
+    """
+    Create the collector configured by the environment, or None if
+    CONVERSATION_TTL_HOURS is unset
+    """
+    ttl_hours = os.getenv("CONVERSATION_TTL_HOURS")
+    if not ttl_hours:
+        return None
+    return ConversationCollector(
+        store,
+        ttl=timedelta(hours=float(ttl_hours)),
+        interval=float(os.getenv("CONVERSATION_GC_INTERVAL_SECONDS", str(DEFAULT_INTERVAL)))
+    )
@@ -0,0 +1,42 @@
+"""
+Per-conversation locks for ConVerge
+
+Requests that read a conversation and then write it (selecting a node,
+creating a branch, deleting nodes) hold the conversation's lock around that
+read-then-write section, so concurrent requests on the same conversation are
+applied one at a time. Each conversation has its own lock, created on first
+use and dropped once nobody holds or waits for it, so unrelated
+conversations never contend. Long-running work such as streaming an LLM
+response must happen outside the lock; parallel branches of a conversation
+only serialize their short store updates.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from uuid import UUID
+from weakref import WeakValueDictionary
+
+
+class ConversationLocks:
+    """asyncio locks keyed by conversation id"""
+
+    def __init__(self):
+        # Holders and waiters keep a lock alive; idle locks are collected
+        self._locks: "WeakValueDictionary[UUID, asyncio.Lock]" = WeakValueDictionary()
+
+    @asynccontextmanager
+    async def hold(self, conversation_id: UUID) -> AsyncIterator[None]:
+        """Serialize the enclosed block with every other holder of this conversation"""
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[conversation_id] = lock
+        async with lock:
+            yield
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# Shared by all API modules
+conversation_locks = ConversationLocks()
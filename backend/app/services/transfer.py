@@ -0,0 +1,237 @@
+"""
+Streaming export and import of conversations
+
+An export is a stream of records, one conversation record followed by its
+nodes (parents first) and then its edges, each tagged with a "type" field:
+
+    {"type": "conversation", "id": ..., "title": ..., "root_node_id": ..., ...}
+    {"type": "node", "id": ..., "parent_id": ..., "context": ..., ...}
+    {"type": "edge", "id": ..., "source_node_id": ..., "target_node_id": ..., ...}
+
+encoded as NDJSON (one JSON object per line) or as a sequence of msgpack
+maps. Exports are written in chunks as the store's records are read, and
+imports are decoded as the request body arrives and inserted in batches, so
+neither side ever holds a whole graph as models or as one document.
+
+msgpack requires the optional `msgpack` package.
+"""
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Union
+from uuid import UUID, uuid4
+
+from ..backends import ConflictError, StoreBackend
+from ..models import Conversation, ConversationNode, ConversationEdge
+from ..sharding import local_shard, new_conversation_id, new_node_id
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency, only needed for format=msgpack
+    msgpack = None
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "msgpack": "application/x-msgpack",
+}
+
+# Records per chunk written to the response, and per store transaction on import
+EXPORT_CHUNK = 500
+IMPORT_BATCH = 500
+
+
+class MisroutedError(Exception):
+    """An import of a conversation owned by another shard"""
+
+
+def require_format(format: str) -> None:
+    """Raise if `format` is unknown or its encoder is not installed"""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format} (expected one of {', '.join(FORMATS)})")
+    if format == "msgpack" and msgpack is None:
+        raise RuntimeError("msgpack exports require the msgpack package (pip install msgpack)")
+
+
+def _tagged(kind: str, model: Union[Conversation, ConversationNode, ConversationEdge]) -> Dict[str, Any]:
+    return {"type": kind, **model.model_dump(mode="json")}
+
+
+def export_stream(
+    conversation: Conversation,
+    records: Iterator[Union[ConversationNode, ConversationEdge]],
+    format: str = "ndjson"
+) -> Iterator[bytes]:
+    """
+    Encode a conversation and its records (see StoreBackend.iter_conversation_records)
+    in chunks of EXPORT_CHUNK records
+    """
+    if format == "msgpack":
+        packer = msgpack.Packer()
+
+        def encode(kind: str, model) -> bytes:
+            return packer.pack(_tagged(kind, model))
+    else:
+        def encode(kind: str, model) -> bytes:
+            # pydantic writes the JSON; only the type tag is spliced in front
+            return b'{"type":"' + kind.encode() + b'",' + model.model_dump_json().encode()[1:] + b"\n"
+
+    chunk: List[bytes] = [encode("conversation", conversation)]
+    for record in records:
+        if isinstance(record, ConversationNode):
+            # Nodes shared with a fork keep the id of the conversation that
+            # created them; the store's models are not changed, but copied
+            if record.conversation_id != conversation.id:
+                record = record.model_copy(update={"conversation_id": conversation.id})
+            chunk.append(encode("node", record))
+        else:
+            chunk.append(encode("edge", record))
+        if len(chunk) >= EXPORT_CHUNK:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def decode_stream(body: AsyncIterator[bytes], format: str = "ndjson") -> AsyncIterator[Dict[str, Any]]:
+    """Decode records from a request body as its chunks arrive"""
+    if format == "msgpack":
+        unpacker = msgpack.Unpacker(raw=False)
+        async for data in body:
+            unpacker.feed(data)
+            for record in unpacker:
+                yield record
+        return
+
+    pending = b""
+    async for data in body:
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
+
+
+class ConversationImporter:
+    """
+    Rebuilds an exported conversation in a store, IMPORT_BATCH records per
+    transaction. Ids are kept unless new_ids is set; then every id is
+    replaced and node ids take the new conversation's shard prefix. Invalid
+    input raises ValueError, an existing conversation or node ConflictError
+    and, in sharded mode, a conversation id owned by another shard
+    MisroutedError (the front sends imports to the owning shard); call
+    abort() to delete what was already inserted.
+    """
+
+    def __init__(self, store: StoreBackend, new_ids: bool = False, batch_size: int = IMPORT_BATCH):
+        self.store = store
+        self.new_ids = new_ids
+        self.batch_size = batch_size
+        self.conversation: Optional[Conversation] = None
+        self.nodes = 0
+        self.edges = 0
+        self._created = False
+        self._node_ids: Set[UUID] = set()  # Imported node ids, as inserted
+        self._renamed: Optional[Dict[UUID, UUID]] = None  # Exported node id -> new id, when replacing ids
+        self._active_node_id: Optional[UUID] = None
+        self._pending: List[Union[ConversationNode, ConversationEdge]] = []
+
+    def add(self, record: Dict[str, Any]) -> bool:
+        """Queue one decoded record; returns True once a batch is ready to flush"""
+        if not isinstance(record, dict):
+            raise ValueError("Export records must be objects")
+        kind = record.get("type")
+        if self.conversation is None:
+            if kind != "conversation":
+                raise ValueError("An export must start with its conversation record")
+            self._start(Conversation.model_validate(record))
+        elif kind == "node":
+            self._pending.append(self._node(ConversationNode.model_validate(
+                {**record, "conversation_id": self.conversation.id}
+            )))
+        elif kind == "edge":
+            self._pending.append(self._edge(ConversationEdge.model_validate(record)))
+        else:
+            raise ValueError(f"Unexpected record type: {kind}")
+        return len(self._pending) >= self.batch_size
+
+    def _start(self, conversation: Conversation) -> None:
+        self._active_node_id = conversation.active_node_id
+        if self.new_ids:
+            self._renamed = {}
+            conversation.id = new_conversation_id()
+        else:
+            self._renamed = None
+            if local_shard is not None and not local_shard.owns(conversation.id):
+                raise MisroutedError(f"Conversation {conversation.id} belongs to another shard")
+            if self.store.get_conversation(conversation.id) is not None:
+                raise ConflictError(f"Conversation {conversation.id} already exists")
+        conversation.version = 0
+        self.conversation = conversation
+
+    def _node(self, node: ConversationNode) -> ConversationNode:
+        if (node.parent_id is None) != (not self._node_ids):
+            raise ValueError("The first node must be the root, and only the root has no parent")
+        if node.parent_id is not None:
+            if self._renamed is not None:
+                node.parent_id = self._renamed.get(node.parent_id, node.parent_id)
+            if node.parent_id not in self._node_ids:
+                raise ValueError(f"Node {node.id} comes before its parent {node.parent_id}")
+
+        if node.id in self._node_ids or (self._renamed is not None and node.id in self._renamed):
+            raise ValueError(f"Node {node.id} appears twice")
+        if self._renamed is not None:
+            self._renamed[node.id] = new_id = new_node_id(self.conversation.id)
+            node.id = new_id
+        elif self.store.get_node(node.id) is not None:
+            raise ConflictError(f"Node {node.id} already exists")
+        self._node_ids.add(node.id)
+        return node
+
+    def _edge(self, edge: ConversationEdge) -> ConversationEdge:
+        if self._renamed is not None:
+            edge.id = uuid4()
+            edge.source_node_id = self._renamed.get(edge.source_node_id, edge.source_node_id)
+            edge.target_node_id = self._renamed.get(edge.target_node_id, edge.target_node_id)
+        if edge.source_node_id not in self._node_ids or edge.target_node_id not in self._node_ids:
+            raise ValueError(f"Edge {edge.id} connects nodes that are not part of the export")
+        return edge
+
+    def flush(self) -> None:
+        """Insert the queued records in one store transaction"""
+        if not self._pending:
+            return
+        with self.store.transaction():
+            for record in self._pending:
+                if isinstance(record, ConversationNode):
+                    self.store.create_node(record)
+                    self.nodes += 1
+                    if not self._created:
+                        # The root is inserted first; the conversation points at it
+                        self.conversation.root_node_id = record.id
+                        self.conversation.active_node_id = record.id
+                        self.store.create_conversation(self.conversation)
+                        self._created = True
+                else:
+                    self.store.create_edge(record)
+                    self.edges += 1
+        self._pending = []
+
+    def finish(self) -> Conversation:
+        """Flush the last batch and restore the exported active node"""
+        if self.conversation is None:
+            raise ValueError("The export is empty")
+        self.flush()
+        if not self._created:
+            raise ValueError("The export has no nodes")
+        active_node_id = self._active_node_id
+        if self._renamed is not None:
+            active_node_id = self._renamed.get(active_node_id)
+        if active_node_id in self._node_ids and active_node_id != self.conversation.active_node_id:
+            self.conversation = self.store.set_active_node(self.conversation.id, active_node_id)
+        return self.store.get_conversation(self.conversation.id)
+
+    def abort(self) -> None:
+        """Delete the partially imported conversation, if any of it was inserted"""
+        if self._created:
+            self.store.delete_conversation(self.conversation.id)
+            self._created = False
@@ -0,0 +1,94 @@
+"""
+Conversation sharding for ConVerge
+
+In sharded mode every conversation lives on one of SHARD_COUNT API
+processes, each with its own store, and the front (app.front) forwards each
+request to the shard that owns it. Ownership is decided by consistent
+hashing: the top 32 bits of an id are a position on a ring of shard points.
+
+Node ids share those 32 bits with their conversation id (see new_node_id),
+so /api/nodes/{id} routes to the same shard as its conversation without a
+lookup. A shard only creates conversations whose ids it owns
+(new_conversation_id samples until one lands on it).
+
+A process is a shard when SHARD_COUNT and SHARD_INDEX are set; otherwise
+ids are plain random UUIDs.
+"""
+import hashlib
+import os
+from bisect import bisect_right
+from pathlib import Path
+from typing import List, Optional
+from uuid import UUID, uuid4
+from dotenv import load_dotenv
+
+# Ids share their top PREFIX_BITS with the conversation they belong to
+PREFIX_BITS = 32
+PREFIX_SHIFT = 128 - PREFIX_BITS
+PREFIX_MASK = ((1 << PREFIX_BITS) - 1) << PREFIX_SHIFT
+
+# Points per shard on the ring; more points spread conversations more evenly
+DEFAULT_REPLICAS = 64
+
+
+class ShardRing:
+    """Consistent-hash ring mapping id prefixes to shard indexes"""
+
+    def __init__(self, count: int, replicas: int = DEFAULT_REPLICAS):
+        if count < 1:
+            raise ValueError("A shard ring needs at least one shard")
+        self.count = count
+        points = sorted(
+            (int.from_bytes(hashlib.blake2b(f"{shard}:{replica}".encode(), digest_size=4).digest(), "big"), shard)
+            for shard in range(count)
+            for replica in range(replicas)
+        )
+        self._positions: List[int] = [position for position, _ in points]
+        self._shards: List[int] = [shard for _, shard in points]
+
+    def shard_for(self, id: UUID) -> int:
+        """Index of the shard owning a conversation or node id"""
+        # The first point clockwise from the id's prefix, wrapping around
+        index = bisect_right(self._positions, id.int >> PREFIX_SHIFT)
+        return self._shards[index % len(self._shards)]
+
+
+class LocalShard:
+    """This process's place in the ring"""
+
+    def __init__(self, ring: ShardRing, index: int):
+        if not 0 <= index < ring.count:
+            raise ValueError(f"SHARD_INDEX {index} is outside 0..{ring.count - 1}")
+        self.ring = ring
+        self.index = index
+
+    def owns(self, id: UUID) -> bool:
+        return self.ring.shard_for(id) == self.index
+
+
+def _local_shard_from_env() -> Optional[LocalShard]:
+    # Imported by the models, before the store loads the environment
+    load_dotenv(dotenv_path=Path(__file__).parent.parent.parent / '.env')
+    count = os.getenv("SHARD_COUNT")
+    if not count:
+        return None
+    return LocalShard(ShardRing(int(count)), int(os.getenv("SHARD_INDEX", "0")))
+
+
+# Set when this process serves one shard of a sharded deployment
+local_shard: Optional[LocalShard] = _local_shard_from_env()
+
+
+def new_conversation_id() -> UUID:
+    """A random conversation id, owned by this shard in sharded mode"""
+    conversation_id = uuid4()
+    if local_shard is not None:
+        # Each draw lands on this shard with probability ~1/SHARD_COUNT
+        while not local_shard.owns(conversation_id):
+            conversation_id = uuid4()
+    return conversation_id
+
+
+def new_node_id(conversation_id: UUID) -> UUID:
+    """A random node id that routes to the same shard as its conversation"""
+    return UUID(int=(conversation_id.int & PREFIX_MASK) | (uuid4().int & ~PREFIX_MASK))
@@ -1,10 +1,58 @@
 """
 In-memory storage for ConVerge
-Simple dictionaries for fast access, no persistence
+Simple dictionaries for fast access, no persistence.
+
+Data is kept in compact slotted records (see records.py) keyed by the
+integer value of each UUID; the pydantic models are built only for callers.
+
+The module-level `store` is the backend selected at startup with the
+STORE_BACKEND environment variable (see create_store).
 """
-from typing import Dict, List, Optional
+import os
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from pathlib import Path
 from uuid import UUID
-from .models import Conversation, ConversationNode, ConversationEdge
+from dotenv import load_dotenv
+from sortedcontainers import SortedList
+from .backends.base import GraphChanges, GraphRevisions, StoreBackend
+from .blobs import BlobTable
+from .changes import ChangeLog
+from .compression import TextCodec, text_of
+from .models import Conversation, ConversationNode, ConversationEdge, NodeSummary
+from .persistence.spill import SpillTier
+from .persistence.tier import ColdTier, ConversationData, ConversationState
+from .records import EDGE_BYTES, ConversationRecord, EdgeRecord, NodeRecord, revision_of, to_timestamp
+from .context import (
+    MaterializedCache,
+    PROMPT_TURN_SEPARATOR,
+    TURN_SEPARATOR,
+    assistant_turn,
+    user_turn,
+)
+
+# Default character budgets for cached transcripts and prompt prefixes of hot nodes
+DEFAULT_CONTEXT_CACHE_CHARS = 16 * 1024 * 1024
+DEFAULT_PROMPT_CACHE_CHARS = 16 * 1024 * 1024
+
+
+def _captured(nodes: List[NodeRecord], edges: List[EdgeRecord]) -> ConversationData:
+    return nodes, edges
+
+
+def _with_shared(load: Callable[[], ConversationData], shared: Dict[int, NodeRecord]) -> ConversationData:
+    # A cold copy of a shared node may predate a write through another holder
+    nodes, edges = load()
+    return [shared.get(node.id, node) for node in nodes], edges
+
+
+def _parent(node: NodeRecord) -> Optional[NodeRecord]:
+    return node.jumps[0] if node.jumps else None
 
 
 class InMemoryStore:
@@ -13,148 +61,1140 @@ class InMemoryStore:
     Data is lost when the server restarts.
     """
 
-    def __init__(self):
-        self.conversations: Dict[UUID, Conversation] = {}
-        self.nodes: Dict[UUID, ConversationNode] = {}
-        self.edges: Dict[UUID, ConversationEdge] = {}
+    def __init__(
+        self,
+        context_cache_chars: int = DEFAULT_CONTEXT_CACHE_CHARS,
+        prompt_cache_chars: int = DEFAULT_PROMPT_CACHE_CHARS,
+        memory_budget: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        codec: Optional[TextCodec] = None
+    ):
+        """
+        Args:
+            context_cache_chars: Budget of the materialized context cache
+            prompt_cache_chars: Budget of the prompt prefix cache
+            memory_budget: Resident bytes (estimated) above which least recently
+                used conversations are spilled to disk; unlimited if None
+            spill_dir: Where spilled conversations are written (a temporary
+                directory if None)
+            codec: Compresses long context and response text of resident
+                nodes (per distinct text); text stays plain if None
+        """
+        # Primary records keyed by UUID.int
+        self.conversations: Dict[int, ConversationRecord] = {}
+        self.nodes: Dict[int, NodeRecord] = {}
+        self.edges: Dict[int, EdgeRecord] = {}
+
+        # Optional write-ahead journal (see persistence.journal.Journal.attach)
+        self.journal = None
+
+        # Conversations whose nodes and edges are still in a cold tier (e.g. a
+        # memory-mapped snapshot); they are loaded on first access
+        self._cold: Dict[int, ColdTier] = {}
+        self._cold_tiers: List[ColdTier] = []
+
+        # Conversation order index: (updated_at, id) keys kept sorted ascending
+        self._conversation_order = SortedList()
+
+        # Secondary index: conversation id -> {id: record}, kept in insertion order.
+        # Children, incident edges, depth and ancestor jumps live on the node records
+        self._conversation_nodes: Dict[int, Dict[int, NodeRecord]] = {}
+        self._conversation_edges: Dict[int, Dict[int, EdgeRecord]] = {}
+
+        # Forks share node and edge records instead of copying them: record id ->
+        # conversations whose graph includes it, for records held by more than
+        # one (loaded or spilled). Shared records stay resident while held, and
+        # a record's conversation_id is one of its holders
+        self._holders: Dict[int, List[int]] = {}
+
+        # Ids of the records each version changed, per resident conversation
+        # changed since this process started (see changes.ChangeLog)
+        self._changes: Dict[int, ChangeLog] = {}
+
+        # Estimated resident bytes of the records, in total and per conversation
+        # (see NodeRecord.footprint); shared text is counted by the blob table
+        self._record_bytes = 0
+        self._conversation_bytes: Dict[int, int] = {}
+
+        # Memory budget: resident conversations in least recently used order,
+        # spilled to compressed segment files while the store is over budget
+        self.memory_budget = memory_budget
+        self._recent: "OrderedDict[int, None]" = OrderedDict()
+        self._spill: Optional[SpillTier] = None
+        if memory_budget is not None:
+            self._spill = SpillTier(spill_dir or tempfile.mkdtemp(prefix="converge-spill-"))
+
+        # Distinct context and response texts shared by node records, compressed
+        # if a codec is given (see blobs.BlobTable)
+        self._blobs = BlobTable(codec)
+
+        # Materialized transcripts (root context + completed turns) of hot nodes
+        self._transcripts = MaterializedCache(context_cache_chars)
+        # Completed turns below the root joined for the LLM prompt (see context.build_prompt)
+        self._prompt_prefixes = MaterializedCache(prompt_cache_chars)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Estimated bytes of the resident records and text"""
+        return self._record_bytes + self._blobs.bytes
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Group several writes; journaled as a single atomic record"""
+        if self.journal is None:
+            yield
+            return
+
+        with self.journal.batch():
+            yield
+        self._maybe_snapshot()
+
+    def _log(self, op: str, **fields) -> None:
+        """Append a mutation to the journal, if one is attached"""
+        if self.journal is not None:
+            self.journal.append(op, **fields)
+            self._maybe_snapshot()
+
+    def _maybe_snapshot(self) -> None:
+        if self.journal.snapshot_due():
+            self.journal.snapshot(self._snapshot_state())
+
+    def _snapshot_state(self) -> List[ConversationState]:
+        """
+        Capture every conversation with a loader for its nodes and edges.
+        Containers and conversation records are copied here; the journal
+        serializes them in the background. Replaying a version bump is not
+        idempotent, so the captured versions must not move on.
+        """
+        state: List[ConversationState] = []
+        # Shared nodes stay resident while their holders are cold (see _release)
+        shared = {record_id: self.nodes[record_id] for record_id in self._holders if record_id in self.nodes}
+        for conversation_id, record in self.conversations.items():
+            conversation = record.copy()
+            tier = self._cold.get(conversation_id)
+            if tier is not None:
+                loader = tier.loader(conversation_id)
+                state.append((conversation, partial(_with_shared, loader, shared) if shared else loader))
+                continue
+            nodes = list(self._conversation_nodes.get(conversation_id, {}).values())
+            edges = list(self._conversation_edges.get(conversation_id, {}).values())
+            state.append((conversation, partial(_captured, nodes, edges)))
+        return state
+
+    # Cold tiers
+    def attach_cold(self, conversation: ConversationRecord, tier: ColdTier) -> None:
+        """Register a conversation whose nodes and edges stay in `tier` until first access"""
+        if tier not in self._cold_tiers:
+            self._cold_tiers.append(tier)
+        self._put_conversation(conversation)
+        self._cold[conversation.id] = tier
+
+    def _load_cold(self, conversation_id: int, enforce_budget: bool = True) -> None:
+        """Move a cold conversation's nodes and edges into memory"""
+        tier = self._cold.pop(conversation_id, None)
+        if tier is None:
+            return
+        nodes, edges = tier.load(conversation_id)
+        tier.release(conversation_id)
+        for node in nodes:
+            self._insert_node(node, conversation_id)
+        for edge in edges:
+            self._insert_edge(edge, conversation_id)
+        self._touch(conversation_id)
+        if enforce_budget:
+            self._enforce_budget()
+
+    def _load_holders(self, node: NodeRecord) -> None:
+        """
+        Load every cold conversation a tier still lists a node under, before
+        the node changes. A cold tier keeps a copy of a shared node per
+        conversation, and each of them must see the change and its version bump
+        """
+        for tier in list(self._cold_tiers):
+            conversation_id = tier.locate_node(node.id)
+            while conversation_id is not None and conversation_id in self._cold:
+                # Spilling now could free the node before the others share it
+                self._load_cold(conversation_id, enforce_budget=False)
+                conversation_id = tier.locate_node(node.id)
+
+    def _node(self, node_id: int) -> Optional[NodeRecord]:
+        """Look up a node record, loading its conversation from a cold tier if needed"""
+        node = self.nodes.get(node_id)
+        if node is None and self._cold:
+            for tier in self._cold_tiers:
+                conversation_id = tier.locate_node(node_id)
+                if conversation_id is not None and conversation_id in self._cold:
+                    self._load_cold(conversation_id)
+                    node = self.nodes.get(node_id)
+                    break
+        elif node is not None and self._spill is not None:
+            self._touch(node.conversation_id)
+        return node
+
+    # Memory budget
+    def _account(self, conversation_id: Optional[int], delta: int) -> None:
+        """Count bytes for a conversation, or only in the total if None (shared records)"""
+        if conversation_id is not None:
+            self._conversation_bytes[conversation_id] = self._conversation_bytes.get(conversation_id, 0) + delta
+        self._record_bytes += delta
+
+    def _touch(self, conversation_id: int) -> None:
+        """Mark a resident conversation as the most recently used"""
+        if self._spill is not None and conversation_id in self._conversation_nodes:
+            self._recent[conversation_id] = None
+            self._recent.move_to_end(conversation_id)
+
+    def _enforce_budget(self) -> None:
+        """Spill least recently used conversations until the store fits its budget"""
+        if self._spill is None:
+            return
+        # The most recently used conversation always stays resident
+        while self.resident_bytes > self.memory_budget and len(self._recent) > 1:
+            conversation_id, _ = self._recent.popitem(last=False)
+            self._spill_conversation(conversation_id)
+
+    def _spill_conversation(self, conversation_id: int) -> None:
+        """Move a conversation's nodes and edges to the spill tier"""
+        nodes = list(self._conversation_nodes.pop(conversation_id, {}).values())
+        edges = list(self._conversation_edges.pop(conversation_id, {}).values())
+        self._spill.spill(conversation_id, nodes, edges)
+
+        self._cold[conversation_id] = self._spill
+        if self._spill not in self._cold_tiers:
+            self._cold_tiers.append(self._spill)
+
+        # Still a holder while cold, so the records it shares stay resident
+        self._release(conversation_id, nodes, edges, keep_holder=True)
+        self._record_bytes -= self._conversation_bytes.pop(conversation_id, 0)
+        self._changes.pop(conversation_id, None)
+
+    # Shared records
+    def _bucket(self, record) -> Optional[int]:
+        """The conversation whose bytes include a record, or None if it is shared"""
+        return None if record.id in self._holders else record.conversation_id
+
+    def _holds(self, record, conversation_id: int) -> bool:
+        holders = self._holders.get(record.id)
+        return conversation_id in holders if holders is not None else record.conversation_id == conversation_id
+
+    def _share(self, record, conversation_id: int, footprint: int) -> None:
+        """Add a conversation to the holders of a node or edge record"""
+        holders = self._holders.get(record.id)
+        if holders is None:
+            # Shared bytes belong to no single conversation
+            self._account(record.conversation_id, -footprint)
+            self._account(None, footprint)
+            self._holders[record.id] = [record.conversation_id, conversation_id]
+        else:
+            holders.append(conversation_id)
+
+    def _unshare(self, record, conversation_id: int, footprint: int) -> List[int]:
+        """Remove a conversation from the holders of a record; returns the other holders"""
+        holders = self._holders.get(record.id)
+        if holders is None:
+            return []
+        holders.remove(conversation_id)
+        if record.conversation_id == conversation_id:
+            record.conversation_id = holders[0]  # Another holder takes the record over
+            if isinstance(record, NodeRecord):
+                record.revise()  # Responses show the new conversation_id
+        if len(holders) == 1:
+            del self._holders[record.id]
+            self._account(None, -footprint)
+            self._account(record.conversation_id, footprint)
+        return holders
+
+    def _release(
+        self,
+        conversation_id: int,
+        nodes: List[NodeRecord],
+        edges: List[EdgeRecord],
+        keep_holder: bool = False
+    ) -> None:
+        """
+        Take records out of a conversation's graph (already removed from its
+        index) and free those no other conversation holds. Shared records stay
+        resident even if all their holders are cold, since a spilled copy may
+        predate a later write through another holder. With keep_holder the
+        conversation still holds them while it is cold.
+        """
+        def held(record, footprint: int) -> bool:
+            if keep_holder:
+                return record.id in self._holders
+            return bool(self._unshare(record, conversation_id, footprint))
+
+        freed_nodes = {node.id: node for node in nodes if not held(node, node.footprint())}
+        freed_edges = [edge for edge in edges if not held(edge, EDGE_BYTES)]
+
+        for edge in freed_edges:
+            del self.edges[edge.id]
+            self._account(self._bucket(edge), -EDGE_BYTES)
+            for endpoint_id in (edge.source_node_id, edge.target_node_id):
+                endpoint = self.nodes.get(endpoint_id) if endpoint_id not in freed_nodes else None
+                if endpoint is not None and endpoint.edges and edge in endpoint.edges:
+                    endpoint.edges.remove(edge)
+                    if not endpoint.edges:
+                        endpoint.edges = None
+
+        for node_id, node in freed_nodes.items():
+            del self.nodes[node_id]
+            self._account(self._bucket(node), -node.footprint())
+            self._release_text(node)
+            self._transcripts.discard(node_id)
+            self._prompt_prefixes.discard(node_id)
+            parent = _parent(node)
+            if parent is not None and parent.id not in freed_nodes and parent.children:
+                parent.children.remove(node)
+                if not parent.children:
+                    parent.children = None
 
     # Conversation operations
     def create_conversation(self, conversation: Conversation) -> Conversation:
         """Store a new conversation"""
-        self.conversations[conversation.id] = conversation
+        self._put_conversation(ConversationRecord.from_model(conversation))
+        self._log("create_conversation", conversation=conversation)
         return conversation
 
+    def _put_conversation(self, record: ConversationRecord) -> None:
+        """Add or replace a conversation record and its order key"""
+        existing = self.conversations.get(record.id)
+        if existing is not None:
+            self._conversation_order.remove(existing.order_key)
+        self.conversations[record.id] = record
+        self._conversation_order.add(record.order_key)
+
+    def _bump_version(
+        self,
+        conversation_id: int,
+        node_ids: Iterable[int] = (),
+        edge_ids: Iterable[int] = (),
+        bump: bool = True
+    ) -> None:
+        """
+        Record a change to a conversation's graph and log the records it
+        touched; without bump they are logged as part of the current version
+        """
+        record = self.conversations.get(conversation_id)
+        if record is None:
+            return
+        log = self._changes.get(conversation_id)
+        if log is None:
+            # Changes up to the current version were not logged
+            log = self._changes[conversation_id] = ChangeLog(record.version)
+        if bump:
+            record.version += 1
+        log.add(record.version, node_ids, edge_ids)
+
     def get_conversation(self, conversation_id: UUID) -> Optional[Conversation]:
         """Get conversation by ID"""
-        return self.conversations.get(conversation_id)
-
-    def list_conversations(self) -> List[Conversation]:
-        """List all conversations, sorted by updated_at descending"""
-        return sorted(
-            self.conversations.values(),
-            key=lambda c: c.updated_at,
-            reverse=True
+        record = self.conversations.get(conversation_id.int)
+        if record is None:
+            return None
+        self._touch(record.id)
+        return record.to_model()
+
+    def list_conversations(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[UUID] = None,
+        after_updated_at: Optional[datetime] = None
+    ) -> List[Conversation]:
+        """
+        List conversations sorted by updated_at descending.
+
+        Args:
+            limit: Maximum number of conversations to return (all if None)
+            after: Cursor; only return conversations that sort after this one
+            after_updated_at: updated_at of the cursor conversation. When given,
+                the cursor is that key and `after` need not be in this store
+                (used to page across shards)
+        """
+        stop = len(self._conversation_order)
+        if after is not None:
+            if after_updated_at is not None:
+                cursor_key = (to_timestamp(after_updated_at), after.int)
+            else:
+                cursor = self.conversations.get(after.int)
+                if cursor is None:
+                    return []
+                cursor_key = cursor.order_key
+            stop = self._conversation_order.bisect_left(cursor_key)
+
+        start = 0 if limit is None else max(0, stop - limit)
+        return [
+            self.conversations[conversation_id].to_model()
+            for _, conversation_id in self._conversation_order.islice(start, stop, reverse=True)
+        ]
+
+    def list_idle_conversations(self, before: datetime, limit: int) -> List[Conversation]:
+        """List up to `limit` conversations last updated before `before`, least recently updated first"""
+        stop = min(self._conversation_order.bisect_left((to_timestamp(before),)), limit)
+        return [
+            self.conversations[conversation_id].to_model()
+            for _, conversation_id in self._conversation_order.islice(0, stop)
+        ]
+
+    def set_active_node(
+        self,
+        conversation_id: UUID,
+        node_id: UUID,
+        updated_at: Optional[datetime] = None
+    ) -> Optional[Conversation]:
+        """Select the active node of a conversation and bump its updated_at and version"""
+        record = self.conversations.get(conversation_id.int)
+        if record is None:
+            return None
+
+        self._conversation_order.remove(record.order_key)
+        record.active_node_id = node_id.int
+        record.updated_at = to_timestamp(updated_at or datetime.utcnow())
+        record.version += 1
+        self._conversation_order.add(record.order_key)
+
+        conversation = record.to_model()
+        self._log(
+            "set_active_node",
+            conversation_id=str(conversation_id),
+            node_id=str(node_id),
+            updated_at=conversation.updated_at.isoformat()
         )
+        return conversation
 
     def delete_conversation(self, conversation_id: UUID) -> bool:
         """Delete conversation and all its nodes/edges"""
-        if conversation_id not in self.conversations:
+        key = conversation_id.int
+        if key in self._cold and (self._holders or key in self._conversation_bytes):
+            # It may share records with other conversations, or own records a
+            # fork left behind; load it to let go of them
+            self._load_cold(key)
+        record = self.conversations.pop(key, None)
+        if record is None:
             return False
+        self._conversation_order.remove(record.order_key)
 
-        # Delete all nodes belonging to this conversation
-        nodes_to_delete = [
-            node_id for node_id, node in self.nodes.items()
-            if node.conversation_id == conversation_id
-        ]
-        for node_id in nodes_to_delete:
-            del self.nodes[node_id]
+        # A cold conversation has nothing in memory besides its record
+        tier = self._cold.pop(key, None)
+        if tier is not None:
+            tier.release(key)
+        self._recent.pop(key, None)
 
-        # Delete all edges connected to these nodes
-        edges_to_delete = [
-            edge_id for edge_id, edge in self.edges.items()
-            if edge.source_node_id in nodes_to_delete or edge.target_node_id in nodes_to_delete
-        ]
-        for edge_id in edges_to_delete:
-            del self.edges[edge_id]
+        # Delete its nodes and edges, except those a fork still shares
+        self._changes.pop(key, None)
+        nodes = self._conversation_nodes.pop(key, {})
+        edges = self._conversation_edges.pop(key, {})
+        self._release(key, list(nodes.values()), list(edges.values()))
+        self._record_bytes -= self._conversation_bytes.pop(key, 0)
 
-        # Delete the conversation
-        del self.conversations[conversation_id]
+        self._log("delete_conversation", conversation_id=str(conversation_id))
         return True
 
+    def trim_conversation(self, conversation_id: UUID, limit: int, idle_before: datetime) -> Optional[int]:
+        """
+        Delete the `limit` most recently inserted nodes of a conversation
+        last updated before `idle_before`, with their edges, or the whole
+        conversation once it has no more than `limit` nodes; returns how many
+        nodes it has left, 0 once it is deleted, or None if it is gone or was
+        updated since. Nodes come after their parents, so what is left is
+        still a tree rooted at the root. Lets a large conversation be deleted
+        in steps (see services/expiry.py), each checking updated_at as it
+        deletes, so collectors in several workers can expire the same
+        conversation and a request touching it stops the next step.
+        """
+        key = conversation_id.int
+        record = self.conversations.get(key)
+        if record is None or record.updated_at >= to_timestamp(idle_before):
+            return None
+        nodes = self._conversation_nodes.get(key)
+        # A cold conversation has nothing in memory to delete in steps
+        if key in self._cold or nodes is None or len(nodes) <= limit:
+            self.delete_conversation(conversation_id)
+            return 0
+        edges = self._conversation_edges.get(key, {})
+
+        trimmed = [nodes.popitem()[1] for _ in range(limit)]
+        trimmed_edges: Dict[int, EdgeRecord] = {}
+        for node in trimmed:
+            for edge in node.edges or ():
+                if edges.pop(edge.id, None) is not None:
+                    trimmed_edges[edge.id] = edge
+
+        self._release(key, trimmed, list(trimmed_edges.values()))
+        self._bump_version(key, [node.id for node in trimmed], trimmed_edges)
+        if self.journal is not None:
+            # Replays as deletions of leaves, newest first
+            with self.transaction():
+                for node in trimmed:
+                    self._log("delete_node", node_id=str(UUID(int=node.id)), conversation_id=str(conversation_id))
+        return len(nodes)
+
+    def fork_conversation(
+        self,
+        conversation_id: UUID,
+        node_id: UUID,
+        fork: Conversation
+    ) -> Optional[Conversation]:
+        """
+        Create `fork` as a copy-on-write copy of a conversation: it shares
+        the path from the root to node_id and node_id's subtree with the
+        source, without copying any node or edge. Nodes created later belong
+        to one conversation only, and deleting a shared node from one
+        conversation leaves it in the others.
+        """
+        key = conversation_id.int
+        if key in self._cold:
+            self._load_cold(key)
+        else:
+            self._touch(key)
+        nodes = self._conversation_nodes.get(key)
+        node = nodes.get(node_id.int) if nodes is not None else None
+        if node is None:
+            return None
+
+        shared = {subtree_node.id for subtree_node in self._subtree(node, nodes)}
+        ancestor = _parent(node)
+        while ancestor is not None:
+            shared.add(ancestor.id)
+            ancestor = _parent(ancestor)
+
+        # Keep the source's insertion order, so parents still come before children
+        fork_key = fork.id.int
+        fork_nodes = {shared_id: record for shared_id, record in nodes.items() if shared_id in shared}
+        fork_edges = {
+            edge_id: edge for edge_id, edge in self._conversation_edges.get(key, {}).items()
+            if edge.target_node_id in shared
+        }
+        for record in fork_nodes.values():
+            self._share(record, fork_key, record.footprint())
+        for edge in fork_edges.values():
+            self._share(edge, fork_key, EDGE_BYTES)
+
+        self._put_conversation(ConversationRecord.from_model(fork))
+        self._conversation_nodes[fork_key] = fork_nodes
+        self._conversation_edges[fork_key] = fork_edges
+        self._touch(fork_key)
+        self._log(
+            "fork_conversation",
+            conversation_id=str(conversation_id),
+            node_id=str(node_id),
+            conversation=fork
+        )
+        return fork
+
     # Node operations
     def create_node(self, node: ConversationNode) -> ConversationNode:
         """Store a new node"""
-        self.nodes[node.id] = node
+        if node.conversation_id.int in self._cold:
+            self._load_cold(node.conversation_id.int)
+        record = NodeRecord.from_model(node)
+        if record.id not in self.nodes:
+            # A replayed journal record only refreshes an existing node
+            self._bump_version(record.conversation_id, (record.id,))
+        self._insert_node(record)
+        self._touch(record.conversation_id)
+        self._enforce_budget()
+        self._log("create_node", node=node)
         return node
 
+    def _insert_node(self, node: NodeRecord, view: Optional[int] = None) -> None:
+        """
+        Add a node record to the primary dict and all indexes, as part of the
+        graph of `view` (by default the node's own conversation)
+        """
+        if view is None:
+            view = node.conversation_id
+        existing = self.nodes.get(node.id)
+        if existing is not None:
+            if not self._holds(existing, view):
+                # Loading a conversation that shares the record: keep the resident one
+                self._share(existing, view, existing.footprint())
+            if existing.id not in self._conversation_nodes.setdefault(view, {}):
+                self._conversation_nodes[view][existing.id] = existing
+                return
+            # Replayed journal record: keep the indexed record, refresh its data
+            footprint = existing.footprint()
+            self._share_text(node)
+            self._release_text(existing)
+            existing.context = node.context
+            existing.complete(node.response, node.latency_ms, node.model)
+            existing.query = node.query
+            existing.tokens_used = node.tokens_used
+            existing.revise()
+            self._account(self._bucket(existing), existing.footprint() - footprint)
+            return
+
+        # Cold tiers keep their own copies of shared records, so a record
+        # loaded back from one is held by the loading conversation only
+        node.conversation_id = view
+
+        parent = self.nodes.get(node.parent_id) if node.parent_id is not None else None
+        if parent is not None:
+            # Share the parent's id objects instead of keeping copies per node
+            node.parent_id = parent.id
+            if parent.conversation_id == node.conversation_id:
+                node.conversation_id = parent.conversation_id
+            self._index_ancestry(node, parent)
+            if parent.children is None:
+                parent.children = [node]
+            else:
+                parent.children.append(node)
+
+        self._share_text(node)
+        self.nodes[node.id] = node
+        self._conversation_nodes.setdefault(view, {})[node.id] = node
+        self._account(self._bucket(node), node.footprint())
+
+    def _share_text(self, node: NodeRecord) -> None:
+        """Point a new record's context and response at their shared blobs"""
+        node.context = self._blobs.acquire(node.context)
+        node.response = self._blobs.acquire(node.response)
+
+    def _release_text(self, node: NodeRecord) -> None:
+        """Drop a record's references to its context and response blobs"""
+        self._blobs.release(node.context)
+        self._blobs.release(node.response)
+
+    @staticmethod
+    def _index_ancestry(node: NodeRecord, parent: NodeRecord) -> None:
+        """Record depth and the binary-lifting jump table for a new node"""
+        node.depth = parent.depth + 1
+        jumps = [parent]
+        while True:
+            ancestor_jumps = jumps[-1].jumps
+            level = len(jumps) - 1
+            if level >= len(ancestor_jumps):
+                break
+            jumps.append(ancestor_jumps[level])
+        node.jumps = tuple(jumps)
+
     def get_node(self, node_id: UUID) -> Optional[ConversationNode]:
         """Get node by ID"""
-        return self.nodes.get(node_id)
+        node = self._node(node_id.int)
+        return node.to_model() if node is not None else None
 
-    def delete_node(self, node_id: UUID) -> bool:
-        """Delete node and all its descendants"""
-        if node_id not in self.nodes:
+    def get_node_revision(self, node_id: UUID) -> Optional[int]:
+        """Get the revision of a node (see records.py)"""
+        node = self._node(node_id.int)
+        return revision_of(node) if node is not None else None
+
+    def complete_node(
+        self,
+        node_id: UUID,
+        response: str,
+        latency_ms: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> Optional[ConversationNode]:
+        """Record the final LLM response of a node once its stream has finished"""
+        key = node_id.int
+        node = self._node(key)
+        if node is None:
+            return None
+        if self._cold:
+            self._load_holders(node)
+
+        footprint = node.footprint()
+        shared = self._blobs.acquire(response)
+        self._blobs.release(node.response)
+        node.complete(shared, latency_ms, model)
+        self._account(self._bucket(node), node.footprint() - footprint)
+        # Transcripts cached below the node include its previous response,
+        # and so do the contexts of its descendants
+        for descendant in self._subtree(node) if node.children else (node,):
+            self._transcripts.discard(descendant.id)
+            self._prompt_prefixes.discard(descendant.id)
+            descendant.revise()
+        for holder in self._holders.get(key) or (node.conversation_id,):
+            self._completed(node, holder)
+        self._enforce_budget()
+        self._log(
+            "complete_node",
+            node_id=str(node_id),
+            response=response,
+            latency_ms=latency_ms,
+            model=model
+        )
+        return node.to_model()
+
+    def delete_node(self, node_id: UUID, conversation_id: Optional[UUID] = None) -> bool:
+        """
+        Delete node and all its descendants from a conversation's graph (by
+        default the node's own conversation). Nodes shared with a fork stay
+        in the conversations that still hold them.
+        """
+        if conversation_id is not None:
+            key = conversation_id.int
+        else:
+            node = self._node(node_id.int)
+            if node is None:
+                return False
+            key = node.conversation_id
+        if key in self._cold:
+            self._load_cold(key)
+        nodes = self._conversation_nodes.get(key)
+        node = nodes.get(node_id.int) if nodes is not None else None
+        if node is None:
             return False
+        edges = self._conversation_edges.get(key, {})
 
-        # Find all descendants recursively
-        def get_descendants(parent_id: UUID) -> List[UUID]:
-            children = [
-                node.id for node in self.nodes.values()
-                if node.parent_id == parent_id
-            ]
-            descendants = children.copy()
-            for child_id in children:
-                descendants.extend(get_descendants(child_id))
-            return descendants
-
-        # Delete descendants first
-        descendants = get_descendants(node_id)
-        for desc_id in descendants:
-            if desc_id in self.nodes:
-                del self.nodes[desc_id]
-
-        # Delete edges
-        edges_to_delete = [
-            edge_id for edge_id, edge in self.edges.items()
-            if edge.source_node_id == node_id or edge.target_node_id == node_id
-            or edge.source_node_id in descendants or edge.target_node_id in descendants
-        ]
-        for edge_id in edges_to_delete:
-            del self.edges[edge_id]
+        subtree = self._subtree(node, nodes)
+        for subtree_node in subtree:
+            del nodes[subtree_node.id]
 
-        # Delete the node itself
-        del self.nodes[node_id]
+        # Delete edges touching the subtree
+        edges_to_delete: Dict[int, EdgeRecord] = {}
+        for subtree_node in subtree:
+            for edge in subtree_node.edges or ():
+                if edges.pop(edge.id, None) is not None:
+                    edges_to_delete[edge.id] = edge
+
+        self._release(key, subtree, list(edges_to_delete.values()))
+        self._bump_version(key, [subtree_node.id for subtree_node in subtree], edges_to_delete)
+        if conversation_id is not None:
+            self._log("delete_node", node_id=str(node_id), conversation_id=str(conversation_id))
+        else:
+            self._log("delete_node", node_id=str(node_id))
         return True
 
+    def _completed(self, node: NodeRecord, conversation_id: int) -> None:
+        """Bump the version of a conversation whose graph includes a node that just completed"""
+        if not node.children:
+            self._bump_version(conversation_id, (node.id,))
+            return
+        # Descendants that already exist have new contexts too
+        view = self._conversation_nodes.get(conversation_id)
+        if view is None:
+            # Cold: its descendants are not known here, so stop logging it
+            self._bump_version(conversation_id)
+            self._changes.pop(conversation_id, None)
+            return
+        self._bump_version(conversation_id, [descendant.id for descendant in self._subtree(node, view)])
+
+    @staticmethod
+    def _subtree(node: NodeRecord, view: Optional[Dict[int, NodeRecord]] = None) -> List[NodeRecord]:
+        """
+        Collect a node and all its descendants, parents before children;
+        only those in `view` (a conversation's nodes) if given
+        """
+        subtree = [node]
+        stack = [node]
+        while stack:
+            children = stack.pop().children
+            if children:
+                if view is not None:
+                    children = [child for child in children if child.id in view]
+                subtree.extend(children)
+                stack.extend(children)
+        return subtree
+
     def get_children(self, node_id: UUID) -> List[ConversationNode]:
-        """Get all direct children of a node"""
-        return [
-            node for node in self.nodes.values()
-            if node.parent_id == node_id
-        ]
+        """Get all direct children of a node (in the node's own conversation)"""
+        node = self._node(node_id.int)
+        if node is None:
+            return []
+        children = node.children or ()
+        if node.id in self._holders:
+            # Forks add children to shared nodes too
+            if node.conversation_id in self._cold:
+                self._load_cold(node.conversation_id)
+            nodes = self._conversation_nodes.get(node.conversation_id, {})
+            children = [child for child in children if child.id in nodes]
+        return [child.to_model() for child in children]
 
     def get_ancestors(self, node_id: UUID) -> List[ConversationNode]:
         """Get path from root to node (inclusive)"""
         path = []
-        current_node = self.nodes.get(node_id)
+        current_node = self._node(node_id.int)
 
         while current_node:
-            path.insert(0, current_node)
-            if current_node.parent_id:
-                current_node = self.nodes.get(current_node.parent_id)
-            else:
-                break
+            path.append(current_node.to_model())
+            current_node = _parent(current_node)
 
+        path.reverse()
         return path
 
+    def get_node_context(self, node_id: UUID) -> Optional[str]:
+        """
+        Materialize a node's full context: the root context, the completed
+        turns of its ancestors, and the node's own query.
+        """
+        node = self._node(node_id.int)
+        if node is None:
+            return None
+        parent = _parent(node)
+        if node.context is not None or parent is None:
+            return text_of(node.context) or ""
+        transcript = self._transcript(parent, self._transcripts, TURN_SEPARATOR, True)
+        return transcript + TURN_SEPARATOR + user_turn(node.query)
+
+    def get_prompt_prefix(self, node_id: UUID) -> str:
+        """
+        Completed turns from below the root down to node_id (inclusive),
+        joined the way the streaming endpoint sends them to the LLM.
+        """
+        node = self._node(node_id.int)
+        if node is None:
+            return ""
+        return self._transcript(node, self._prompt_prefixes, PROMPT_TURN_SEPARATOR, False)
+
+    @staticmethod
+    def _transcript(
+        node: NodeRecord,
+        cache: MaterializedCache,
+        separator: str,
+        include_root: bool
+    ) -> str:
+        """
+        Join every completed turn from the root down to `node`, optionally
+        preceded by the root context. Extends the nearest cached ancestor
+        instead of rebuilding from the root, and caches completed nodes on
+        the way down so a child only pays for its parent's turn.
+        """
+        pending: List[NodeRecord] = []
+        transcript = ""
+        current: Optional[NodeRecord] = node
+        while current is not None:
+            cached = cache.get(current.id)
+            if cached is not None:
+                transcript = cached
+                break
+            parent = _parent(current)
+            if parent is None:
+                if include_root:
+                    transcript = text_of(current.context) or ""
+                break
+            pending.append(current)
+            current = parent
+
+        for pending_node in reversed(pending):
+            if pending_node.query and pending_node.response:
+                turn = separator.join((user_turn(pending_node.query), assistant_turn(text_of(pending_node.response))))
+                transcript = separator.join((transcript, turn)) if transcript or include_root else turn
+                cache.put(pending_node.id, transcript)
+        return transcript
+
+    def get_root(self, node_id: UUID) -> Optional[ConversationNode]:
+        """Get the root of the tree containing a node"""
+        node = self._node(node_id.int)
+        if node is None:
+            return None
+        return self._lift(node, node.depth).to_model()
+
+    def get_depth(self, node_id: UUID) -> Optional[int]:
+        """Get the number of edges between a node and its root"""
+        node = self._node(node_id.int)
+        return node.depth if node is not None else None
+
+    @staticmethod
+    def _lift(node: NodeRecord, steps: int) -> NodeRecord:
+        """Jump `steps` levels up from a node using the jump tables"""
+        level = 0
+        while steps:
+            if steps & 1:
+                node = node.jumps[level]
+            steps >>= 1
+            level += 1
+        return node
+
+    def _common_ancestor(self, node_a: NodeRecord, node_b: NodeRecord) -> Optional[NodeRecord]:
+        # Bring both nodes to the same depth
+        if node_a.depth > node_b.depth:
+            node_a = self._lift(node_a, node_a.depth - node_b.depth)
+        elif node_b.depth > node_a.depth:
+            node_b = self._lift(node_b, node_b.depth - node_a.depth)
+
+        if node_a is node_b:
+            return node_a
+
+        # Climb in decreasing powers of two while the ancestors still differ
+        for level in range(len(node_a.jumps) - 1, -1, -1):
+            if level < len(node_a.jumps) and node_a.jumps[level] is not node_b.jumps[level]:
+                node_a, node_b = node_a.jumps[level], node_b.jumps[level]
+
+        parent_a, parent_b = _parent(node_a), _parent(node_b)
+        if parent_a is None or parent_a is not parent_b:
+            return None  # Different trees
+        return parent_a
+
+    def lowest_common_ancestor(self, node_a_id: UUID, node_b_id: UUID) -> Optional[ConversationNode]:
+        """Get the deepest node that is an ancestor of both nodes (inclusive)"""
+        node_a, node_b = self._node(node_a_id.int), self._node(node_b_id.int)
+        if node_a is None or node_b is None:
+            return None
+        ancestor = self._common_ancestor(node_a, node_b)
+        return ancestor.to_model() if ancestor is not None else None
+
+    def compare_branches(
+        self, node_a_id: UUID, node_b_id: UUID
+    ) -> Optional[Tuple[ConversationNode, List[ConversationNode], List[ConversationNode]]]:
+        """
+        Split two nodes' paths at their lowest common ancestor.
+
+        Returns (common_ancestor, branch_a, branch_b) where each branch lists
+        the nodes below the common ancestor down to the node (inclusive).
+        """
+        node_a, node_b = self._node(node_a_id.int), self._node(node_b_id.int)
+        if node_a is None or node_b is None:
+            return None
+        ancestor = self._common_ancestor(node_a, node_b)
+        if ancestor is None:
+            return None
+
+        def branch(node: NodeRecord) -> List[ConversationNode]:
+            nodes = []
+            while node is not ancestor:
+                nodes.append(node.to_model())
+                node = _parent(node)
+            nodes.reverse()
+            return nodes
+
+        return ancestor.to_model(), branch(node_a), branch(node_b)
+
     # Edge operations
     def create_edge(self, edge: ConversationEdge) -> ConversationEdge:
         """Store a new edge"""
-        self.edges[edge.id] = edge
+        # Loads the source node's conversation if it is still cold
+        self._node(edge.source_node_id.int)
+        record = EdgeRecord.from_model(edge)
+        self._insert_edge(record)
+        if record.conversation_id is not None:
+            # Edges are created with their target node, as part of its version
+            self._bump_version(record.conversation_id, edge_ids=(record.id,), bump=False)
+        self._log("create_edge", edge=edge)
         return edge
 
+    def _insert_edge(self, edge: EdgeRecord, view: Optional[int] = None) -> None:
+        """
+        Add an edge record to the primary dict and its endpoints' indexes, as
+        part of the graph of `view` (by default its target's conversation)
+        """
+        source = self.nodes.get(edge.source_node_id)
+        target = self.nodes.get(edge.target_node_id)
+        if view is None:
+            # Edges belong to the conversation of the node they lead to: a
+            # fork's branch may start at a node it shares with its source
+            owner = target if target is not None else source
+            view = owner.conversation_id if owner is not None else None
+
+        existing = self.edges.get(edge.id)
+        if existing is not None:
+            if view is not None and existing.id not in self._conversation_edges.get(view, ()):
+                # Loading a conversation that shares the record: keep the resident one
+                if not self._holds(existing, view):
+                    self._share(existing, view, EDGE_BYTES)
+                self._conversation_edges.setdefault(view, {})[existing.id] = existing
+                return
+            self._remove_edge(existing)
+        self.edges[edge.id] = edge
+
+        if view is not None:
+            edge.conversation_id = view
+            self._conversation_edges.setdefault(view, {})[edge.id] = edge
+            self._account(self._bucket(edge), EDGE_BYTES)
+        if source is not None:
+            edge.source_node_id = source.id
+            self._attach_edge(source, edge)
+        if target is not None and target is not source:
+            edge.target_node_id = target.id
+            if edge.query_text == target.query:
+                edge.query_text = target.query
+            self._attach_edge(target, edge)
+
+    @staticmethod
+    def _attach_edge(node: NodeRecord, edge: EdgeRecord) -> None:
+        if node.edges is None:
+            node.edges = [edge]
+        else:
+            node.edges.append(edge)
+
+    def _remove_edge(self, edge: EdgeRecord) -> None:
+        """Drop a single edge record from the primary dict and all indexes"""
+        del self.edges[edge.id]
+        for endpoint_id in (edge.source_node_id, edge.target_node_id):
+            endpoint = self.nodes.get(endpoint_id)
+            if endpoint is not None and endpoint.edges and edge in endpoint.edges:
+                endpoint.edges.remove(edge)
+                if not endpoint.edges:
+                    endpoint.edges = None
+        if edge.conversation_id is not None:
+            self._account(self._bucket(edge), -EDGE_BYTES)
+            for holder in self._holders.pop(edge.id, None) or (edge.conversation_id,):
+                edges = self._conversation_edges.get(holder)
+                if edges is not None:
+                    edges.pop(edge.id, None)
+
     def get_edge(self, edge_id: UUID) -> Optional[ConversationEdge]:
         """Get edge by ID"""
-        return self.edges.get(edge_id)
+        edge = self.edges.get(edge_id.int)
+        return edge.to_model() if edge is not None else None
 
     def get_conversation_edges(self, conversation_id: UUID) -> List[ConversationEdge]:
         """Get all edges for a conversation"""
-        node_ids = {
-            node.id for node in self.nodes.values()
-            if node.conversation_id == conversation_id
-        }
-        return [
-            edge for edge in self.edges.values()
-            if edge.source_node_id in node_ids
-        ]
+        key = conversation_id.int
+        if key in self._cold:
+            self._load_cold(key)
+        else:
+            self._touch(key)
+        return [edge.to_model() for edge in self._conversation_edges.get(key, {}).values()]
+
+    def get_graph_changes(self, conversation_id: UUID, since: int) -> Optional[GraphChanges]:
+        """
+        Get what changed in a conversation's graph after version `since`: the
+        nodes and edges added or changed, and the ids of those deleted. None
+        if the conversation is unknown or its changes are not logged back to
+        `since` (see changes.ChangeLog); the caller then needs the full graph.
+        """
+        key = conversation_id.int
+        record = self.conversations.get(key)
+        if record is None or since > record.version:
+            return None
+        if since == record.version:
+            node_ids, edge_ids = {}, {}
+        else:
+            log = self._changes.get(key)
+            changed = log.since(since) if log is not None else None
+            if changed is None:
+                return None
+            node_ids, edge_ids = changed
+        self._touch(key)
+
+        nodes = self._conversation_nodes.get(key, {})
+        edges = self._conversation_edges.get(key, {})
+        return GraphChanges(
+            conversation=record.to_model(),
+            nodes=[nodes[node_id].to_model() for node_id in node_ids if node_id in nodes],
+            edges=[edges[edge_id].to_model() for edge_id in edge_ids if edge_id in edges],
+            deleted_node_ids=[UUID(int=node_id) for node_id in node_ids if node_id not in nodes],
+            deleted_edge_ids=[UUID(int=edge_id) for edge_id in edge_ids if edge_id not in edges]
+        )
+
+    def has_node(self, conversation_id: UUID, node_id: UUID) -> bool:
+        """Whether a node is part of a conversation's graph (its own or shared by a fork)"""
+        key = conversation_id.int
+        if key in self._cold:
+            self._load_cold(key)
+        else:
+            self._touch(key)
+        return node_id.int in self._conversation_nodes.get(key, ())
 
     def get_conversation_nodes(self, conversation_id: UUID) -> List[ConversationNode]:
         """Get all nodes for a conversation"""
-        return [
-            node for node in self.nodes.values()
-            if node.conversation_id == conversation_id
-        ]
+        key = conversation_id.int
+        if key in self._cold:
+            self._load_cold(key)
+        else:
+            self._touch(key)
+        return [node.to_model() for node in self._conversation_nodes.get(key, {}).values()]
+
+    def get_graph_revisions(self, conversation_id: UUID) -> GraphRevisions:
+        """
+        Get the ids and revisions (see records.py) of a conversation's nodes,
+        parents first, and edges
+        """
+        key = conversation_id.int
+        if key in self._cold:
+            self._load_cold(key)
+        else:
+            self._touch(key)
+        return GraphRevisions(
+            [(UUID(int=node.id), revision_of(node)) for node in self._conversation_nodes.get(key, {}).values()],
+            [(UUID(int=edge.id), revision_of(edge)) for edge in self._conversation_edges.get(key, {}).values()]
+        )
+
+    def get_node_summaries(self, conversation_id: UUID) -> List[NodeSummary]:
+        """Get all nodes for a conversation with previews instead of their texts"""
+        key = conversation_id.int
+        if key in self._cold:
+            self._load_cold(key)
+        else:
+            self._touch(key)
+        return [node.to_summary() for node in self._conversation_nodes.get(key, {}).values()]
+
+    def iter_conversation_records(self, conversation_id: UUID) -> Iterator[Union[ConversationNode, ConversationEdge]]:
+        """
+        Iterate over a conversation's nodes (parents first), then its edges.
+        Only references to the records are captured here; models are built
+        as the iterator is consumed, so an export never holds the whole graph.
+        """
+        key = conversation_id.int
+        if key in self._cold:
+            self._load_cold(key)
+        else:
+            self._touch(key)
+        nodes = list(self._conversation_nodes.get(key, {}).values())
+        edges = list(self._conversation_edges.get(key, {}).values())
+        return chain((node.to_model() for node in nodes), (edge.to_model() for edge in edges))
+
+
+def create_memory_store() -> InMemoryStore:
+    """
+    Create the InMemoryStore configured by the environment. Data is lost on
+    restart unless STORE_WAL_DIR is set, in which case every mutation is
+    journaled there and replayed on startup (snapshot every
+    STORE_SNAPSHOT_EVERY records). With STORE_MEMORY_BUDGET_MB, least
+    recently used conversations beyond the budget are spilled to
+    STORE_SPILL_DIR. STORE_COMPRESSION=zstd compresses long node text
+    (level STORE_COMPRESSION_LEVEL)
+    """
+    budget_mb = os.getenv("STORE_MEMORY_BUDGET_MB")
+    compression = os.getenv("STORE_COMPRESSION", "").lower()
+    if compression not in ("", "none", "zstd"):
+        raise ValueError(f"Unknown STORE_COMPRESSION: {compression}")
+    memory_store = InMemoryStore(
+        memory_budget=int(float(budget_mb) * 1024 * 1024) if budget_mb else None,
+        spill_dir=os.getenv("STORE_SPILL_DIR"),
+        codec=TextCodec(
+            level=int(os.getenv("STORE_COMPRESSION_LEVEL", "3"))
+        ) if compression == "zstd" else None
+    )
+    wal_dir = os.getenv("STORE_WAL_DIR")
+    if wal_dir:
+        from .persistence.journal import Journal
+        Journal(
+            wal_dir,
+            snapshot_every=int(os.getenv("STORE_SNAPSHOT_EVERY", "100000"))
+        ).attach(memory_store)
+    return memory_store
+
+
+def create_store() -> StoreBackend:
+    """
+    Create the store backend selected by the environment:
+
+    STORE_BACKEND=memory (default): InMemoryStore (see create_memory_store)
+    STORE_BACKEND=sqlite: SQLiteStore at SQLITE_PATH, keeping STORE_CACHE_SIZE
+        hot conversations in memory
+    STORE_BACKEND=remote: RemoteStore connected to the store server at
+        STORE_SOCKET, so several API workers share one store. The server
+        (python -m app.store_server) holds an InMemoryStore configured by the
+        same variables
+    STORE_BACKEND=redis: RedisStore on the Redis server at REDIS_URL, so any
+        number of API nodes share the conversations; keys start with
+        REDIS_PREFIX and STORE_CACHE_SIZE hot conversations stay in memory
+    """
+    backend = os.getenv("STORE_BACKEND", "memory").lower()
+    if backend == "memory":
+        return create_memory_store()
+    if backend == "sqlite":
+        from .backends.sqlite import SQLiteStore
+        return SQLiteStore(
+            path=os.getenv("SQLITE_PATH", "converge.db"),
+            cache_size=int(os.getenv("STORE_CACHE_SIZE", "256"))
+        )
+    if backend == "remote":
+        from .backends.remote import DEFAULT_SOCKET, RemoteStore
+        return RemoteStore(os.getenv("STORE_SOCKET", DEFAULT_SOCKET))
+    if backend == "redis":
+        from .backends.redis import DEFAULT_PREFIX, RedisStore
+        return RedisStore(
+            url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("REDIS_PREFIX", DEFAULT_PREFIX),
+            cache_size=int(os.getenv("STORE_CACHE_SIZE", "256"))
+        )
+    raise ValueError(f"Unknown STORE_BACKEND: {backend}")
+
 
+# Load environment variables from project root before selecting the backend
+env_path = Path(__file__).parent.parent.parent / '.env'
+load_dotenv(dotenv_path=env_path)
 
 # Global store instance
-store = InMemoryStore()
+store: StoreBackend = create_store()
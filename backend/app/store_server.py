@@ -0,0 +1,170 @@
+"""
+Store server for ConVerge
+
+Owns the single store shared by every API worker in multi-worker mode.
+Workers run with STORE_BACKEND=remote and connect to STORE_SOCKET; the
+server answers them over the binary protocol in backends/wire.py.
+
+The server is one asyncio event loop: store operations run one at a time,
+so they need no locking, and every request a worker pipelined is answered
+with a single write. While a connection is inside a transaction (BEGIN ...
+COMMIT) the frames of other connections wait in their buffers.
+
+Usage (from backend/):
+    STORE_BACKEND=remote python -m app.store_server
+"""
+import asyncio
+import logging
+import os
+import signal
+from contextlib import ExitStack
+from typing import List, Optional
+
+from .backends.base import StoreBackend
+from .backends.remote import DEFAULT_SOCKET, RemoteStore
+from .backends.wire import (
+    BEGIN,
+    BY_CODE,
+    COMMIT,
+    HEADER,
+    decode_args,
+    encode_error,
+    encode_reply,
+)
+from .store import create_memory_store, store as configured_store
+
+logger = logging.getLogger(__name__)
+
+
+class _Connection(asyncio.Protocol):
+    """One worker's connection; frames are parsed and answered as they arrive"""
+
+    def __init__(self, server: "StoreServer"):
+        self.server = server
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.transaction_depth = 0
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        self.server.process(self)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.server.disconnect(self)
+
+
+class StoreServer:
+    """Applies requests from worker connections to one store backend"""
+
+    def __init__(self, backend: StoreBackend):
+        self.backend = backend
+        # Connection inside a transaction, and the store transaction it holds open
+        self._owner: Optional[_Connection] = None
+        self._transaction: Optional[ExitStack] = None
+        # Connections with frames left over while another one held a transaction
+        self._waiting: List[_Connection] = []
+
+    def process(self, connection: _Connection) -> None:
+        """Answer every complete frame buffered on a connection"""
+        buffer = connection.buffer
+        replies = []
+        offset = 0
+        while len(buffer) - offset >= HEADER.size:
+            if self._owner is not None and self._owner is not connection:
+                if connection not in self._waiting:
+                    self._waiting.append(connection)
+                break
+            length, code = HEADER.unpack_from(buffer, offset)
+            end = offset + HEADER.size + length
+            if len(buffer) < end:
+                break
+            replies.append(self._handle(connection, code, bytes(buffer[offset + HEADER.size:end])))
+            offset = end
+        del buffer[:offset]
+
+        if replies:
+            connection.transport.write(b"".join(replies))
+        if self._owner is None and self._waiting:
+            self._resume()
+
+    def _handle(self, connection: _Connection, code: int, payload: bytes) -> bytes:
+        op = BY_CODE[code] if 0 < code < len(BY_CODE) else None
+        if op is None:
+            return encode_error(f"Unknown op code {code}")
+
+        if op is BEGIN:
+            if not connection.transaction_depth:
+                self._owner = connection
+                self._transaction = ExitStack()
+                self._transaction.enter_context(self.backend.transaction())
+            connection.transaction_depth += 1
+            return encode_reply(op, None)
+        if op is COMMIT:
+            if connection.transaction_depth:
+                connection.transaction_depth -= 1
+                if not connection.transaction_depth:
+                    self._end_transaction()
+            return encode_reply(op, None)
+
+        try:
+            return encode_reply(op, getattr(self.backend, op.name)(*decode_args(op, payload)))
+        except Exception as e:
+            logger.exception(f"Store request {op.name} failed")
+            return encode_error(f"{type(e).__name__}: {e}")
+
+    def _end_transaction(self) -> None:
+        transaction, self._transaction, self._owner = self._transaction, None, None
+        transaction.close()
+
+    def _resume(self) -> None:
+        """Serve connections that waited for a transaction to end"""
+        while self._owner is None and self._waiting:
+            self.process(self._waiting.pop(0))
+
+    def disconnect(self, connection: _Connection) -> None:
+        if connection in self._waiting:
+            self._waiting.remove(connection)
+        if self._owner is connection:
+            logger.warning("Worker disconnected inside a transaction; committing what it sent")
+            connection.transaction_depth = 0
+            self._end_transaction()
+            self._resume()
+
+
+async def serve(backend: StoreBackend, path: str) -> None:
+    """Serve `backend` on a Unix socket until SIGINT or SIGTERM"""
+    loop = asyncio.get_running_loop()
+    server = StoreServer(backend)
+
+    if os.path.exists(path):
+        os.unlink(path)  # Left behind by a previous run
+    unix_server = await loop.create_unix_server(lambda: _Connection(server), path=path)
+    os.chmod(path, 0o660)  # Workers may run as another user of the same group
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info(f"Store server listening on {path}")
+    async with unix_server:
+        await stop.wait()
+    logger.info("Store server stopped")
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    # Workers select STORE_BACKEND=remote; the server then owns an in-memory
+    # store of its own. Any other backend is served as configured
+    backend = create_memory_store() if isinstance(configured_store, RemoteStore) else configured_store
+    asyncio.run(serve(backend, os.getenv("STORE_SOCKET", DEFAULT_SOCKET)))
+
+
+if __name__ == "__main__":
+    main()
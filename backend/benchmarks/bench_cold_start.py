@@ -0,0 +1,99 @@
+"""
+Benchmark: startup from a binary memory-mapped snapshot vs. replaying records
+
+Builds a store with many small conversations, writes it once as a binary
+snapshot and once as JSON create_* records (the previous snapshot format),
+then measures how long each takes before the store can serve requests, and
+the cost of the first access to a cold conversation.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cold_start [conversations] [nodes_per_conversation]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.persistence.journal import apply_record, encode_record
+from app.persistence.snapshot import MappedSnapshot, write_snapshot
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+
+
+def build(conversations: int, nodes_per_conversation: int) -> InMemoryStore:
+    store = InMemoryStore()
+    for _ in range(conversations):
+        root = ConversationNode(conversation_id=uuid4(), context="You are a helpful AI assistant.")
+        store.create_node(root)
+        store.create_conversation(Conversation(
+            id=root.conversation_id, root_node_id=root.id, active_node_id=root.id
+        ))
+        parent_id = root.id
+        for i in range(nodes_per_conversation - 1):
+            node = ConversationNode(conversation_id=root.conversation_id, parent_id=parent_id,
+                                    query=f"q{i}", response=RESPONSE, model="bench", latency_ms=100)
+            store.create_node(node)
+            store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+            parent_id = node.id
+    return store
+
+
+def main():
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    nodes_per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    store = build(conversations, nodes_per_conversation)
+    print(f"{len(store.conversations)} conversations, {len(store.nodes)} nodes")
+
+    with tempfile.TemporaryDirectory() as directory:
+        binary_path = Path(directory) / "snapshot.snap"
+        json_path = Path(directory) / "snapshot.jsonl"
+
+        start = time.perf_counter()
+        write_snapshot(binary_path, store._snapshot_state())
+        print(f"Binary snapshot write: {time.perf_counter() - start:.2f}s "
+              f"({binary_path.stat().st_size / 2**20:.1f} MiB)")
+
+        with open(json_path, "w") as f:
+            for node in store.nodes.values():
+                f.write(encode_record({"op": "create_node", "node": node.to_model()}) + "\n")
+            for edge in store.edges.values():
+                f.write(encode_record({"op": "create_edge", "edge": edge.to_model()}) + "\n")
+            for conversation in store.conversations.values():
+                f.write(encode_record({"op": "create_conversation", "conversation": conversation.to_model()}) + "\n")
+
+        start = time.perf_counter()
+        replayed = InMemoryStore()
+        with open(json_path, "rb") as f:
+            for line in f:
+                apply_record(replayed, json.loads(line))
+        print(f"JSON replay startup:   {time.perf_counter() - start:.3f}s")
+
+        start = time.perf_counter()
+        mapped = InMemoryStore()
+        tier = MappedSnapshot(binary_path)
+        for conversation in tier.conversations:
+            mapped.attach_cold(conversation, tier)
+        print(f"Mapped startup:        {time.perf_counter() - start:.3f}s")
+
+        conversation = mapped.list_conversations(limit=1)[0]
+        start = time.perf_counter()
+        nodes = mapped.get_conversation_nodes(conversation.id)
+        print(f"First access to one conversation ({len(nodes)} nodes): "
+              f"{(time.perf_counter() - start) * 1e3:.2f} ms")
+
+        start = time.perf_counter()
+        mapped.get_node_context(conversation.active_node_id)
+        print(f"Context of a loaded node: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+        last = store.list_conversations()[-1]
+        start = time.perf_counter()
+        mapped.get_node(last.root_node_id)
+        print(f"Node lookup faulting in its conversation: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: zstd compression of node text in InMemoryStore
+
+Builds the same store of synthetic assistant responses without compression
+and with several zstd levels / dictionary sizes, and reports the
+compression ratio of the distinct stored texts, the resident bytes of the
+store, the cost added to complete_node, and get_node latency for random
+(mostly uncached) and repeated (cached) reads.
+
+Usage (from backend/):
+    python -m benchmarks.bench_compression [nodes]
+"""
+import random
+import statistics
+import sys
+import time
+from typing import Optional
+from uuid import uuid4
+
+from app.compression import CompressedText, TextCodec
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.store import InMemoryStore
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant. Answer concisely, use Markdown for code "
+    "and lists, and say so when you are not sure about something."
+)
+TOPICS = ["Python", "a REST API", "SQL indexes", "React state", "Docker images", "unit tests", "asyncio"]
+VERBS = ["configure", "debug", "optimize", "structure", "deploy", "test", "document"]
+SENTENCES = [
+    "Here is a step-by-step explanation of how to {verb} {topic}.",
+    "The most common mistake when you {verb} {topic} is forgetting the edge cases.",
+    "First, make sure your environment is set up correctly and dependencies are installed.",
+    "In short, {topic} works best when you keep each component small and focused.",
+    "You can verify the result by running the tests again and checking the output.",
+    "Let me know if you want a more detailed example of how to {verb} {topic}.",
+    "```python\ndef {verb}_{n}(items):\n    return [item for item in items if item]\n```",
+    "- **Option {n}**: {verb} {topic} incrementally and measure after each change.",
+]
+
+
+def response(rng: random.Random) -> str:
+    topic, verb = rng.choice(TOPICS), rng.choice(VERBS)
+    return "\n\n".join(
+        rng.choice(SENTENCES).format(topic=topic, verb=verb, n=rng.randint(1, 99))
+        for _ in range(rng.randint(3, 14))
+    )
+
+
+def build(nodes: int, codec: Optional[TextCodec]):
+    rng = random.Random(0)
+    store = InMemoryStore(codec=codec)
+    node_ids, complete_times = [], []
+    while len(node_ids) < nodes:
+        root = ConversationNode(conversation_id=uuid4(), context=SYSTEM_PROMPT)
+        store.create_node(root)
+        store.create_conversation(Conversation(id=root.conversation_id, root_node_id=root.id, active_node_id=root.id))
+        parent_id = root.id
+        for i in range(min(50, nodes - len(node_ids))):
+            node = ConversationNode(conversation_id=root.conversation_id, parent_id=parent_id, query=f"How do I do step {i}?")
+            store.create_node(node)
+            store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+            text = response(rng)
+            start = time.perf_counter()
+            store.complete_node(node.id, text, latency_ms=100, model="bench")
+            complete_times.append(time.perf_counter() - start)
+            node_ids.append(node.id)
+            parent_id = node.id
+    return store, node_ids, complete_times
+
+
+def text_sizes(store: InMemoryStore):
+    plain = stored = 0
+    for blob in store._blobs._blobs.values():
+        text = blob.text().encode()
+        plain += len(text)
+        stored += len(blob.value.data) if isinstance(blob.value, CompressedText) else len(text)
+    return plain, stored
+
+
+def read_latency(store: InMemoryStore, node_ids, rng: random.Random):
+    sample = [rng.choice(node_ids) for _ in range(2000)]
+    start = time.perf_counter()
+    for node_id in sample:
+        store.get_node(node_id)
+    random_reads = (time.perf_counter() - start) / len(sample)
+
+    hot = node_ids[:20]
+    start = time.perf_counter()
+    for _ in range(100):
+        for node_id in hot:
+            store.get_node(node_id)
+    hot_reads = (time.perf_counter() - start) / (100 * len(hot))
+    return random_reads, hot_reads
+
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    settings = [("plain", None)] + [
+        (f"zstd level {level}, dict {dict_size // 1024} KiB", (level, dict_size))
+        for level, dict_size in [(1, 64 * 1024), (3, 16 * 1024), (3, 64 * 1024), (9, 64 * 1024), (19, 112 * 1024)]
+    ]
+
+    print(f"{nodes} nodes\n")
+    print(f"{'setting':<26}{'text ratio':>11}{'resident MiB':>14}{'complete us':>13}{'random get us':>15}{'hot get us':>12}")
+    for name, setting in settings:
+        codec = None
+        if setting is not None:
+            level, dict_size = setting
+            codec = TextCodec(level=level, dict_size=dict_size, training_bytes=2 * 1024 * 1024)
+        store, node_ids, complete_times = build(nodes, codec)
+        plain, stored = text_sizes(store)
+        random_reads, hot_reads = read_latency(store, node_ids, random.Random(1))
+        print(
+            f"{name:<26}{plain / stored:>10.2f}x{store.resident_bytes / 2**20:>14.1f}"
+            f"{statistics.median(complete_times) * 1e6:>13.1f}{random_reads * 1e6:>15.1f}{hot_reads * 1e6:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
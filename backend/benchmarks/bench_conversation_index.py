@@ -0,0 +1,100 @@
+"""
+Benchmark: per-conversation graph lookups with and without the secondary index
+
+Builds a synthetic store and compares InMemoryStore.get_conversation_nodes /
+get_conversation_edges against the previous full scan over every node and edge.
+
+Usage (from backend/):
+    python -m benchmarks.bench_conversation_index [conversations] [nodes_per_conversation]
+"""
+import random
+import sys
+import time
+from uuid import UUID
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.store import InMemoryStore
+
+
+def build_store(conversations: int, nodes_per_conversation: int) -> InMemoryStore:
+    store = InMemoryStore()
+    for _ in range(conversations):
+        conversation = Conversation(root_node_id=UUID(int=0), active_node_id=UUID(int=0))
+        root = ConversationNode(conversation_id=conversation.id, context="You are a helpful AI assistant.")
+        conversation.root_node_id = conversation.active_node_id = root.id
+        store.create_node(root)
+        store.create_conversation(conversation)
+
+        parents = [root]
+        for i in range(nodes_per_conversation - 1):
+            parent = random.choice(parents)
+            node = ConversationNode(
+                conversation_id=conversation.id,
+                parent_id=parent.id,
+                context="",
+                query=f"question {i}",
+                response=f"answer {i}",
+            )
+            store.create_node(node)
+            store.create_edge(ConversationEdge(
+                source_node_id=parent.id,
+                target_node_id=node.id,
+                query_text=node.query,
+            ))
+            parents.append(node)
+    return store
+
+
+def full_scan_graph(store: InMemoryStore, conversation_id: UUID):
+    """The pre-index implementation: scan every node and edge in the process"""
+    nodes = [n for n in store.nodes.values() if n.conversation_id == conversation_id.int]
+    node_ids = {n.id for n in nodes}
+    edges = [e for e in store.edges.values() if e.source_node_id in node_ids]
+    return nodes, edges
+
+
+def indexed_graph(store: InMemoryStore, conversation_id: UUID):
+    return (
+        store.get_conversation_nodes(conversation_id),
+        store.get_conversation_edges(conversation_id),
+    )
+
+
+def timeit(fn, store, conversation_ids) -> float:
+    start = time.perf_counter()
+    for conversation_id in conversation_ids:
+        fn(store, conversation_id)
+    return (time.perf_counter() - start) / len(conversation_ids)
+
+
+def main():
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    nodes_per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+
+    print(f"Building store: {conversations} conversations x {nodes_per_conversation} nodes ...")
+    store = build_store(conversations, nodes_per_conversation)
+    print(f"  {len(store.nodes)} nodes, {len(store.edges)} edges")
+
+    sample = [UUID(int=key) for key in random.sample(list(store.conversations), min(50, conversations))]
+
+    # Sanity check: both strategies return the same graph
+    for conversation_id in sample[:5]:
+        scan_nodes, scan_edges = full_scan_graph(store, conversation_id)
+        idx_nodes, idx_edges = indexed_graph(store, conversation_id)
+        assert {n.id for n in scan_nodes} == {n.id.int for n in idx_nodes}
+        assert {e.id for e in scan_edges} == {e.id.int for e in idx_edges}
+
+    scan = timeit(full_scan_graph, store, sample)
+    indexed = timeit(indexed_graph, store, sample)
+    print(f"Full scan: {scan * 1e3:9.3f} ms per graph fetch")
+    print(f"Indexed:   {indexed * 1e3:9.3f} ms per graph fetch")
+    print(f"Speedup:   {scan / indexed:9.1f}x")
+
+    start = time.perf_counter()
+    for conversation_id in sample:
+        store.delete_conversation(conversation_id)
+    print(f"delete_conversation: {(time.perf_counter() - start) / len(sample) * 1e3:.3f} ms each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: forking a conversation versus copying it
+
+Builds a template conversation and creates many conversations from it, once
+with InMemoryStore.fork_conversation (copy-on-write: the forks share the
+template's node and edge records) and once by copying every node and edge
+under new ids, as a client would without the fork endpoint. Reports the
+time per fork or copy, the growth of the store's resident bytes estimate,
+and the memory actually allocated (tracemalloc), which for forks is the
+per-conversation indexes the estimate leaves out.
+
+Usage (from backend/):
+    python -m benchmarks.bench_fork [template_nodes] [forks]
+    e.g. python -m benchmarks.bench_fork 300 200
+"""
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict
+from uuid import UUID
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.sharding import new_conversation_id
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+
+
+def template(store: InMemoryStore, node_count: int) -> Conversation:
+    """A conversation of node_count completed turns branching at random"""
+    rng = random.Random(0)
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant.")
+    conversation = Conversation(id=root.conversation_id, title="Template",
+                                root_node_id=root.id, active_node_id=root.id)
+    store.create_node(root)
+    store.create_conversation(conversation)
+    node_ids = [root.id]
+    for i in range(node_count - 1):
+        parent_id = rng.choice(node_ids)
+        node = ConversationNode(conversation_id=conversation.id, parent_id=parent_id, query=f"q{i}",
+                                response=RESPONSE + str(i), model="bench", latency_ms=100)
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+        node_ids.append(node.id)
+    return conversation
+
+
+def fork(store: InMemoryStore, source: Conversation) -> None:
+    store.fork_conversation(source.id, source.root_node_id, Conversation(
+        title=f"{source.title} (fork)", root_node_id=source.root_node_id, active_node_id=source.active_node_id
+    ))
+
+
+def copy(store: InMemoryStore, source: Conversation) -> None:
+    """Recreate every node and edge of `source` in a new conversation"""
+    conversation_id = new_conversation_id()
+    new_ids: Dict[UUID, UUID] = {}
+    for node in store.get_conversation_nodes(source.id):
+        clone = ConversationNode(
+            conversation_id=conversation_id,
+            parent_id=new_ids[node.parent_id] if node.parent_id is not None else None,
+            context=node.context, response=node.response, query=node.query,
+            model=node.model, tokens_used=node.tokens_used, latency_ms=node.latency_ms
+        )
+        new_ids[node.id] = clone.id
+        store.create_node(clone)
+    for edge in store.get_conversation_edges(source.id):
+        store.create_edge(ConversationEdge(
+            source_node_id=new_ids[edge.source_node_id],
+            target_node_id=new_ids[edge.target_node_id],
+            query_text=edge.query_text
+        ))
+    root_id = new_ids[source.root_node_id]
+    store.create_conversation(Conversation(
+        id=conversation_id, title=f"{source.title} (copy)", root_node_id=root_id, active_node_id=root_id
+    ))
+
+
+def main():
+    node_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    forks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print(f"template of {node_count} nodes, {forks} conversations created from it")
+    print(f"{'method':<8} {'ms each':>10} {'resident KB each':>17} {'allocated KB each':>18}")
+    for name, create in (("fork", fork), ("copy", copy)):
+        store = InMemoryStore()
+        source = template(store, node_count)
+
+        base = store.resident_bytes
+        start = time.perf_counter()
+        for _ in range(forks):
+            create(store, source)
+        elapsed = time.perf_counter() - start
+        resident = store.resident_bytes - base
+
+        # Allocations are measured in a second pass; tracing slows the timed one down
+        tracemalloc.start()
+        traced = tracemalloc.get_traced_memory()[0]
+        for _ in range(forks):
+            create(store, source)
+        allocated = tracemalloc.get_traced_memory()[0] - traced
+        tracemalloc.stop()
+
+        print(f"{name:<8} {elapsed / forks * 1000:>10.3f} {resident / forks / 1024:>17.1f} "
+              f"{allocated / forks / 1024:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
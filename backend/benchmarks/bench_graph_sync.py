@@ -0,0 +1,86 @@
+"""
+Benchmark: full graph refetch versus ?view=summary and ?since= deltas
+
+Grows a conversation turn by turn, as the frontend does, and after every
+turn (a new node and edge, then its completion) refreshes the client's copy
+of the graph with a full GET /graph, a GET /graph?view=summary (previews
+instead of texts and materialized contexts) and a GET /graph?view=summary&
+since=<previous version>. Reports the average response size and server time
+per refresh at a few graph sizes; full refreshes grow with the tree and its
+depth, summaries with the tree, deltas with the change.
+
+Usage (from backend/):
+    python -m benchmarks.bench_graph_sync [nodes]
+    e.g. python -m benchmarks.bench_graph_sync 2000
+"""
+import asyncio
+import logging
+import random
+import sys
+import time
+
+from fastapi import Request
+
+from app.api.conversations import get_conversation_graph
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.sharding import new_conversation_id
+from app.store import store
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+# Refreshes measured at each checkpoint
+SAMPLES = 20
+
+
+def add_turn(conversation: Conversation, parent_id, i: int) -> ConversationNode:
+    node = ConversationNode(conversation_id=conversation.id, parent_id=parent_id, query=f"q{i}")
+    with store.transaction():
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+    store.complete_node(node.id, RESPONSE + str(i), 100, "bench")
+    return node
+
+
+def refresh(conversation: Conversation, since=None, view="full"):
+    """Server time and response bytes of one graph request"""
+    request = Request({"type": "http", "headers": []})
+    start = time.perf_counter()
+    response = asyncio.run(get_conversation_graph(conversation.id, request, since, view))
+    return time.perf_counter() - start, len(response.body)
+
+
+def main():
+    node_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    logging.disable(logging.INFO)
+    rng = random.Random(0)
+
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant.")
+    conversation = Conversation(id=root.conversation_id, title="Sync", root_node_id=root.id, active_node_id=root.id)
+    store.create_node(root)
+    store.create_conversation(conversation)
+    node_ids = [root.id]
+
+    checkpoints = sorted({node_count // 8, node_count // 4, node_count // 2, node_count})
+    views = ("full", "summary", "delta")
+    print(f"{'nodes':>7}" + "".join(f" {name + ' KB':>11} {name + ' ms':>11}" for name in views))
+    for checkpoint in checkpoints:
+        while len(node_ids) < checkpoint - SAMPLES:
+            node_ids.append(add_turn(conversation, rng.choice(node_ids[-20:]), len(node_ids)).id)
+
+        times = dict.fromkeys(views, 0.0)
+        sizes = dict.fromkeys(views, 0)
+        for _ in range(SAMPLES):
+            version = store.get_conversation(conversation.id).version
+            node_ids.append(add_turn(conversation, rng.choice(node_ids[-20:]), len(node_ids)).id)
+            for name, since, view in (("full", None, "full"), ("summary", None, "summary"),
+                                      ("delta", version, "summary")):
+                elapsed, size = refresh(conversation, since, view)
+                times[name] += elapsed
+                sizes[name] += size
+
+        print(f"{len(node_ids):>7}" + "".join(
+            f" {sizes[name] / SAMPLES / 1024:>11.1f} {times[name] / SAMPLES * 1000:>11.2f}" for name in views
+        ))
+
+
+if __name__ == "__main__":
+    main()
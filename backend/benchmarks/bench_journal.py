@@ -0,0 +1,73 @@
+"""
+Benchmark: cost of journaling InMemoryStore mutations, and recovery time
+
+Runs the same branch-creation workload (create node + edge + select, then
+complete the response) against a plain InMemoryStore and one with a
+write-ahead journal attached, then measures replay on a fresh store.
+
+Usage (from backend/):
+    python -m benchmarks.bench_journal [turns]
+"""
+import sys
+import tempfile
+import time
+from uuid import UUID
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.persistence.journal import Journal
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+
+
+def workload(store: InMemoryStore, turns: int) -> float:
+    conversation = Conversation(root_node_id=UUID(int=0), active_node_id=UUID(int=0))
+    root = ConversationNode(conversation_id=conversation.id, context="You are a helpful AI assistant.")
+    conversation.root_node_id = conversation.active_node_id = root.id
+    with store.transaction():
+        store.create_node(root)
+        store.create_conversation(conversation)
+
+    start = time.perf_counter()
+    parent_id = root.id
+    for i in range(turns):
+        if i % 50 == 0:
+            parent_id = root.id  # Start a new branch now and then
+        node = ConversationNode(conversation_id=conversation.id, parent_id=parent_id, query=f"q{i}", response="")
+        with store.transaction():
+            store.create_node(node)
+            store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+            store.set_active_node(conversation.id, node.id)
+        store.complete_node(node.id, RESPONSE, latency_ms=100, model="bench")
+        parent_id = node.id
+    return time.perf_counter() - start
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    plain = workload(InMemoryStore(), turns)
+    print(f"No journal:   {plain / turns * 1e6:8.1f} us per turn")
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = Journal(directory)
+        store = InMemoryStore()
+        journal.attach(store)
+        journaled = workload(store, turns)
+        print(f"With journal: {journaled / turns * 1e6:8.1f} us per turn (event-loop time)")
+
+        start = time.perf_counter()
+        journal.flush()
+        journal.close()
+        print(f"Drain to disk after the run: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+        start = time.perf_counter()
+        recovered = InMemoryStore()
+        Journal(directory).recover(recovered)
+        elapsed = time.perf_counter() - start
+        assert len(recovered.nodes) == len(store.nodes)
+        print(f"Recovery of {len(recovered.nodes)} nodes: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: InMemoryStore under a memory budget with a long tail of conversations
+
+Builds many conversations into a store with a fixed memory budget, then
+reports how much stays resident, how much was spilled to disk, and the cost
+of opening a spilled conversation compared to a resident one.
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory_budget [conversations] [nodes_per_conversation] [budget_mb]
+"""
+import statistics
+import sys
+import tempfile
+import time
+from uuid import UUID, uuid4
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer with some varied words. " * 20
+
+
+def build(store: InMemoryStore, conversations: int, nodes_per_conversation: int) -> list:
+    conversation_ids = []
+    for _ in range(conversations):
+        root = ConversationNode(conversation_id=uuid4(), context="You are a helpful AI assistant.")
+        store.create_node(root)
+        store.create_conversation(Conversation(
+            id=root.conversation_id, root_node_id=root.id, active_node_id=root.id
+        ))
+        parent_id = root.id
+        for i in range(nodes_per_conversation - 1):
+            node = ConversationNode(conversation_id=root.conversation_id, parent_id=parent_id, query=f"q{i}")
+            store.create_node(node)
+            store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+            store.complete_node(node.id, RESPONSE + str(i), latency_ms=100, model="bench")
+            parent_id = node.id
+        conversation_ids.append(root.conversation_id)
+    return conversation_ids
+
+
+def open_conversation(store: InMemoryStore, conversation_id: UUID) -> float:
+    start = time.perf_counter()
+    store.get_conversation(conversation_id)
+    store.get_conversation_nodes(conversation_id)
+    store.get_conversation_edges(conversation_id)
+    return (time.perf_counter() - start) * 1e3
+
+
+def main():
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    nodes_per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    budget_mb = float(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        store = InMemoryStore(memory_budget=int(budget_mb * 2**20), spill_dir=spill_dir)
+        start = time.perf_counter()
+        conversation_ids = build(store, conversations, nodes_per_conversation)
+        print(f"Built {conversations} x {nodes_per_conversation} nodes in {time.perf_counter() - start:.1f}s")
+
+        print(f"Budget {budget_mb:.0f} MiB: resident {store.resident_bytes / 2**20:.1f} MiB "
+              f"in {len(store.nodes)} nodes, {len(store._cold)} conversations spilled "
+              f"to {store._spill.spilled_bytes / 2**20:.1f} MiB on disk")
+
+        hot = [open_conversation(store, conversation_id) for conversation_id in conversation_ids[-20:]]
+        cold = [open_conversation(store, conversation_id) for conversation_id in conversation_ids[:20]]
+        print(f"Open resident conversation: {statistics.median(hot):.2f} ms (median)")
+        print(f"Open spilled conversation:  {statistics.median(cold):.2f} ms (median, includes spilling another)")
+
+
+if __name__ == "__main__":
+    main()
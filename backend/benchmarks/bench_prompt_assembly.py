@@ -0,0 +1,82 @@
+"""
+Benchmark: prompt assembly latency as conversations get deeper
+
+Compares rebuilding the prompt from the full ancestor path (the previous
+streaming implementation) with extending the parent's cached prompt prefix.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prompt_assembly [max_depth]
+"""
+import sys
+import time
+from uuid import uuid4
+
+from app.context import build_prompt
+from app.models import ConversationNode
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+
+
+def rebuild_prompt(store: InMemoryStore, parent_id, query: str) -> str:
+    """The pre-cache implementation: walk every ancestor and join the transcript"""
+    ancestors = store.get_ancestors(parent_id)
+    context_parts = [ancestors[0].context]
+    for ancestor in ancestors[1:]:
+        if ancestor.query and ancestor.response:
+            context_parts.append(f"User: {ancestor.query}")
+            context_parts.append(f"Assistant: {ancestor.response}")
+    context_parts.append(f"User: {query}")
+    return f"{chr(10).join(context_parts[1:])}\n\nUser: {query}".strip()
+
+
+def cached_prompt(store: InMemoryStore, parent_id, query: str) -> str:
+    return build_prompt(store.get_prompt_prefix(parent_id), query)
+
+
+def main():
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    checkpoints = {d for d in (10, 50, 100, 250, 500, 1000, 2000, 5000) if d <= max_depth}
+
+    rebuild_store, cached_store = InMemoryStore(), InMemoryStore()
+    conversation_id = uuid4()
+    root = ConversationNode(conversation_id=conversation_id, context="You are a helpful AI assistant.")
+    rebuild_store.create_node(root)
+    cached_store.create_node(root)
+
+    print(f"{'depth':>6} {'rebuild (ms)':>14} {'cached (ms)':>13}")
+    rebuild_total = cached_total = 0.0
+    parent_id = root.id
+    for depth in range(1, max_depth + 1):
+        query = f"question {depth}"
+
+        start = time.perf_counter()
+        expected = rebuild_prompt(rebuild_store, parent_id, query)
+        rebuild_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = cached_prompt(cached_store, parent_id, query)
+        cached_elapsed = time.perf_counter() - start
+
+        assert actual == expected
+        rebuild_total += rebuild_elapsed
+        cached_total += cached_elapsed
+
+        node = ConversationNode(
+            conversation_id=conversation_id,
+            parent_id=parent_id,
+            query=query,
+            response=RESPONSE,
+        )
+        rebuild_store.create_node(node)
+        cached_store.create_node(node)
+        parent_id = node.id
+
+        if depth in checkpoints:
+            print(f"{depth:>6} {rebuild_elapsed * 1e3:>14.3f} {cached_elapsed * 1e3:>13.3f}")
+
+    print(f"Total over {max_depth} turns: rebuild {rebuild_total:.3f}s, cached {cached_total:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark: round trips and latency of the Redis store backend
+
+Seeds conversations through RedisStore and reports, per operation, the
+number of round trips to the server and the mean latency: a branch created
+the way the stream endpoint does it (one transaction), completing a node, a
+cold graph fetch (two pipelined round trips) next to fetching the same keys
+one command at a time, a warm graph fetch (one rev check), deleting a
+subtree and deleting a whole conversation.
+
+Runs against an in-process fakeredis server unless REDIS_URL is set; on a
+real server each round trip adds the network latency, which is what the
+pipelining saves. The benchmark only touches keys under its own prefix.
+
+Usage (from backend/):
+    python -m benchmarks.bench_redis_store [conversations] [nodes_per_conversation]
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_redis_store 200 30
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from uuid import UUID, uuid4
+
+import redis
+
+from app.backends.redis import RedisStore
+from app.models import Conversation, ConversationNode, ConversationEdge
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+
+
+class RoundTrips:
+    """Counts commands sent on their own plus pipelines, i.e. round trips"""
+
+    def __init__(self):
+        self.count = 0
+        execute_command = redis.Redis.execute_command
+        execute = redis.client.Pipeline.execute
+
+        def counted_command(client, *args, **options):
+            self.count += 1
+            return execute_command(client, *args, **options)
+
+        def counted_pipeline(pipe, *args, **options):
+            self.count += 1
+            return execute(pipe, *args, **options)
+
+        redis.Redis.execute_command = counted_command
+        redis.client.Pipeline.execute = counted_pipeline
+
+
+def connect():
+    url = os.getenv("REDIS_URL")
+    if url:
+        return redis.Redis.from_url(url), url
+    import fakeredis
+    return fakeredis.FakeRedis(), "fakeredis (in-process)"
+
+
+def branch(store: RedisStore, conversation_id: UUID, parent_id: UUID, query: str) -> ConversationNode:
+    """Create a node the way the stream endpoint does"""
+    with store.transaction():
+        conversation = store.get_conversation(conversation_id)
+        parent = store.get_node(parent_id or conversation.active_node_id)
+        store.get_root(parent.id)
+        store.get_prompt_prefix(parent.id)
+        node = ConversationNode(conversation_id=conversation_id, parent_id=parent.id, query=query, response="")
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent.id, target_node_id=node.id, query_text=query))
+        store.set_active_node(conversation_id, node.id)
+    return node
+
+
+def fetch_unpipelined(client, prefix: str, conversation_id: UUID) -> int:
+    """Read a conversation's keys one command at a time; returns the key count"""
+    key = f"{prefix}conv:{conversation_id.hex}"
+    client.hgetall(key)
+    node_ids = client.lrange(f"{key}:nodes", 0, -1)
+    edge_ids = client.lrange(f"{key}:edges", 0, -1)
+    for node_id in node_ids:
+        client.hgetall(f"{prefix}node:{node_id.decode()}")
+    for edge_id in edge_ids:
+        client.hgetall(f"{prefix}edge:{edge_id.decode()}")
+    return len(node_ids) + len(edge_ids)
+
+
+def main():
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    nodes_per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    client, where = connect()
+    prefix = f"bench:{uuid4().hex[:8]}:"
+    store = RedisStore(client=client, prefix=prefix, cache_size=conversations)
+    round_trips = RoundTrips()
+    results = {}
+
+    def measure(name: str, fn, *args):
+        before = round_trips.count
+        start = time.perf_counter()
+        value = fn(*args)
+        elapsed = time.perf_counter() - start
+        times, trips = results.setdefault(name, ([], []))
+        times.append(elapsed)
+        trips.append(round_trips.count - before)
+        return value
+
+    rng = random.Random(0)
+    seeded = []
+    try:
+        for _ in range(conversations):
+            root = ConversationNode(conversation_id=uuid4(), context="You are a helpful AI assistant.")
+            with store.transaction():
+                store.create_node(root)
+                store.create_conversation(Conversation(
+                    id=root.conversation_id, root_node_id=root.id, active_node_id=root.id
+                ))
+            node_ids = [root.id]
+            for i in range(nodes_per_conversation - 1):
+                node = measure("branch (transaction)", branch, store, root.conversation_id,
+                               rng.choice(node_ids), f"q{i}")
+                measure("complete_node", store.complete_node, node.id, RESPONSE, 100, "bench")
+                node_ids.append(node.id)
+            seeded.append((root.conversation_id, node_ids))
+
+        for conversation_id, _ in seeded:
+            store._drop_partitions((conversation_id,))
+            measure("graph fetch, cold", store.get_conversation_nodes, conversation_id)
+            measure("graph fetch, unpipelined", fetch_unpipelined, client, prefix, conversation_id)
+            measure("graph fetch, warm", store.get_conversation_nodes, conversation_id)
+
+        for conversation_id, node_ids in seeded:
+            store._drop_partitions((conversation_id,))
+            measure("delete_node (subtree)", store.delete_node, node_ids[1])
+            measure("delete_conversation", store.delete_conversation, conversation_id)
+    finally:
+        for key in client.scan_iter(f"{prefix}*"):
+            client.delete(key)
+
+    print(f"{where}: {conversations} conversations x {nodes_per_conversation} nodes")
+    print(f"{'operation':<28} {'round trips':>12} {'mean ms':>10}")
+    for name, (times, trips) in results.items():
+        print(f"{name:<28} {statistics.mean(trips):>12.1f} {statistics.mean(times) * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: schema serialization versus app.api.serialization
+
+Times encoding the full and the summary graph of a conversation of N nodes
+three ways:
+
+- schemas: build the response schemas as the endpoints used to, then
+  validate and dump them against the response_model, as FastAPI does with a
+  returned model
+- fast: build plain dicts and encode them with dumps() (orjson if installed)
+- cached: what the endpoint does once the graph is in its GraphCache, which
+  joins the encoded nodes and edges after looking up their revisions
+
+tests/test_serialization.py checks that all three produce the same bytes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [nodes]
+    e.g. python -m benchmarks.bench_serialization 5000
+"""
+import random
+import sys
+import time
+from typing import Callable, List
+
+from pydantic import TypeAdapter
+
+from app.api.serialization import GraphCache, dumps, edge_json, graph_bytes, node_json, orjson, summary_json
+from app.models import Conversation, ConversationNode, ConversationEdge, NodeSummary, preview_of
+from app.schemas import EdgeResponse, GraphResponse, GraphSummaryResponse, NodeResponse, NodeSummaryResponse
+from app.sharding import new_conversation_id
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer, with some “quotes” and ünïcödé. " * 12
+# Timed encodings per measurement
+ROUNDS = 5
+
+
+def build(store: InMemoryStore, node_count: int) -> Conversation:
+    """A conversation of node_count turns branching at random, some left unfinished"""
+    rng = random.Random(0)
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant. " * 10)
+    conversation = Conversation(id=root.conversation_id, title="Serialization ✓",
+                                root_node_id=root.id, active_node_id=root.id)
+    store.create_node(root)
+    store.create_conversation(conversation)
+    node_ids = [root.id]
+    for i in range(node_count - 1):
+        parent_id = rng.choice(node_ids[-50:])
+        node = ConversationNode(conversation_id=conversation.id, parent_id=parent_id,
+                                query=f"q{i} é\n\"quoted\"" * rng.choice([1, 40]))
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+        if rng.random() < 0.9:
+            store.complete_node(node.id, RESPONSE[:rng.choice([50, 150, len(RESPONSE)])] + str(i), 100, "bench/model")
+        node_ids.append(node.id)
+    return conversation
+
+
+def node_response(node: ConversationNode, context: str, conversation_id=None) -> NodeResponse:
+    """A NodeResponse of a node with its materialized context, in the graph of `conversation_id` if given"""
+    return NodeResponse.model_validate(
+        {**node.model_dump(), "context": context, "conversation_id": conversation_id or node.conversation_id}
+    )
+
+
+def summary_response(summary: NodeSummary, conversation_id=None) -> NodeSummaryResponse:
+    """A NodeSummaryResponse of a summary, in the graph of `conversation_id` if given"""
+    return NodeSummaryResponse.model_validate(
+        {**summary.model_dump(), "conversation_id": conversation_id or summary.conversation_id}
+    )
+
+
+def schema_graph(store: InMemoryStore, conversation: Conversation, summary: bool) -> bytes:
+    """The graph body as the endpoint used to build it and FastAPI to send it"""
+    edges = [EdgeResponse(id=e.id, source=e.source_node_id, target=e.target_node_id,
+                          query_text=preview_of(e.query_text) if summary else e.query_text,
+                          created_at=e.created_at)
+             for e in store.get_conversation_edges(conversation.id)]
+    if summary:
+        model = GraphSummaryResponse
+        nodes = [summary_response(n, conversation.id) for n in store.get_node_summaries(conversation.id)]
+    else:
+        model = GraphResponse
+        nodes = [node_response(n, store.get_node_context(n.id), conversation.id)
+                 for n in store.get_conversation_nodes(conversation.id)]
+    graph = model(conversation_id=conversation.id, active_node_id=conversation.active_node_id,
+                  version=conversation.version, nodes=nodes, edges=edges)
+    adapter = TypeAdapter(model)
+    return adapter.dump_json(adapter.validate_python(graph, from_attributes=True))
+
+
+def fast_graph(store: InMemoryStore, conversation: Conversation, summary: bool) -> bytes:
+    edges = [dumps(edge_json(e, summary)) for e in store.get_conversation_edges(conversation.id)]
+    if summary:
+        nodes = [dumps(summary_json(n, conversation.id)) for n in store.get_node_summaries(conversation.id)]
+    else:
+        nodes = [dumps(node_json(n, store.get_node_context(n.id), conversation.id))
+                 for n in store.get_conversation_nodes(conversation.id)]
+    return graph_bytes(conversation.id, conversation, nodes, edges)
+
+
+def cached_graph(cache: GraphCache, store: InMemoryStore, conversation: Conversation, summary: bool) -> bytes:
+    nodes, edges = cache.graph(store, conversation.id, summary)
+    return graph_bytes(conversation.id, conversation, nodes, edges)
+
+
+def timed(encode: Callable[[], bytes]) -> float:
+    """Best time of ROUNDS encodings, in ms"""
+    times: List[float] = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        encode()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    node_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    store = InMemoryStore()
+    conversation = build(store, node_count)
+    print(f"graph of {node_count} nodes (encoder: {'orjson' if orjson else 'pydantic_core'})")
+    print(f"{'view':<8} {'MB':>7} {'schemas ms':>11} {'fast ms':>9} {'cached ms':>10}")
+    cache = GraphCache(2**31)
+    for summary in (False, True):
+        size = len(cached_graph(cache, store, conversation, summary))
+        slow = timed(lambda: schema_graph(store, conversation, summary))
+        fast = timed(lambda: fast_graph(store, conversation, summary))
+        cached = timed(lambda: cached_graph(cache, store, conversation, summary))
+        print(f"{'summary' if summary else 'full':<8} {size / 2**20:>7.1f} {slow:>11.1f} {fast:>9.1f} {cached:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
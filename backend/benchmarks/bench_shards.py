@@ -0,0 +1,134 @@
+"""
+Benchmark: API throughput with conversations sharded across processes
+
+Seeds one journal per shard with the conversations that shard owns, then
+serves them with the sharding front (app.front) in front of N API shards,
+each on its own Unix socket, and reports requests per second for each
+shard count next to a single API process serving every conversation
+directly. The clients are those of bench_workers (graphs, conversation
+pages and node selections). Throughput scales with shards only up to the
+number of cores, one of which the front uses.
+
+Usage (from backend/):
+    python -m benchmarks.bench_shards [shard_counts] [seconds] [clients]
+    e.g. python -m benchmarks.bench_shards 1,2,4 10 8
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.persistence.journal import Journal
+from app.sharding import ShardRing
+from app.store import InMemoryStore
+from benchmarks.bench_workers import (
+    CONVERSATIONS,
+    NODES_PER_CONVERSATION,
+    RESPONSE,
+    drive,
+    free_port,
+    wait_until,
+)
+
+
+def seed(wal_dirs: list) -> list:
+    """Journal the benchmark conversations, each into its owning shard's directory"""
+    ring = ShardRing(len(wal_dirs))
+    stores = []
+    for wal_dir in wal_dirs:
+        store = InMemoryStore()
+        Journal(wal_dir).attach(store)
+        stores.append(store)
+
+    rng = random.Random(0)
+    conversations = []
+    for _ in range(CONVERSATIONS):
+        conversation_id = uuid4()
+        store = stores[ring.shard_for(conversation_id)]
+        root = ConversationNode(conversation_id=conversation_id, context="You are a helpful AI assistant.")
+        with store.transaction():
+            store.create_node(root)
+            store.create_conversation(Conversation(
+                id=conversation_id, root_node_id=root.id, active_node_id=root.id
+            ))
+        node_ids = [root.id]
+        for i in range(NODES_PER_CONVERSATION - 1):
+            parent_id = rng.choice(node_ids)
+            # Node ids take their conversation's prefix, so they route to the same shard
+            node = ConversationNode(conversation_id=conversation_id, parent_id=parent_id,
+                                    query=f"q{i}", response=RESPONSE, model="bench", latency_ms=100)
+            with store.transaction():
+                store.create_node(node)
+                store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id,
+                                                   query_text=node.query))
+            node_ids.append(node.id)
+        conversations.append((str(conversation_id), [str(node_id) for node_id in node_ids]))
+
+    for store in stores:
+        store.journal.close()
+    return conversations
+
+
+def start(args: list, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *args, "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def run(label: str, shards: int, seconds: float, clients: int, tmp: str) -> None:
+    run_dir = os.path.join(tmp, f"{label}-{shards}")
+    wal_dirs = [os.path.join(run_dir, f"shard-{i}") for i in range(shards)]
+    conversations = seed(wal_dirs)
+
+    base_env = {**os.environ, "STORE_BACKEND": "memory"}
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    processes = []
+    try:
+        if label == "direct":
+            processes.append(start(["app.main:app", "--port", str(port)],
+                                   {**base_env, "STORE_WAL_DIR": wal_dirs[0]}))
+        else:
+            sockets = [os.path.join(run_dir, f"shard-{i}.sock") for i in range(shards)]
+            for i, (wal_dir, socket_path) in enumerate(zip(wal_dirs, sockets)):
+                processes.append(start(["app.main:app", "--uds", socket_path], {
+                    **base_env, "SHARD_COUNT": str(shards), "SHARD_INDEX": str(i), "STORE_WAL_DIR": wal_dir
+                }))
+            wait_until(lambda: all(Path(socket_path).exists() for socket_path in sockets))
+            processes.append(start(["app.front:app", "--port", str(port)], {
+                **base_env, "SHARD_URLS": ",".join(f"unix:{socket_path}" for socket_path in sockets)
+            }))
+
+        wait_until(lambda: httpx.get(f"{url}/health").status_code == 200)
+        rate = drive(url, conversations, seconds, clients)
+        print(f"{label:<24} {shards:>7} {rate:>10.0f}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    shard_counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1,2,4").split(",")]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    print(f"{CONVERSATIONS} conversations x {NODES_PER_CONVERSATION} nodes, "
+          f"{clients} clients, {seconds:.0f}s per run, {os.cpu_count()} cores")
+    print(f"{'setup':<24} {'shards':>7} {'req/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run("direct", 1, seconds, clients, tmp)
+        for shards in shard_counts:
+            run("front", shards, seconds, clients, tmp)
+
+
+if __name__ == "__main__":
+    main()
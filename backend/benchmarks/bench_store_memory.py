@@ -0,0 +1,71 @@
+"""
+Benchmark: bytes retained per node by InMemoryStore
+
+Builds a synthetic store of branching conversations through the public store
+API and reports the memory it retains (traced with tracemalloc), including
+every secondary index. Response text is shared between nodes so the numbers
+reflect the per-node representation rather than the text itself.
+
+Usage (from backend/):
+    python -m benchmarks.bench_store_memory [nodes] [nodes_per_conversation]
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from uuid import uuid4
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+
+
+def build(store: InMemoryStore, nodes: int, nodes_per_conversation: int) -> None:
+    rng = random.Random(0)
+    created = 0
+    while created < nodes:
+        root = ConversationNode(conversation_id=uuid4(), context="You are a helpful AI assistant.")
+        store.create_node(root)
+        store.create_conversation(Conversation(
+            id=root.conversation_id, root_node_id=root.id, active_node_id=root.id
+        ))
+        created += 1
+        node_ids = [root.id]
+        for i in range(min(nodes_per_conversation, nodes - created + 1) - 1):
+            # Mostly extend the newest branch, sometimes fork from an older node
+            parent_id = node_ids[-1] if rng.random() < 0.8 else rng.choice(node_ids)
+            node = ConversationNode(conversation_id=root.conversation_id, parent_id=parent_id,
+                                    query=f"Question number {i}?", response="", model="bench")
+            store.create_node(node)
+            store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+            store.complete_node(node.id, RESPONSE, latency_ms=100, model="bench")
+            node_ids.append(node.id)
+            created += 1
+
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    nodes_per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    tracemalloc.start()
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    store = InMemoryStore()
+    build(store, nodes, nodes_per_conversation)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    count = len(store.nodes)
+    print(f"Built {count} nodes in {len(store.conversations)} conversations in {elapsed:.1f}s")
+    print(f"Retained: {retained / 2**20:.1f} MiB, {retained / count:.0f} bytes per node (edges and indexes included)")
+
+
+if __name__ == "__main__":
+    main()
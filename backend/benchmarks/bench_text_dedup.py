@@ -0,0 +1,85 @@
+"""
+Benchmark: shared text blobs in InMemoryStore
+
+Builds conversations whose root contexts are one of five system prompt
+templates and where some branches are regenerations that repeat an earlier
+response, then reports how many distinct texts the blob table holds and the
+memory retained (traced with tracemalloc) against the size of the text as
+written by the callers.
+
+Usage (from backend/):
+    python -m benchmarks.bench_text_dedup [conversations] [nodes_per_conversation]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+from uuid import uuid4
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.store import InMemoryStore
+
+TEMPLATES = [
+    f"You are a helpful AI assistant for {topic}. Answer accurately and concisely, "
+    "use Markdown for code and lists, and ask a clarifying question when the "
+    "request is ambiguous. " * 8
+    for topic in ("general questions", "software engineering", "data analysis", "writing", "customer support")
+]
+REGENERATE_RATE = 0.2
+
+
+def fresh(text: str) -> str:
+    """A new copy of a string, as a request body or LLM stream would produce"""
+    return (text + " ")[:-1]
+
+
+def build(store: InMemoryStore, conversations: int, nodes_per_conversation: int) -> int:
+    """Build the conversations; returns the characters of text written"""
+    rng = random.Random(0)
+    written = 0
+    for c in range(conversations):
+        context = fresh(rng.choice(TEMPLATES))
+        root = ConversationNode(conversation_id=uuid4(), context=context)
+        store.create_node(root)
+        store.create_conversation(Conversation(
+            id=root.conversation_id, root_node_id=root.id, active_node_id=root.id
+        ))
+        written += len(context)
+        parent_id, responses = root.id, []
+        for i in range(nodes_per_conversation - 1):
+            if responses and rng.random() < REGENERATE_RATE:
+                # A regenerated branch producing an answer seen before
+                response = fresh(rng.choice(responses))
+            else:
+                response = f"Answer {c}.{i}: " + "a reasonably long assistant answer. " * 20
+                responses.append(response)
+            node = ConversationNode(conversation_id=root.conversation_id, parent_id=parent_id, query=f"q{i}")
+            store.create_node(node)
+            store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+            store.complete_node(node.id, response, latency_ms=100, model="bench")
+            written += len(response)
+            parent_id = node.id
+    return written
+
+
+def main():
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    nodes_per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    tracemalloc.start()
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    store = InMemoryStore()
+    written = build(store, conversations, nodes_per_conversation)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    texts = conversations * nodes_per_conversation
+    print(f"{texts} context/response texts, {written / 2**20:.1f} MiB written")
+    print(f"Distinct blobs: {len(store._blobs)} holding {store._blobs.bytes / 2**20:.1f} MiB")
+    print(f"Retained: {retained / 2**20:.1f} MiB ({store.resident_bytes / 2**20:.1f} MiB estimated)")
+
+
+if __name__ == "__main__":
+    main()
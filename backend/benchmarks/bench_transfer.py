@@ -0,0 +1,126 @@
+"""
+Benchmark: streaming conversation export and import
+
+Builds one large conversation and serializes it three ways: as the graph
+endpoint does (one JSON document, see app/api/serialization.py), and as NDJSON
+and msgpack export streams. Reports the time, output size and peak memory
+allocated while encoding (tracemalloc), then imports each export into a
+fresh store in IMPORT_BATCH-record transactions and reports the time and
+peak memory of the import. The graph document also carries each node's
+assembled context, which exports leave out, so it grows with depth.
+
+Usage (from backend/):
+    python -m benchmarks.bench_transfer [nodes]
+    e.g. python -m benchmarks.bench_transfer 2000
+"""
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from typing import AsyncIterator, Callable, List
+
+from app.api.serialization import dumps, edge_json, graph_bytes, node_json
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.services.transfer import ConversationImporter, decode_stream, export_stream, msgpack
+from app.sharding import new_conversation_id
+from app.store import InMemoryStore
+
+RESPONSE = "A reasonably long assistant answer. " * 20
+BODY_CHUNK = 64 * 1024  # Roughly what a server reads from a socket at a time
+
+
+def build(store: InMemoryStore, node_count: int) -> Conversation:
+    """A conversation of node_count completed turns branching at random"""
+    rng = random.Random(0)
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant.")
+    conversation = Conversation(id=root.conversation_id, title="Transfer",
+                                root_node_id=root.id, active_node_id=root.id)
+    store.create_node(root)
+    store.create_conversation(conversation)
+    node_ids = [root.id]
+    for i in range(node_count - 1):
+        parent_id = rng.choice(node_ids[-50:])
+        node = ConversationNode(conversation_id=conversation.id, parent_id=parent_id, query=f"q{i}",
+                                response=RESPONSE + str(i), model="bench", latency_ms=100)
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+        node_ids.append(node.id)
+    return conversation
+
+
+def graph_document(store: InMemoryStore, conversation: Conversation) -> List[bytes]:
+    """The graph endpoint's response body"""
+    nodes = store.get_conversation_nodes(conversation.id)
+    edges = store.get_conversation_edges(conversation.id)
+    return [graph_bytes(
+        conversation.id,
+        conversation,
+        [dumps(node_json(n, store.get_node_context(n.id))) for n in nodes],
+        [dumps(edge_json(e)) for e in edges]
+    )]
+
+
+def measure(run: Callable[[], object]):
+    """Seconds taken by run() and the peak memory it allocated, measured in a second pass"""
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+async def body(data: bytes) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), BODY_CHUNK):
+        yield data[start:start + BODY_CHUNK]
+
+
+async def import_into(store: InMemoryStore, data: bytes, format: str) -> Conversation:
+    importer = ConversationImporter(store, new_ids=True)
+    async for record in decode_stream(body(data), format):
+        if importer.add(record):
+            importer.flush()
+    return importer.finish()
+
+
+def main():
+    node_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    store = InMemoryStore()
+    conversation = build(store, node_count)
+    print(f"conversation of {node_count} nodes")
+    print(f"{'encoding':<10} {'ms':>9} {'MB out':>8} {'peak MB':>9} {'import ms':>10} {'import peak MB':>15}")
+
+    encodings = [("graph", lambda: graph_document(store, conversation))]
+    for format in ("ndjson", "msgpack"):
+        if format == "msgpack" and msgpack is None:
+            print("msgpack    skipped (pip install msgpack)")
+            continue
+        encodings.append((format, lambda format=format: export_stream(
+            conversation, store.iter_conversation_records(conversation.id), format
+        )))
+
+    for name, encode in encodings:
+        # Consume the chunks as a response would, without keeping them
+        def write():
+            return sum(len(chunk) for chunk in encode())
+
+        size, elapsed, peak = measure(write)
+        line = f"{name:<10} {elapsed * 1000:>9.1f} {size / 2**20:>8.1f} {peak / 2**20:>9.1f}"
+        if name != "graph":
+            data = b"".join(encode())
+
+            def load():
+                return asyncio.run(import_into(InMemoryStore(), data, name))
+
+            imported, import_elapsed, import_peak = measure(load)
+            assert imported.id != conversation.id
+            line += f" {import_elapsed * 1000:>10.1f} {import_peak / 2**20:>15.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Benchmark: API throughput with several workers sharing the store server
+
+Seeds a journal with conversations, then serves it with uvicorn: once as a
+single worker owning an in-memory store (the baseline), and once per worker
+count with STORE_BACKEND=remote against a store server replaying the same
+journal. Client processes request graphs, conversation pages and node
+selections for a fixed time; requests per second are reported for each
+setup. Throughput scales with workers only up to the number of cores.
+
+Usage (from backend/):
+    python -m benchmarks.bench_workers [worker_counts] [seconds] [clients]
+    e.g. python -m benchmarks.bench_workers 1,2,4 10 8
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.persistence.journal import Journal
+from app.store import InMemoryStore
+
+CONVERSATIONS = 200
+NODES_PER_CONVERSATION = 30
+RESPONSE = "A reasonably long assistant answer. " * 20
+
+
+def seed(wal_dir: str) -> list:
+    """Journal the benchmark conversations; returns (conversation id, node ids) pairs"""
+    store = InMemoryStore()
+    journal = Journal(wal_dir)
+    journal.attach(store)
+    rng = random.Random(0)
+    conversations = []
+    for _ in range(CONVERSATIONS):
+        root = ConversationNode(conversation_id=uuid4(), context="You are a helpful AI assistant.")
+        with store.transaction():
+            store.create_node(root)
+            store.create_conversation(Conversation(
+                id=root.conversation_id, root_node_id=root.id, active_node_id=root.id
+            ))
+        node_ids = [root.id]
+        for i in range(NODES_PER_CONVERSATION - 1):
+            parent_id = rng.choice(node_ids)
+            node = ConversationNode(conversation_id=root.conversation_id, parent_id=parent_id,
+                                    query=f"q{i}", response=RESPONSE, model="bench", latency_ms=100)
+            with store.transaction():
+                store.create_node(node)
+                store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id,
+                                                   query_text=node.query))
+            node_ids.append(node.id)
+        conversations.append((str(root.conversation_id), [str(node_id) for node_id in node_ids]))
+    journal.close()
+    return conversations
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(check, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if check():
+                return
+        except (OSError, httpx.HTTPError):
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("Timed out waiting for the server to start")
+
+
+def client(url: str, conversations: list, seconds: float, seed_value: int, results) -> None:
+    """Issue requests until the time is up; a third of them are selections"""
+    rng = random.Random(seed_value)
+    count = 0
+    with httpx.Client(base_url=url, timeout=30.0) as http:
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            conversation_id, node_ids = rng.choice(conversations)
+            kind = count % 3
+            if kind == 0:
+                response = http.get(f"/api/conversations/{conversation_id}/graph")
+            elif kind == 1:
+                response = http.get("/api/conversations", params={"limit": 50})
+            else:
+                response = http.post(f"/api/conversations/{conversation_id}/select",
+                                     json={"node_id": rng.choice(node_ids)})
+            response.raise_for_status()
+            count += 1
+    results.put(count)
+
+
+def drive(url: str, conversations: list, seconds: float, clients: int) -> float:
+    """Run the client processes; returns requests per second"""
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client, args=(url, conversations, seconds, i, results))
+        for i in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / seconds
+
+
+def run(label: str, workers: int, env: dict, conversations: list, seconds: float, clients: int) -> None:
+    port = free_port()
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until(lambda: httpx.get(f"{url}/health").status_code == 200)
+        rate = drive(url, conversations, seconds, clients)
+        print(f"{label:<24} {workers:>7} {rate:>10.0f}")
+    finally:
+        api.terminate()
+        api.wait()
+
+
+def main():
+    worker_counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1,2,4").split(",")]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_dir = os.path.join(tmp, "seed")
+        conversations = seed(seed_dir)
+        print(f"{CONVERSATIONS} conversations x {NODES_PER_CONVERSATION} nodes, "
+              f"{clients} clients, {seconds:.0f}s per run, {os.cpu_count()} cores")
+        print(f"{'setup':<24} {'workers':>7} {'req/s':>10}")
+
+        def wal_copy(name: str) -> str:
+            path = os.path.join(tmp, name)
+            shutil.copytree(seed_dir, path)
+            return path
+
+        base_env = dict(os.environ)
+        run("memory (in-process)", 1,
+            {**base_env, "STORE_BACKEND": "memory", "STORE_WAL_DIR": wal_copy("memory")},
+            conversations, seconds, clients)
+
+        for workers in worker_counts:
+            socket_path = os.path.join(tmp, f"store-{workers}.sock")
+            server = subprocess.Popen(
+                [sys.executable, "-m", "app.store_server"],
+                env={**base_env, "STORE_BACKEND": "remote", "STORE_SOCKET": socket_path,
+                     "STORE_WAL_DIR": wal_copy(f"remote-{workers}")},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_until(lambda: Path(socket_path).exists())
+                run("remote (store server)", workers,
+                    {**base_env, "STORE_BACKEND": "remote", "STORE_SOCKET": socket_path},
+                    conversations, seconds, clients)
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+ETags of node responses
+
+A node is tagged with its own revision: a match is answered with 304 until
+its response or the context it inherits changes, whatever else happens in
+its conversation.
+"""
+from uuid import UUID
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import ConversationNode, ConversationEdge
+from app.store import store
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+def add_turn(conversation_id: UUID, parent_id: UUID) -> ConversationNode:
+    node = ConversationNode(conversation_id=conversation_id, parent_id=parent_id, query="Hello")
+    with store.transaction():
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+    return node
+
+
+def test_node_etag(client):
+    conversation_id = UUID(client.post("/api/conversations", json={"title": "ETags"}).json()["conversation_id"])
+    root_id = store.get_conversation(conversation_id).root_node_id
+    parent = add_turn(conversation_id, root_id)
+    node = add_turn(conversation_id, parent.id)
+    etag = client.get(f"/api/nodes/{node.id}").headers["etag"]
+
+    # Other nodes of the conversation change
+    add_turn(conversation_id, root_id)
+    store.complete_node(root_id, "Hi", 10, "test/model")
+    assert client.get(f"/api/nodes/{node.id}").headers["etag"] != etag
+    etag = client.get(f"/api/nodes/{node.id}").headers["etag"]
+    add_turn(conversation_id, parent.id)
+    response = client.get(f"/api/nodes/{node.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["etag"] == etag
+
+    # Its parent completes: the context it inherits changes
+    store.complete_node(parent.id, "Hello there", 10, "test/model")
+    response = client.get(f"/api/nodes/{node.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert "Hello there" in response.json()["context"]
+
+    assert client.get(f"/api/nodes/{UUID(int=5)}", headers={"If-None-Match": "*"}).status_code == 404
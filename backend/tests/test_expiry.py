@@ -0,0 +1,67 @@
+"""
+Idle conversation expiry on the in-memory store
+
+A large conversation is deleted in steps, each checking in the store that it
+is still idle. Collectors of several workers may expire it at once, and a
+request served by another worker between two steps stops the deletion.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.services.expiry import STEP_NODES, ConversationCollector
+from app.sharding import new_conversation_id
+from app.store import InMemoryStore
+
+TTL = timedelta(hours=1)
+NODES = STEP_NODES * 5
+
+
+def idle_conversation(store: InMemoryStore) -> Conversation:
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant.")
+    conversation = Conversation(id=root.conversation_id, title="Idle", root_node_id=root.id, active_node_id=root.id,
+                                updated_at=datetime.utcnow() - 2 * TTL)
+    with store.transaction():
+        store.create_node(root)
+        store.create_conversation(conversation)
+    parent_id = root.id
+    for i in range(NODES - 1):
+        node = ConversationNode(conversation_id=conversation.id, parent_id=parent_id, query=f"Question {i}")
+        with store.transaction():
+            store.create_node(node)
+            store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+        parent_id = node.id
+    return conversation
+
+
+def test_collectors_of_several_workers():
+    store = InMemoryStore()
+    conversation = idle_conversation(store)
+    kept = Conversation(title="Kept", root_node_id=conversation.root_node_id, active_node_id=conversation.root_node_id)
+    store.create_conversation(kept)
+    collectors = [ConversationCollector(store, TTL, slice_seconds=0) for _ in range(2)]
+
+    async def collect():
+        return await asyncio.gather(*(collector.collect() for collector in collectors))
+
+    assert sorted(asyncio.run(collect())) == [0, 1]
+    assert store.get_conversation(conversation.id) is None
+    assert store.get_conversation(kept.id) is not None
+
+
+def test_touched_between_steps():
+    store = InMemoryStore()
+    conversation = idle_conversation(store)
+    trim = store.trim_conversation
+    left = []
+
+    def trim_and_touch(conversation_id, limit, idle_before):
+        # A request of another worker selects a node after the first step
+        left.append(trim(conversation_id, limit, idle_before))
+        store.set_active_node(conversation_id, conversation.root_node_id)
+        return left[-1]
+
+    store.trim_conversation = trim_and_touch
+    assert asyncio.run(ConversationCollector(store, TTL).collect()) == 0
+    assert left == [NODES - STEP_NODES, None]
+    assert len(store.get_conversation_nodes(conversation.id)) == NODES - STEP_NODES
@@ -0,0 +1,54 @@
+"""
+The journal's writer thread when the disk fails
+
+Once a write or fsync fails, nothing may be queued for a writer that is gone
+and no flush may report lost records as durable.
+"""
+import errno
+import os
+
+import pytest
+
+from app.models import ConversationNode
+from app.persistence import journal as journal_module
+from app.persistence.journal import Journal, JournalError
+from app.sharding import new_conversation_id
+from app.store import InMemoryStore
+
+
+@pytest.fixture
+def store(tmp_path) -> InMemoryStore:
+    store = InMemoryStore()
+    journal = Journal(str(tmp_path), commit_interval=0)
+    journal.attach(store)
+    yield store
+    journal.close()
+
+
+def create_node(store: InMemoryStore) -> ConversationNode:
+    return store.create_node(ConversationNode(conversation_id=new_conversation_id(), context="Context"))
+
+
+def test_flush(store, tmp_path):
+    node = create_node(store)
+    store.journal.flush()
+    assert str(node.id) in "".join(path.read_text() for path in tmp_path.glob("wal-*.log"))
+
+
+def test_write_failure(store, monkeypatch, caplog):
+    def fsync(fd: int) -> None:
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(journal_module.os, "fsync", fsync)
+    create_node(store)
+    with pytest.raises(JournalError):
+        store.journal.flush()
+    assert "Store journal write failed" in caplog.text
+
+    # Later writes raise instead of queuing for the stopped writer
+    with pytest.raises(JournalError):
+        create_node(store)
+    with pytest.raises(JournalError):
+        with store.transaction():
+            create_node(store)
+    assert not store.journal._pending
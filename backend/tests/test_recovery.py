@@ -0,0 +1,201 @@
+"""
+Recovery of InMemoryStore from its journal
+
+A store recovered from the newest snapshot and the journal records after it
+must hold what the live store held: the same conversations at the same
+versions, with the same nodes, texts and edges. Versions going backwards
+after a restart would make clients trust stale ETags and graph deltas.
+"""
+import random
+from pathlib import Path
+from typing import Dict, Tuple
+from uuid import UUID
+
+import pytest
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.persistence.journal import Journal
+from app.sharding import new_conversation_id
+from app.store import InMemoryStore
+
+# Version, (node id, response) pairs and edge ids of a conversation
+ConversationDump = Tuple[int, list, list]
+
+
+@pytest.fixture
+def journal(tmp_path: Path) -> Journal:
+    return Journal(str(tmp_path), snapshot_every=10**9, commit_interval=0)
+
+
+@pytest.fixture
+def store(journal: Journal) -> InMemoryStore:
+    store = InMemoryStore()
+    journal.attach(store)
+    yield store
+    journal.close()
+
+
+def snapshot(store: InMemoryStore, journal: Journal) -> None:
+    """Snapshot the store now and wait for the file"""
+    journal.snapshot(store._snapshot_state())
+    thread = journal._snapshot_thread
+    if thread is not None:
+        thread.join()
+
+
+def recover(journal: Journal, **kwargs) -> InMemoryStore:
+    """A new store recovered from the journal's directory, after closing it"""
+    journal.close()
+    store = InMemoryStore(**kwargs)
+    Journal(str(journal.directory)).recover(store)
+    return store
+
+
+def dump(store: InMemoryStore) -> Dict[str, ConversationDump]:
+    return {
+        str(conversation.id): (
+            conversation.version,
+            sorted((str(node.id), node.response) for node in store.get_conversation_nodes(conversation.id)),
+            sorted(str(edge.id) for edge in store.get_conversation_edges(conversation.id))
+        )
+        for conversation in store.list_conversations()
+    }
+
+
+def create_conversation(store: InMemoryStore) -> Conversation:
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant.")
+    conversation = Conversation(id=root.conversation_id, title="Recovery",
+                                root_node_id=root.id, active_node_id=root.id)
+    with store.transaction():
+        store.create_node(root)
+        store.create_conversation(conversation)
+    return conversation
+
+
+def add_turn(store: InMemoryStore, conversation_id, parent_id, query: str = "Hello") -> ConversationNode:
+    node = ConversationNode(conversation_id=conversation_id, parent_id=parent_id, query=query)
+    with store.transaction():
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=query))
+    return node
+
+
+@pytest.mark.parametrize("memory_budget", [None, 1])
+def test_fork_completed_after_snapshot(store, journal, memory_budget):
+    # A snapshot keeps a copy of a shared node per conversation holding it
+    conversation = create_conversation(store)
+    node = add_turn(store, conversation.id, conversation.root_node_id)
+    fork = Conversation(title="Fork", root_node_id=conversation.root_node_id, active_node_id=node.id)
+    store.fork_conversation(conversation.id, node.id, fork)
+    snapshot(store, journal)
+
+    store.complete_node(node.id, "final answer", 10, "test/model")
+    live = dump(store)
+    assert live[str(fork.id)][0] == 1
+
+    recovered = recover(journal, memory_budget=memory_budget)
+    assert dump(recovered) == live
+    recovered.delete_conversation(conversation.id)
+    assert recovered.get_conversation(fork.id).version == 1
+    assert recovered.get_node(node.id).response == "final answer"
+
+
+def test_fork_completed_after_restart(store, journal):
+    # After a restart only the conversation that is accessed is loaded, and
+    # completing a node it shares must still reach the fork
+    conversation = create_conversation(store)
+    node = add_turn(store, conversation.id, conversation.root_node_id)
+    fork = Conversation(title="Fork", root_node_id=conversation.root_node_id, active_node_id=node.id)
+    store.fork_conversation(conversation.id, node.id, fork)
+    snapshot(store, journal)
+
+    restarted = InMemoryStore()
+    directory = str(journal.directory)
+    journal.close()
+    journal = Journal(directory, snapshot_every=10**9, commit_interval=0)
+    journal.attach(restarted)
+    assert restarted.has_node(conversation.id, node.id)
+    restarted.complete_node(node.id, "final answer", 10, "test/model")
+    live = dump(restarted)
+
+    assert dump(recover(journal)) == live
+    restarted.delete_conversation(conversation.id)
+    assert restarted.get_conversation(fork.id).version == 1
+    assert restarted.get_node(node.id).response == "final answer"
+
+
+def test_fork_spilled_after_recovery(store, journal):
+    # Loaded one at a time, each conversation spills its own copy of the node
+    conversation = create_conversation(store)
+    node = add_turn(store, conversation.id, conversation.root_node_id)
+    fork = Conversation(title="Fork", root_node_id=conversation.root_node_id, active_node_id=node.id)
+    store.fork_conversation(conversation.id, node.id, fork)
+    other = create_conversation(store)
+    snapshot(store, journal)
+
+    versions = {conversation_id: version for conversation_id, (version, _, _) in dump(store).items()}
+
+    recovered = recover(journal, memory_budget=1)
+    for conversation_id in (conversation.id, other.id, fork.id, other.id):
+        recovered.get_conversation_nodes(conversation_id)
+    recovered.complete_node(node.id, "final answer", 10, "test/model")
+    for conversation_id in (conversation.id, fork.id):
+        assert recovered.get_conversation(conversation_id).version == versions[str(conversation_id)] + 1
+        responses = {n.id: n.response for n in recovered.get_conversation_nodes(conversation_id)}
+        assert responses[node.id] == "final answer"
+
+
+def random_workload(store: InMemoryStore, journal: Journal, rng: random.Random, steps: int) -> None:
+    """Turns, completions, forks, deletions and selections on random conversations"""
+    conversation_ids = []
+    for _ in range(steps):
+        # Every snapshot is written before the next one is due
+        thread = journal._snapshot_thread
+        if thread is not None:
+            thread.join()
+        choice = rng.random()
+        if not conversation_ids or choice < 0.05:
+            conversation_ids.append(create_conversation(store).id)
+            continue
+        conversation_id = rng.choice(conversation_ids)
+        nodes = store.get_conversation_nodes(conversation_id)
+        node = rng.choice(nodes)
+        if choice < 0.45:
+            add_turn(store, conversation_id, node.id, f"Question {rng.randrange(1000)}")
+        elif choice < 0.7:
+            store.complete_node(node.id, f"Answer {rng.randrange(10**6)}", 10, "test/model")
+        elif choice < 0.8:
+            fork = Conversation(title="Fork", root_node_id=nodes[0].id, active_node_id=node.id)
+            store.fork_conversation(conversation_id, node.id, fork)
+            conversation_ids.append(fork.id)
+        elif choice < 0.88:
+            if node.parent_id is not None:
+                store.delete_node(node.id, conversation_id)
+        elif choice < 0.93:
+            store.delete_conversation(conversation_id)
+            conversation_ids.remove(conversation_id)
+        else:
+            store.set_active_node(conversation_id, node.id)
+    thread = journal._snapshot_thread
+    if thread is not None:
+        thread.join()
+
+
+@pytest.mark.parametrize("memory_budget", [None, 20_000])
+@pytest.mark.parametrize("seed", range(4))
+def test_snapshot_and_replay(tmp_path, seed, memory_budget):
+    # Snapshots are taken every 50 records, then the rest is replayed over the newest
+    journal = Journal(str(tmp_path), snapshot_every=50, commit_interval=0)
+    store = InMemoryStore(memory_budget=memory_budget)
+    journal.attach(store)
+    random_workload(store, journal, random.Random(seed), 400)
+    live = dump(store)
+    assert list(tmp_path.glob("snapshot-*.snap"))
+
+    recovered = recover(journal, memory_budget=memory_budget)
+    assert dump(recovered) == live
+    # Deleting conversations hands shared nodes over the same way in both
+    for conversation_id in list(live)[::2]:
+        store.delete_conversation(UUID(conversation_id))
+        recovered.delete_conversation(UUID(conversation_id))
+    assert dump(recovered) == dump(store)
@@ -0,0 +1,295 @@
+"""
+Equivalence of app.api.serialization with the response schemas
+
+Every body the endpoints encode without the schemas must be byte for byte
+what FastAPI sends for the schema it stands in for, with orjson and with the
+pydantic_core fallback. That includes graphs and nodes joined from a
+GraphCache after the records behind its entries changed.
+"""
+import json
+import random
+from typing import Any, Optional
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.api import serialization
+from app.api.serialization import (
+    GraphCache,
+    conversation_json,
+    dumps,
+    edge_json,
+    graph_bytes,
+    node_json,
+    summary_json,
+    token_message
+)
+from app.models import Conversation, ConversationNode, ConversationEdge, NodeSummary, preview_of
+from app.schemas import (
+    BranchComparisonResponse,
+    ConversationResponse,
+    EdgeResponse,
+    GraphResponse,
+    GraphSummaryResponse,
+    NodeResponse,
+    NodeSummaryResponse,
+    StreamToken
+)
+from app.sharding import new_conversation_id
+from app.store import InMemoryStore
+
+NODE_COUNT = 120
+RESPONSE = "A reasonably long assistant answer, with some “quotes” and ünïcödé. " * 6
+
+
+@pytest.fixture(params=["orjson", "pydantic_core"], autouse=True)
+def encoder(request, monkeypatch):
+    """Run every test with orjson and with the fallback encoder"""
+    if request.param == "orjson":
+        if serialization.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+@pytest.fixture
+def store() -> InMemoryStore:
+    return InMemoryStore()
+
+
+@pytest.fixture
+def conversation(store: InMemoryStore) -> Conversation:
+    """A conversation branching at random, some turns left unfinished"""
+    rng = random.Random(0)
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant. " * 10)
+    conversation = Conversation(id=root.conversation_id, title="Serialization ✓",
+                                root_node_id=root.id, active_node_id=root.id)
+    store.create_node(root)
+    store.create_conversation(conversation)
+    node_ids = [root.id]
+    for i in range(NODE_COUNT - 1):
+        parent_id = rng.choice(node_ids[-20:])
+        node = ConversationNode(conversation_id=conversation.id, parent_id=parent_id,
+                                query=f"q{i} é\n\"quoted\"" * rng.choice([1, 40]))
+        store.create_node(node)
+        store.create_edge(ConversationEdge(source_node_id=parent_id, target_node_id=node.id, query_text=node.query))
+        if rng.random() < 0.9:
+            store.complete_node(node.id, RESPONSE[:rng.choice([50, 150, len(RESPONSE)])] + str(i), 100, "test/model")
+        node_ids.append(node.id)
+    return store.get_conversation(conversation.id)
+
+
+def schema_bytes(model: Any) -> bytes:
+    """A body as FastAPI sends a returned model: validated against its class, then dumped"""
+    adapter = TypeAdapter(type(model))
+    return adapter.dump_json(adapter.validate_python(model, from_attributes=True))
+
+
+def node_response(node: ConversationNode, context: str, conversation_id=None) -> NodeResponse:
+    """A NodeResponse of a node with its materialized context, in the graph of `conversation_id` if given"""
+    return NodeResponse.model_validate(
+        {**node.model_dump(), "context": context, "conversation_id": conversation_id or node.conversation_id}
+    )
+
+
+def summary_response(summary: NodeSummary, conversation_id=None) -> NodeSummaryResponse:
+    """A NodeSummaryResponse of a summary, in the graph of `conversation_id` if given"""
+    return NodeSummaryResponse.model_validate(
+        {**summary.model_dump(), "conversation_id": conversation_id or summary.conversation_id}
+    )
+
+
+def node_schema(store: InMemoryStore, node: ConversationNode, conversation_id=None) -> bytes:
+    return schema_bytes(node_response(node, store.get_node_context(node.id), conversation_id))
+
+
+def edge_schema(edge: ConversationEdge, summary: bool = False) -> EdgeResponse:
+    return EdgeResponse(id=edge.id, source=edge.source_node_id, target=edge.target_node_id,
+                        query_text=preview_of(edge.query_text) if summary else edge.query_text,
+                        created_at=edge.created_at)
+
+
+def schema_graph(
+    store: InMemoryStore,
+    conversation: Conversation,
+    summary: bool,
+    nodes: Optional[list] = None,
+    edges: Optional[list] = None,
+    **delta: Any
+) -> bytes:
+    """The graph body as the endpoint used to build it, of all records unless given"""
+    if edges is None:
+        edges = store.get_conversation_edges(conversation.id)
+    if summary:
+        model = GraphSummaryResponse
+        if nodes is None:
+            summaries = store.get_node_summaries(conversation.id)
+        else:
+            summaries = [NodeSummary.from_node(n) for n in nodes]
+        node_bodies = [summary_response(n, conversation.id) for n in summaries]
+    else:
+        model = GraphResponse
+        if nodes is None:
+            nodes = store.get_conversation_nodes(conversation.id)
+        node_bodies = [node_response(n, store.get_node_context(n.id), conversation.id) for n in nodes]
+    return schema_bytes(model(
+        conversation_id=conversation.id, active_node_id=conversation.active_node_id, version=conversation.version,
+        nodes=node_bodies, edges=[edge_schema(e, summary) for e in edges], **delta
+    ))
+
+
+def assert_cached(store: InMemoryStore, cache: GraphCache, *conversation_ids) -> None:
+    """The cache joins the same graphs and nodes as the schemas, filling it and then from it"""
+    for conversation_id in conversation_ids:
+        conversation = store.get_conversation(conversation_id)
+        for summary in (False, True):
+            expected = schema_graph(store, conversation, summary)
+            for _ in range(2):
+                nodes, edges = cache.graph(store, conversation_id, summary)
+                assert graph_bytes(conversation_id, conversation, nodes, edges) == expected
+        for node in store.get_conversation_nodes(conversation_id):
+            assert cache.node(store, node.id) == node_schema(store, node)
+
+
+def test_node_bodies(store, conversation):
+    for node in store.get_conversation_nodes(conversation.id):
+        context = store.get_node_context(node.id)
+        assert dumps(node_json(node, context)) == node_schema(store, node)
+        assert dumps(node_json(node, context, conversation.id)) == node_schema(store, node, conversation.id)
+
+
+def test_summary_bodies(store, conversation):
+    for summary in store.get_node_summaries(conversation.id):
+        expected = schema_bytes(summary_response(summary, conversation.id))
+        assert dumps(summary_json(summary, conversation.id)) == expected
+
+
+@pytest.mark.parametrize("summary", [False, True])
+def test_edge_bodies(store, conversation, summary):
+    for edge in store.get_conversation_edges(conversation.id):
+        assert dumps(edge_json(edge, summary)) == schema_bytes(edge_schema(edge, summary))
+
+
+def test_conversation_body(conversation):
+    assert dumps(conversation_json(conversation)) == schema_bytes(ConversationResponse.model_validate(conversation))
+
+
+def test_comparison_body(store, conversation):
+    nodes = store.get_conversation_nodes(conversation.id)
+    ancestor, branch_a, branch_b = store.compare_branches(nodes[-1].id, nodes[-2].id)
+
+    def context(node: ConversationNode) -> str:
+        return store.get_node_context(node.id)
+
+    expected = schema_bytes(BranchComparisonResponse(
+        common_ancestor=node_response(ancestor, context(ancestor)),
+        branch_a=[node_response(n, context(n)) for n in branch_a],
+        branch_b=[node_response(n, context(n)) for n in branch_b]
+    ))
+    assert dumps({
+        "common_ancestor": node_json(ancestor, context(ancestor)),
+        "branch_a": [node_json(n, context(n)) for n in branch_a],
+        "branch_b": [node_json(n, context(n)) for n in branch_b],
+    }) == expected
+
+
+@pytest.mark.parametrize("summary", [False, True])
+def test_graph_bodies(store, conversation, summary):
+    edges = [dumps(edge_json(e, summary)) for e in store.get_conversation_edges(conversation.id)]
+    if summary:
+        nodes = [dumps(summary_json(n, conversation.id)) for n in store.get_node_summaries(conversation.id)]
+    else:
+        nodes = [dumps(node_json(n, store.get_node_context(n.id), conversation.id))
+                 for n in store.get_conversation_nodes(conversation.id)]
+    assert graph_bytes(conversation.id, conversation, nodes, edges) == schema_graph(store, conversation, summary)
+
+
+@pytest.mark.parametrize("summary", [False, True])
+def test_graph_delta_bodies(store, conversation, summary):
+    since = conversation.version
+    nodes = store.get_conversation_nodes(conversation.id)
+    store.complete_node(nodes[1].id, "Answered again ✓", 10, "test/other")
+    store.delete_node(nodes[-1].id)
+
+    changes = store.get_graph_changes(conversation.id, since)
+    cache = GraphCache(2**20)
+    encoded = [cache.node(store, n.id, conversation.id, summary) for n in changes.nodes]
+    actual = graph_bytes(conversation.id, changes.conversation, encoded,
+                         [dumps(edge_json(e, summary)) for e in changes.edges],
+                         since, changes.deleted_node_ids, changes.deleted_edge_ids)
+    assert changes.deleted_node_ids
+    assert actual == schema_graph(store, changes.conversation, summary, changes.nodes, changes.edges, since=since,
+                                  deleted_node_ids=changes.deleted_node_ids,
+                                  deleted_edge_ids=changes.deleted_edge_ids)
+
+
+@pytest.mark.parametrize("content", ["Hello", " wörld", "\"\n\\", "💬"])
+def test_token_message(content):
+    # What websocket.send_json sends for a StreamToken
+    expected = json.dumps(StreamToken(content=content).model_dump(), separators=(",", ":"), ensure_ascii=False)
+    assert token_message(content) == expected
+
+
+def test_cached_graph(store, conversation):
+    assert_cached(store, GraphCache(2**30), conversation.id)
+
+
+def test_cached_graph_within_budget(store, conversation):
+    # Too small for the graph: entries are evicted while it is joined
+    cache = GraphCache(2**14)
+    assert_cached(store, cache, conversation.id)
+    assert cache.total_bytes <= 2**14
+
+
+def test_cached_graph_after_completion(store, conversation):
+    cache = GraphCache(2**30)
+    assert_cached(store, cache, conversation.id)
+    # Completing nodes with children changes the contexts of their subtrees
+    for node in store.get_conversation_nodes(conversation.id)[1:20]:
+        store.complete_node(node.id, f"A new answer to {node.query[:10]} ✓", 10, "test/other")
+    assert_cached(store, cache, conversation.id)
+
+
+def test_cached_graph_after_recreate(store, conversation):
+    cache = GraphCache(2**30)
+    assert_cached(store, cache, conversation.id)
+    # Records created again under the ids of deleted ones are new records
+    leaf = next(n for n in reversed(store.get_conversation_nodes(conversation.id)) if not store.get_children(n.id))
+    edge = next(e for e in store.get_conversation_edges(conversation.id) if e.target_node_id == leaf.id)
+    store.delete_node(leaf.id)
+    leaf.query = edge.query_text = "Asked again"
+    store.create_node(leaf)
+    store.create_edge(edge)
+    assert_cached(store, cache, conversation.id)
+
+
+def test_cached_graph_after_fork_handover(store, conversation):
+    branch = store.get_conversation_nodes(conversation.id)[NODE_COUNT // 2]
+    fork = Conversation(title="Fork", root_node_id=conversation.root_node_id, active_node_id=branch.id)
+    store.fork_conversation(conversation.id, branch.id, fork)
+    cache = GraphCache(2**30)
+    # Shared nodes keep the id of the conversation that created them
+    assert_cached(store, cache, conversation.id, fork.id)
+    # Deleting it hands them over to the fork: their conversation_id changes
+    store.delete_conversation(conversation.id)
+    assert_cached(store, cache, fork.id)
+
+
+def test_summaries_of_compressed_text():
+    # Previews of compressed blobs come from the start of the text they keep plain
+    pytest.importorskip("zstandard")
+    from app.compression import CompressedText, TextCodec
+    store = InMemoryStore(codec=TextCodec(training_bytes=8 * 1024, dict_size=4096))
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant. " * 20)
+    conversation = Conversation(id=root.conversation_id, root_node_id=root.id, active_node_id=root.id)
+    store.create_node(root)
+    store.create_conversation(conversation)
+    for i in range(60):
+        node = store.create_node(ConversationNode(conversation_id=conversation.id, parent_id=root.id, query=f"q{i}"))
+        store.complete_node(node.id, RESPONSE[:150 + i * 3] + str(i), 100, "test/model")
+    assert any(node.response.value.__class__ is CompressedText for node in store.nodes.values() if node.response)
+
+    nodes = {node.id: node for node in store.get_conversation_nodes(conversation.id)}
+    for summary in store.get_node_summaries(conversation.id):
+        assert summary == NodeSummary.from_node(nodes[summary.id])
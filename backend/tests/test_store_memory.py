@@ -0,0 +1,31 @@
+"""
+Memory retained per node by InMemoryStore
+
+The store must keep holding a node, with its edge and every index, in a third
+of what it took before nodes became slotted records: 2862 bytes per node, as
+measured by benchmarks.bench_store_memory. Anything added per node has to fit
+in what is left.
+"""
+import gc
+import tracemalloc
+
+from benchmarks.bench_store_memory import build
+from app.store import InMemoryStore
+
+BASELINE_BYTES_PER_NODE = 2862
+NODES = 5000
+
+
+def test_bytes_per_node():
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        store = InMemoryStore()
+        build(store, NODES, 100)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert len(store.nodes) == NODES
+    assert retained / NODES <= BASELINE_BYTES_PER_NODE / 3
@@ -0,0 +1,24 @@
+"""
+Conversation export
+
+An export of a fork lists the nodes it shares under the fork's id, without
+changing the models it was given, which a store may keep or hand out again.
+"""
+import json
+
+from app.models import Conversation, ConversationNode, ConversationEdge
+from app.services.transfer import export_stream
+from app.sharding import new_conversation_id
+
+
+def test_export_of_fork_keeps_models():
+    root = ConversationNode(conversation_id=new_conversation_id(), context="You are a helpful AI assistant.")
+    node = ConversationNode(conversation_id=root.conversation_id, parent_id=root.id, query="Hello")
+    edge = ConversationEdge(source_node_id=root.id, target_node_id=node.id, query_text=node.query)
+    fork = Conversation(title="Fork", root_node_id=root.id, active_node_id=node.id)
+
+    lines = b"".join(export_stream(fork, iter([root, node, edge]))).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["type"] for record in records] == ["conversation", "node", "node", "edge"]
+    assert {record["conversation_id"] for record in records[1:3]} == {str(fork.id)}
+    assert root.conversation_id == node.conversation_id != fork.id
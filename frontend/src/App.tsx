@@ -12,6 +12,7 @@ import { QueryPanel } from './components/QueryPanel';
 import {
   useConversations,
   useGraph,
+  useNode,
   useCreateConversation,
   useSelectNode,
 } from './hooks/useConversation';
@@ -50,7 +51,8 @@ function ConVergeApp() {
     }
   }, [conversations, currentConversationId]);
 
-  const selectedNode = graphData?.nodes.find((n) => n.id === graphData.active_node_id);
+  // The graph only has previews; the panel loads the full active node
+  const { data: selectedNode } = useNode(graphData?.active_node_id, graphData?.version);
 
   // Fetch ancestors when node changes
   useEffect(() => {
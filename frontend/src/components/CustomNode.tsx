@@ -4,16 +4,16 @@
 
 import { memo } from 'react';
 import { Handle, Position } from 'reactflow';
-import type { NodeData } from '../types/graph';
+import type { NodeSummary } from '../types/graph';
 
 interface CustomNodeProps {
-  data: NodeData & { isActive?: boolean };
+  data: NodeSummary & { isActive?: boolean };
   selected?: boolean;
 }
 
 export const CustomNode = memo(({ data, selected }: CustomNodeProps) => {
   const isRoot = !data.parent_id;
-  const hasResponse = !!data.response;
+  const hasResponse = !!data.response_preview;
 
   return (
     <div
@@ -37,13 +37,13 @@ export const CustomNode = memo(({ data, selected }: CustomNodeProps) => {
 
       <div className="space-y-2">
         {/* Query */}
-        {data.query && (
+        {data.query_preview && (
           <div className="text-sm">
             <div className="font-semibold text-gray-700 dark:text-gray-300 mb-1">
               {isRoot ? '🎯 Initial Context' : '💬 Query'}
             </div>
             <div className="text-gray-600 dark:text-gray-400 line-clamp-2">
-              {data.query}
+              {data.query_preview}
             </div>
           </div>
         )}
@@ -55,19 +55,19 @@ export const CustomNode = memo(({ data, selected }: CustomNodeProps) => {
               🤖 Response
             </div>
             <div className="text-gray-600 dark:text-gray-400 line-clamp-3">
-              {data.response}
+              {data.response_preview}
             </div>
           </div>
         )}
 
         {/* Root context */}
-        {isRoot && !data.query && (
+        {isRoot && !data.query_preview && (
           <div className="text-sm">
             <div className="font-semibold text-purple-700 dark:text-purple-300 mb-1">
               🌱 Root Node
             </div>
             <div className="text-gray-600 dark:text-gray-400 line-clamp-2">
-              {data.context.substring(0, 100)}...
+              {data.context_preview?.substring(0, 100)}...
             </div>
           </div>
         )}
@@ -4,7 +4,7 @@
 
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { apiClient } from '../lib/api';
-import type { CreateConversationRequest } from '../types/graph';
+import type { CreateConversationRequest, GraphData } from '../types/graph';
 
 export function useConversations() {
   return useQuery({
@@ -22,14 +22,31 @@ export function useConversation(conversationId: string | null) {
 }
 
 export function useGraph(conversationId: string | null) {
+  const queryClient = useQueryClient();
+
   return useQuery({
     queryKey: ['graph', conversationId],
-    queryFn: () => apiClient.getGraph(conversationId!),
+    // Refetches only download the changes since the cached graph's version
+    queryFn: () =>
+      apiClient.getGraph(
+        conversationId!,
+        queryClient.getQueryData<GraphData>(['graph', conversationId])
+      ),
     enabled: !!conversationId,
     refetchInterval: false,
   });
 }
 
+export function useNode(nodeId: string | undefined, version: number | undefined) {
+  return useQuery({
+    // Keyed by the graph version so a completed response is picked up
+    queryKey: ['node', nodeId, version],
+    queryFn: () => apiClient.getNode(nodeId!),
+    enabled: !!nodeId,
+    placeholderData: (previous) => (previous?.id === nodeId ? previous : undefined),
+  });
+}
+
 export function useCreateConversation() {
   const queryClient = useQueryClient();
 
@@ -15,6 +15,29 @@ const API_URL = (import.meta.env.VITE_API_URL || 'http://localhost:8001').replac
 const API_BASE = `${API_URL}/api`;
 const WS_BASE = `${API_URL.replace('http', 'ws')}/api`;
 
+/**
+ * Apply a ?since= response (changed nodes and edges plus deleted ids) to the
+ * graph it was requested for
+ */
+function mergeGraphChanges(previous: GraphData, changes: GraphData): GraphData {
+  const deletedNodes = new Set(changes.deleted_node_ids ?? []);
+  const deletedEdges = new Set(changes.deleted_edge_ids ?? []);
+  const nodes = new Map(previous.nodes.map((node) => [node.id, node]));
+  const edges = new Map(previous.edges.map((edge) => [edge.id, edge]));
+  changes.nodes.forEach((node) => nodes.set(node.id, node));
+  changes.edges.forEach((edge) => edges.set(edge.id, edge));
+  deletedNodes.forEach((id) => nodes.delete(id));
+  deletedEdges.forEach((id) => edges.delete(id));
+  return {
+    ...changes,
+    since: null,
+    nodes: [...nodes.values()],
+    edges: [...edges.values()],
+    deleted_node_ids: [],
+    deleted_edge_ids: [],
+  };
+}
+
 class ApiClient {
   async listConversations(): Promise<Conversation[]> {
     const response = await fetch(`${API_BASE}/conversations`);
@@ -47,10 +70,15 @@ class ApiClient {
     if (!response.ok) throw new Error('Failed to delete conversation');
   }
 
-  async getGraph(conversationId: string): Promise<GraphData> {
-    const response = await fetch(`${API_BASE}/conversations/${conversationId}/graph`);
+  async getGraph(conversationId: string, previous?: GraphData): Promise<GraphData> {
+    // Node summaries only (see getNode); with a previous graph, only what
+    // changed since its version
+    const since = previous ? `&since=${previous.version}` : '';
+    const response = await fetch(`${API_BASE}/conversations/${conversationId}/graph?view=summary${since}`);
     if (!response.ok) throw new Error('Failed to fetch graph');
-    return response.json();
+    const graph: GraphData = await response.json();
+    if (!previous || graph.since == null) return graph;
+    return mergeGraphChanges(previous, graph);
   }
 
   async selectNode(conversationId: string, nodeId: string): Promise<void> {
@@ -62,6 +90,12 @@ class ApiClient {
     if (!response.ok) throw new Error('Failed to select node');
   }
 
+  async getNode(nodeId: string): Promise<NodeData> {
+    const response = await fetch(`${API_BASE}/nodes/${nodeId}`);
+    if (!response.ok) throw new Error('Failed to fetch node');
+    return response.json();
+  }
+
   async getAncestors(nodeId: string): Promise<NodeData[]> {
     const response = await fetch(`${API_BASE}/nodes/${nodeId}/ancestors`);
     if (!response.ok) throw new Error('Failed to fetch ancestors');
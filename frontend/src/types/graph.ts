@@ -15,6 +15,20 @@ export interface NodeData {
   latency_ms: number | null;
 }
 
+// A node as the graph view sends it: texts are cut to a preview
+export interface NodeSummary {
+  id: string;
+  conversation_id: string;
+  parent_id: string | null;
+  query_preview: string | null;
+  response_preview: string | null;
+  context_preview: string | null; // Only set on the root
+  created_at: string;
+  model: string | null;
+  tokens_used: number | null;
+  latency_ms: number | null;
+}
+
 export interface EdgeData {
   id: string;
   source: string;
@@ -26,8 +40,13 @@ export interface EdgeData {
 export interface GraphData {
   conversation_id: string;
   active_node_id: string;
-  nodes: NodeData[];
+  version: number;
+  nodes: NodeSummary[];
   edges: EdgeData[];
+  // Set when nodes and edges are only the changes after this version
+  since?: number | null;
+  deleted_node_ids?: string[];
+  deleted_edge_ids?: string[];
 }
 
 export interface Conversation {